@@ -11,10 +11,22 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import warnings
-import os
+import argparse
 from scipy import stats
 import matplotlib.font_manager as fm
 
+from emg_batch import run_per_file
+from emg_loader import read_channels, recording_timing
+from emg_model import Recording, report_dicts
+from emg_profiles import scan_recordings
+from emg_stats import StreamingStats, stream_file_statistics
+
+# 繪製原始訊號圖的記錄
+SIGNAL_PLOT_RECORDING = 'Noraxon'
+
+# 圖表中各通道的顏色 (依通道順序循環使用)
+CHANNEL_COLORS = ['royalblue', 'seagreen', 'darkorange', 'firebrick', 'mediumpurple', 'sienna', 'orchid', 'gray']
+
 def setup_chinese_font():
     """設定中文字體"""
     try:
@@ -43,99 +55,72 @@ def calculate_rms(series):
 
 def calculate_statistics(series):
     """計算詳細統計指標"""
-    numeric_series = pd.to_numeric(series, errors='coerce').dropna()
-    if numeric_series.empty:
+    numeric_series = pd.to_numeric(pd.Series(series), errors='coerce').dropna()
+    return StreamingStats().update(numeric_series.to_numpy()).result()
+
+def process_file(name, config, stream=False, chunksize=1_000_000, keep_values=True):
+    """解析單一檔案並計算統計指標 (可在子程序中執行)
+
+    返回 {'recording': Recording, 'message': 處理摘要}。
+    keep_values 為 False 時記錄不保留通道數據，讓子程序只傳回精簡的統計結果。
+    """
+    if stream:
+        # 分塊計算統計指標，記憶體用量與檔案大小無關
+        channel_stats = stream_file_statistics(config['path'], config, chunksize)
         return {
-            'RMS': 0.0,
-            'Mean': 0.0,
-            'Std': 0.0,
-            'Max': 0.0,
-            'Min': 0.0,
-            'Count': 0
+            'recording': Recording.from_stats(name, config, channel_stats),
+            'message': f"串流統計完成 (每塊 {chunksize} 列)"
         }
-    
+
+    # 只解析肌肉通道欄位 (繪圖所需的時間於繪圖時依採樣頻率換算)
+    channels = read_channels(config['path'], config)
     return {
-        'RMS': np.sqrt(np.mean(numeric_series**2)),
-        'Mean': np.mean(numeric_series),
-        'Std': np.std(numeric_series),
-        'Max': np.max(numeric_series),
-        'Min': np.min(numeric_series),
-        'Count': len(numeric_series)
+        'recording': Recording.from_channels(name, config, channels, keep_values=keep_values),
+        'message': f"通道數: {len(channels)}，數據點數: {max(map(len, channels.values()), default=0)}"
     }
 
-def load_and_process_data():
-    """載入和處理所有EMG數據"""
-    # 根據使用者說明定義檔案路徑和對應的欄位資訊
-    file_configs = {
-        '419-電阻式': {
-            'path': '419-電阻式.csv',
-            'quad_col': 7,  # H欄 (索引7) -> 股四頭肌
-            'bicep_col': 3, # D欄 (索引3) -> 股二頭肌
-            'type': 'Other'
-        },
-        '445-耦合式': {
-            'path': '445-藕合式.csv',  # 注意：實際文件名是藕合式
-            'quad_col': 7,  # H欄 (索引7) -> 股四頭肌
-            'bicep_col': 3, # D欄 (索引3) -> 股二頭肌
-            'type': 'Other'
-        },
-        'Noraxon': {
-            'path': 'Noraxon.csv',
-            'quad_col': 'RT VMO (uV)',         # D欄 -> 股四頭肌
-            'bicep_col': 'RT SEMITEND. (uV)',  # E欄 -> 股二頭肌
-            'type': 'Noraxon'
-        }
-    }
+def load_and_process_data(stream=False, chunksize=1_000_000, workers=None, data_dir='.'):
+    """載入和處理所有EMG數據，返回 {名稱: Recording}
 
-    analysis_results = {}
-    detailed_stats = {}
-    raw_data_storage = {}
+    原本的 analysis_results / detailed_stats 字典可由 emg_model.report_dicts 產生。
+    stream 為 True 時以分塊方式計算統計 (適用超過記憶體大小的長時間記錄)，
+    此模式不保留通道數據，因此不會繪製原始訊號圖。
+    workers 大於1時以程序池平行處理各檔案，子程序只返回統計結果，
+    繪製原始訊號圖的記錄 (SIGNAL_PLOT_RECORDING) 於完成後在主程序重新讀取通道數據。
+    data_dir 中 (包含子資料夾) 的CSV檔案會依開頭內容自動判斷設備類型。
+    """
+    file_configs = scan_recordings(data_dir)
+
+    recordings = {}
     
     print("\n=== 開始分析EMG數據 ===")
-    
-    for name, config in file_configs.items():
+
+    if not file_configs:
+        print(f"❌ 在 {data_dir} 中找不到可辨識的EMG數據檔案")
+
+    keep_values = not workers or workers <= 1
+    for name, config, result, error in run_per_file(process_file, file_configs, workers,
+                                                     stream, chunksize, keep_values):
+        # run_per_file 於檔案處理完成後才返回，因此在此回報完成而非開始
         filepath = config['path']
-        if not os.path.exists(filepath):
-            print(f"❌ 檔案不存在，已跳過: {filepath}")
+        if error is not None:
+            print(f"❌ 處理檔案 {filepath} 時發生錯誤: {error}")
             continue
-            
-        try:
-            print(f"📊 正在處理: {filepath}...")
-            
-            # 根據文件類型讀取數據
-            if config['type'] == 'Noraxon':
-                df = pd.read_csv(filepath, skiprows=4, encoding='utf-8')
-                print(f"   Noraxon數據形狀: {df.shape}")
-            else:
-                df = pd.read_csv(filepath, header=None, encoding='utf-8')
-                print(f"   數據形狀: {df.shape}")
 
-            # 計算統計指標
-            quad_stats = calculate_statistics(df[config['quad_col']])
-            bicep_stats = calculate_statistics(df[config['bicep_col']])
-            
-            # 儲存結果
-            analysis_results[name] = {
-                '股四頭肌 RMS (uV)': quad_stats['RMS'], 
-                '股二頭肌 RMS (uV)': bicep_stats['RMS']
-            }
-            
-            detailed_stats[name] = {
-                '股四頭肌': quad_stats,
-                '股二頭肌': bicep_stats
-            }
-            
-            # 儲存原始數據用於繪圖
-            raw_data_storage[name] = {'data': df, 'config': config}
-            
-            print(f"   ✓ 股四頭肌 RMS: {quad_stats['RMS']:.2f} uV")
-            print(f"   ✓ 股二頭肌 RMS: {bicep_stats['RMS']:.2f} uV")
-            
-        except Exception as e:
-            print(f"❌ 處理檔案 {filepath} 時發生錯誤: {e}")
-            continue
+        print(f"📊 已處理: {filepath}")
+        print(f"   {result['message']}")
+        recording = result['recording']
+        recordings[name] = recording
+
+        for channel in recording.channels.values():
+            print(f"   ✓ {channel.muscle} RMS: {channel.stats['RMS']:.2f} uV")
+
+    # 子程序只返回統計結果；繪製原始訊號圖的記錄於主程序重新讀取通道數據
+    plotted = recordings.get(SIGNAL_PLOT_RECORDING)
+    if plotted is not None and not stream and not keep_values:
+        plotted.set_values(read_channels(plotted.config['path'], plotted.config))
 
-    return analysis_results, detailed_stats, raw_data_storage
+    return recordings
 
 def create_comparison_chart(analysis_results):
     """創建比較圖表"""
@@ -168,17 +153,18 @@ def create_comparison_chart(analysis_results):
     ax1.legend(title='肌肉', fontsize=11)
     ax1.tick_params(axis='x', rotation=45)
     
-    # 散點圖
-    for i, muscle in enumerate(['股四頭肌 RMS (uV)', '股二頭肌 RMS (uV)']):
+    # 散點圖 (各記錄的通道不同時，缺少的通道不繪製)
+    for i, muscle in enumerate(results_df.columns):
         x_pos = np.arange(len(results_df))
         y_values = results_df[muscle].values
+        color = CHANNEL_COLORS[i % len(CHANNEL_COLORS)]
         ax2.scatter(x_pos, y_values, s=100, alpha=0.7, 
                    label=muscle.replace(' RMS (uV)', ''),
-                   color=['royalblue', 'seagreen'][i])
+                   color=color)
         
         # 連接線
         ax2.plot(x_pos, y_values, '--', alpha=0.5, 
-                color=['royalblue', 'seagreen'][i])
+                color=color)
     
     ax2.set_title('EMG 肌力分析比較 (趨勢圖)', fontsize=16, pad=20)
     ax2.set_xlabel('數據來源', fontsize=12)
@@ -222,50 +208,52 @@ def create_detailed_statistics_table(detailed_stats):
             print(f"    數據點: {stats['Count']} 個")
             print()
 
-def create_noraxon_signal_plot(raw_data_storage):
+def create_noraxon_signal_plot(recordings):
     """創建Noraxon原始訊號圖"""
-    if 'Noraxon' not in raw_data_storage:
+    recording = recordings.get(SIGNAL_PLOT_RECORDING)
+    if recording is None:
         print("⚠️ 無Noraxon數據可供繪製原始訊號圖")
         return
+    if not any(len(channel.values) for channel in recording.channels.values()):
+        print("⚠️ Noraxon記錄未保留通道數據 (串流模式)，略過原始訊號圖")
+        return
         
     print("\n📈 正在生成Noraxon原始訊號圖...")
     
-    noraxon_data = raw_data_storage['Noraxon']['data']
-    noraxon_config = raw_data_storage['Noraxon']['config']
+    if recording.sampling_rate is None:
+        recording.sampling_rate = recording_timing(recording.config['path'], recording.config)['sampling_rate']
+
+    channels = list(recording.channels.values())
+    fig, axes = plt.subplots(len(channels), 1, figsize=(15, 5 * len(channels)), sharex=True, squeeze=False)
+    axes = axes[:, 0]
     
-    if 'time' in noraxon_data.columns:
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(15, 10), sharex=True)
-        
-        quad_col_name = noraxon_config['quad_col']
-        bicep_col_name = noraxon_config['bicep_col']
-        
-        # 股四頭肌訊號
-        ax1.plot(noraxon_data['time'], noraxon_data[quad_col_name], 
-                label=f'股四頭肌 ({quad_col_name.split(" ")[0]})', 
-                color='royalblue', linewidth=0.8)
-        ax1.set_title('Noraxon 原始EMG訊號 - 股四頭肌', fontsize=16)
-        ax1.set_ylabel('EMG Amplitude (uV)', fontsize=12)
-        ax1.legend(fontsize=11)
-        ax1.grid(True, alpha=0.3)
-        
-        # 股二頭肌訊號
-        ax2.plot(noraxon_data['time'], noraxon_data[bicep_col_name], 
-                label=f'股二頭肌 ({bicep_col_name.split(" ")[0]})', 
-                color='seagreen', linewidth=0.8)
-        ax2.set_title('Noraxon 原始EMG訊號 - 股二頭肌', fontsize=16)
-        ax2.set_xlabel('時間 (秒)', fontsize=12)
-        ax2.set_ylabel('EMG Amplitude (uV)', fontsize=12)
-        ax2.legend(fontsize=11)
-        ax2.grid(True, alpha=0.3)
-        
-        fig.suptitle('原始數據範例 (Noraxon.csv)', fontsize=18, y=0.98)
-        plt.tight_layout(rect=[0, 0.03, 1, 0.96])
-        plt.show()
-    else:
-        print("⚠️ Noraxon數據中未找到時間欄位")
+    for i, (ax, channel) in enumerate(zip(axes, channels)):
+        color = CHANNEL_COLORS[i % len(CHANNEL_COLORS)]
+        ax.plot(recording.time(channel.key), channel.values, 
+                label=f'{channel.muscle} ({channel.column.split(" ")[0]})', 
+                color=color, linewidth=0.8)
+        ax.set_title(f'Noraxon 原始EMG訊號 - {channel.muscle}', fontsize=16)
+        ax.set_ylabel('EMG Amplitude (uV)', fontsize=12)
+        ax.legend(fontsize=11)
+        ax.grid(True, alpha=0.3)
+    axes[-1].set_xlabel('時間 (秒)', fontsize=12)
+    
+    fig.suptitle('原始數據範例 (Noraxon.csv)', fontsize=18, y=0.98)
+    plt.tight_layout(rect=[0, 0.03, 1, 0.96])
+    plt.show()
 
 def main():
     """主執行函數"""
+    parser = argparse.ArgumentParser(description='EMG 肌力分析報告 - 改進版')
+    parser.add_argument('--stream', action='store_true',
+                        help='以分塊方式計算統計 (適用超過記憶體大小的長時間記錄)')
+    parser.add_argument('--chunksize', type=int, default=1_000_000, help='串流模式每塊讀取的列數')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='平行處理檔案的程序數 (預設在主程序中依序處理)')
+    parser.add_argument('--data-dir', default='.',
+                        help='數據資料夾，包含子資料夾中的CSV檔案會自動判斷設備類型 (預設為目前目錄)')
+    args = parser.parse_args()
+
     print("🚀 EMG 肌力分析報告 - 改進版")
     print("=" * 50)
     
@@ -274,7 +262,10 @@ def main():
     setup_chinese_font()
     
     # 載入和處理數據
-    analysis_results, detailed_stats, raw_data_storage = load_and_process_data()
+    recordings = load_and_process_data(
+        stream=args.stream, chunksize=args.chunksize, workers=args.workers,
+        data_dir=args.data_dir)
+    analysis_results, detailed_stats = report_dicts(recordings)
     
     if not analysis_results:
         print("\n❌ 所有檔案分析失敗，無法生成報告。")
@@ -292,7 +283,7 @@ def main():
     create_comparison_chart(analysis_results)
     
     # 創建Noraxon原始訊號圖
-    create_noraxon_signal_plot(raw_data_storage)
+    create_noraxon_signal_plot(recordings)
     
     print("\n✅ 分析完成！")
 
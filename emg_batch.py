@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 批次處理
+
+將每個檔案的解析與統計分派到程序池(ProcessPoolExecutor)平行執行，
+子程序只返回精簡的結果，由主程序依原始順序合併。
+
+亦可作為批次分析的入口，掃描整個資料夾並將每個記錄的統計彙整為一個CSV檔案:
+    python emg_batch.py 數據資料夾 --workers 8 --output emg_batch_summary.csv
+    python emg_batch.py 數據資料夾 --mvc-dir MVC資料夾    # 另外輸出 %MVC 欄位
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from emg_mvc import load_mvc_references, percent_mvc, recording_subject, update_mvc_store
+from emg_profiles import channel_names, scan_recordings
+from emg_stats import stream_file_statistics
+
+# 彙整表中每個通道輸出的統計欄位
+SUMMARY_FIELDS = ('RMS', 'Mean', 'Std', 'Max', 'Min', 'Count')
+
+# 提供MVC參考記錄時換算為 %MVC 的欄位
+MVC_SUMMARY_FIELDS = ('RMS', 'Mean', 'Max')
+
+
+def run_per_file(func, file_configs, workers=None, *args):
+    """對每個檔案設定呼叫 func(name, config, *args)，依 file_configs 的順序逐一返回結果
+
+    workers 為 None 或 1 時在目前程序中依序執行；大於1時使用程序池平行處理。
+    每個檔案的錯誤各自獨立：返回 (name, config, result, error)，成功時 error 為 None，
+    失敗時 result 為 None。
+    """
+    if not workers or workers <= 1:
+        for name, config in file_configs.items():
+            try:
+                yield name, config, func(name, config, *args), None
+            except Exception as e:
+                yield name, config, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            name: executor.submit(func, name, config, *args)
+            for name, config in file_configs.items()
+        }
+        for name, future in futures.items():
+            try:
+                yield name, file_configs[name], future.result(), None
+            except Exception as e:
+                yield name, file_configs[name], None, e
+
+
+def summarize_recording(name, config, chunksize=1_000_000):
+    """以串流方式計算單一記錄的通道統計，返回彙整表的一列 (可在子程序中執行)"""
+    channel_stats = stream_file_statistics(config['path'], config, chunksize)
+    row = {'數據集': name, '檔案': config['path'], '設備': config['profile']}
+    for key, muscle in channel_names(config).items():
+        for field in SUMMARY_FIELDS:
+            row[f"{muscle} {field}"] = channel_stats[key][field]
+    return row
+
+
+def add_mvc_columns(row, config, data_dir, references):
+    """以受試者的MVC參考值加入 %MVC 欄位 (references 見 emg_mvc.load_mvc_references)"""
+    subject = recording_subject(config['path'], data_dir)
+    row['受試者'] = subject
+    for key, muscle in channel_names(config).items():
+        peak = references.get((subject, config['profile'], key))
+        row[f"{muscle} MVC峰值"] = peak
+        for field in MVC_SUMMARY_FIELDS:
+            row[f"{muscle} {field} %MVC"] = percent_mvc(row[f"{muscle} {field}"], peak)
+    return row
+
+
+def batch_summary(data_dir='.', workers=None, chunksize=1_000_000, mvc_dir=None):
+    """掃描資料夾中所有可辨識的記錄並計算統計，返回每個記錄一列的DataFrame
+
+    mvc_dir 為MVC參考記錄資料夾，設定時加入各通道的 %MVC 欄位；MVC峰值只在檔案新增或
+    修改時計算，分析開始前一次載入所有參考值。
+    """
+    file_configs = scan_recordings(data_dir)
+    print(f"📂 在 {data_dir} 中找到 {len(file_configs)} 個記錄")
+
+    references = None
+    if mvc_dir is not None:
+        computed, reused = update_mvc_store(mvc_dir)
+        print(f"📏 MVC參考記錄: 重新計算 {computed} 個，沿用 {reused} 個")
+        references = load_mvc_references()
+
+    rows = []
+    for name, config, row, error in run_per_file(summarize_recording, file_configs, workers, chunksize):
+        if error is not None:
+            print(f"❌ 處理檔案 {config['path']} 時發生錯誤: {error}")
+            continue
+        if references is not None:
+            row = add_mvc_columns(row, config, data_dir, references)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description='EMG 批次分析：掃描資料夾並彙整所有記錄的統計')
+    parser.add_argument('data_dir', nargs='?', default='.', help='數據資料夾 (包含子資料夾)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='平行處理檔案的程序數 (預設為CPU核心數)')
+    parser.add_argument('--chunksize', type=int, default=1_000_000, help='每塊讀取的列數')
+    parser.add_argument('--output', default='emg_batch_summary.csv', help='彙整表輸出路徑')
+    parser.add_argument('--mvc-dir', default=None,
+                        help='MVC參考記錄資料夾 (第一層子資料夾為受試者)，另外輸出%%MVC欄位')
+    args = parser.parse_args()
+
+    summary = batch_summary(args.data_dir, workers=args.workers, chunksize=args.chunksize,
+                            mvc_dir=args.mvc_dir)
+    summary.to_csv(args.output, index=False, encoding='utf-8-sig')
+    print(f"✅ 已輸出 {len(summary)} 個記錄的統計: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,768 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EMG 分析效能基準測試
+
+每個測試項目在獨立子程序中執行，分別量測執行時間與峰值記憶體(RSS)增量
+(執行期間的峰值RSS減去執行前的RSS，不含匯入模組的記憶體)，避免前一個測試的記憶體佔用影響後續結果。
+
+使用方法 (Usage):
+python emg_benchmark.py ingest parse columnar preview encoding pyramid envelope filter spectral onset stream quantile cache window model channels incremental
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from emg_downsample import build_pyramid, minmax_decimate, pyramid_tile
+from emg_cache import load_channel_store, load_channels
+from emg_columnar import recording_table, write_table
+import emg_loader
+from emg_store import ChannelStore
+from emg_loader import load_recording, read_channels, recording_timing
+from emg_model import Recording
+from emg_profiles import file_config
+from emg_signal import condition, windowed_rms
+from emg_onset import burst_statistics
+from emg_spectral import SPECTRAL_HOP_S, SPECTRAL_WINDOW_S, spectral_band, spectral_metrics
+from scipy import signal as sps
+from emg_stats import (StreamingStats, filtered_statistics, iter_blocks, outlier_bounds,
+                       stream_file_statistics, with_filtered_statistics)
+from emg_web_report import analyze_emg_data, build_raw_preview, calculate_channel_statistics, encode_series
+
+# 內建的三份範例數據
+BENCHMARK_FILES = {
+    '419-電阻式': file_config('419-電阻式.csv', 'Timestamped'),
+    '445-耦合式': file_config('445-藕合式.csv', 'Timestamped'),
+    'Noraxon': file_config('Noraxon.csv', 'Noraxon')
+}
+
+
+def _peak_rss_mb():
+    """返回目前程序的峰值RSS (MB)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS回傳位元組，Linux回傳KB
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _proc_status_mb(field):
+    """返回 /proc/self/status 的記憶體欄位 (VmRSS 目前RSS、VmHWM 峰值RSS) MB，非Linux時返回None"""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """將程序的峰值RSS (VmHWM) 重設為目前RSS (Linux)，返回是否成功"""
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _child(func, args, repeat, queue):
+    # ru_maxrss 包含父程序與匯入模組的高水位，改以執行前的RSS為基準量測增量
+    if _reset_peak_rss():
+        before = _proc_status_mb('VmRSS')
+        peak = lambda: _proc_status_mb('VmHWM')
+    else:
+        before = _peak_rss_mb()
+        peak = _peak_rss_mb
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    elapsed = (time.perf_counter() - start) / repeat
+    queue.put((elapsed, max(0.0, peak() - before)))
+
+
+def measure(func, *args, repeat=3):
+    """在獨立子程序中執行func，返回(平均秒數, 執行期間的峰值RSS增量 MB)"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(func, args, repeat, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def print_comparison(label, baseline, improved):
+    """輸出基準與改進版本的比較結果"""
+    (t0, m0), (t1, m1) = baseline, improved
+    speedup = t0 / t1 if t1 > 0 else float('inf')
+    print(f"  {label:<12} 時間 {t0 * 1000:9.1f} ms → {t1 * 1000:9.1f} ms ({speedup:5.1f}x)   "
+          f"峰值RSS增量 {m0:7.1f} MB → {m1:7.1f} MB")
+
+
+# ---------------------------------------------------------------------------
+# ingest: 單次解析 vs 每個檔案讀取三次
+# ---------------------------------------------------------------------------
+
+def _ingest_legacy(filepath, config):
+    """舊版流程：統計、預覽、時間序列各自重新讀取一次CSV"""
+    frames = []
+    for _ in range(3):
+        if config['type'] == 'Noraxon':
+            df = pd.read_csv(filepath, skiprows=3, encoding='utf-8')
+        else:
+            df = pd.read_csv(filepath, header=None, encoding='utf-8')
+        for column in config['channels'].values():
+            pd.to_numeric(df[column], errors='coerce').dropna()
+        frames.append(df)
+    return frames
+
+
+def _ingest_single_pass(filepath, config):
+    return load_recording(filepath, config)
+
+
+def bench_ingest(args):
+    print("📊 CSV讀取: 每檔三次讀取 → 單次解析")
+    for name, config in BENCHMARK_FILES.items():
+        if not os.path.exists(config['path']):
+            print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+            continue
+        baseline = measure(_ingest_legacy, config['path'], config, repeat=args.repeat)
+        improved = measure(_ingest_single_pass, config['path'], config, repeat=args.repeat)
+        print_comparison(name, baseline, improved)
+
+
+# ---------------------------------------------------------------------------
+# parse: 完整DataFrame型別推斷 vs 依設備設定檔只解析通道欄位
+# ---------------------------------------------------------------------------
+
+def _parse_full_frame(filepath, config):
+    return load_recording(filepath, config)['channels']
+
+
+def _parse_typed(filepath, config, dtype):
+    return read_channels(filepath, config, dtype)
+
+
+def bench_parse(args):
+    scale = max(1, args.scale // 10)
+    engine = 'pyarrow' if emg_loader.pyarrow is not None else 'NumPy'
+    print(f"📊 通道解析: 完整DataFrame → 只解析通道欄位 ({engine}解析器，各檔案 × {scale})")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, config in BENCHMARK_FILES.items():
+            if not os.path.exists(config['path']):
+                print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+                continue
+            scaled = scaled_copy(config, scale, directory)
+            baseline = measure(_parse_full_frame, scaled['path'], scaled, repeat=args.repeat)
+            for dtype in (np.float64, np.float32):
+                improved = measure(_parse_typed, scaled['path'], scaled, dtype, repeat=args.repeat)
+                print_comparison(f"{name} {np.dtype(dtype).name}", baseline, improved)
+
+
+# ---------------------------------------------------------------------------
+# columnar: 解析CSV vs 讀取轉換後的 Parquet/Feather 通道欄位
+# ---------------------------------------------------------------------------
+
+def bench_columnar(args):
+    if emg_loader.pyarrow is None:
+        print("  ⚠️ 未安裝 pyarrow，已跳過 columnar 測試")
+        return
+    print(f"📊 通道載入: 解析CSV → 讀取欄式檔案的通道欄位 (各檔案 × {args.scale}, zstd)")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, config in BENCHMARK_FILES.items():
+            if not os.path.exists(config['path']):
+                print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+                continue
+            scaled = scaled_copy(config, args.scale, directory)
+            paths = {fmt: os.path.splitext(scaled['path'])[0] + '.' + fmt for fmt in ('parquet', 'feather')}
+            table = recording_table(scaled)
+            for fmt, path in paths.items():
+                write_table(table, path, fmt)
+            csv_mb = os.path.getsize(scaled['path']) / (1024 * 1024)
+            baseline = measure(_parse_typed, scaled['path'], scaled, np.float64, repeat=args.repeat)
+            for fmt, path in paths.items():
+                columnar = {**scaled, 'path': path, 'format': fmt}
+                improved = measure(_parse_typed, path, columnar, np.float64, repeat=args.repeat)
+                print_comparison(f"{name} {fmt}", baseline, improved)
+                print(f"  {'':<12} 檔案大小 {csv_mb:7.1f} MB → {os.path.getsize(path) / (1024 * 1024):7.1f} MB")
+
+
+# ---------------------------------------------------------------------------
+# preview: 欄式匯出 vs iterrows
+# ---------------------------------------------------------------------------
+
+def _preview_iterrows(filepath, config):
+    """舊版流程：逐列iterrows建立預覽列表"""
+    df = load_recording(filepath, config)['frame']
+    preview_data = []
+    for i, row in df.iterrows():
+        preview_data.append(row.tolist())
+    return preview_data
+
+
+def _preview_columnar(filepath, config):
+    return build_raw_preview(load_recording(filepath, config))
+
+
+def bench_preview(args):
+    print("📊 原始數據預覽: iterrows → 欄式匯出")
+    for name, config in BENCHMARK_FILES.items():
+        if not os.path.exists(config['path']):
+            print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+            continue
+        baseline = measure(_preview_iterrows, config['path'], config, repeat=args.repeat)
+        improved = measure(_preview_columnar, config['path'], config, repeat=args.repeat)
+        print_comparison(name, baseline, improved)
+
+
+# ---------------------------------------------------------------------------
+# encoding: 時間序列內嵌格式 (縮排JSON vs base64 float32 / int16)
+# ---------------------------------------------------------------------------
+
+def bench_encoding(args):
+    print("📊 時間序列內嵌大小: 縮排JSON → base64二進位")
+    for name, config in BENCHMARK_FILES.items():
+        if not os.path.exists(config['path']):
+            print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+            continue
+        channels = load_recording(config['path'], config)['channels']
+        payloads = {
+            'JSON': json.dumps({k: v.tolist() for k, v in channels.items()}, indent=2),
+            'float32': json.dumps({k: encode_series(v, 'float32') for k, v in channels.items()}),
+            'int16': json.dumps({k: encode_series(v, 'int16') for k, v in channels.items()})
+        }
+        base_size = len(payloads['JSON'])
+        for label, payload in payloads.items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                json.loads(payload)
+            parse_ms = (time.perf_counter() - start) / args.repeat * 1000
+            print(f"  {name:<12} {label:<8} {len(payload) / 1024:9.1f} KB ({base_size / len(payload):5.1f}x)   "
+                  f"JSON解析 {parse_ms:7.2f} ms")
+
+
+# ---------------------------------------------------------------------------
+# pyramid: 降採樣金字塔 tile 查詢 vs 每次對整段數據降採樣
+# ---------------------------------------------------------------------------
+
+def _timed(func, *args, repeat=3):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def bench_pyramid(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    values = np.tile(load_recording(config['path'], config)['channels']['quad'], args.scale)
+    print(f"📊 降採樣金字塔: Noraxon 股四頭肌 × {args.scale} ({len(values):,} 點)")
+
+    build_time, pyramid = _timed(build_pyramid, values, repeat=args.repeat)
+    print(f"  建立金字塔 {build_time * 1000:9.1f} ms  層級: {[len(level['y']) for level in pyramid]}")
+
+    points = 2000
+    for label, start, stop in [('全範圍', 0, len(values)),
+                               ('10%範圍', 0, len(values) // 10),
+                               ('0.1%範圍', 0, len(values) // 1000)]:
+        bucket = max(1, -(-2 * (stop - start) // points))
+        naive_time, _ = _timed(minmax_decimate, values[start:stop], bucket, repeat=args.repeat)
+        tile_time, (x, y) = _timed(pyramid_tile, values, pyramid, start, stop, points, repeat=args.repeat)
+        peak_kept = np.max(y) == np.max(values[start:stop])
+        print(f"  {label:<8} 直接降採樣 {naive_time * 1000:8.2f} ms → tile {tile_time * 1000:8.2f} ms "
+              f"({naive_time / tile_time:6.1f}x)  點數 {len(y):5d}  峰值保留: {'是' if peak_kept else '否'}")
+
+
+# ---------------------------------------------------------------------------
+# envelope: 向量化窗口RMS vs 逐窗口迴圈 (原頁面JS的計算方式)
+# ---------------------------------------------------------------------------
+
+def _windowed_rms_loop(values, fs, window_s):
+    window = int(fs * window_s)
+    times, rms = [], []
+    for i in range(0, len(values), window):
+        segment = values[i:i + window]
+        rms.append(np.sqrt(np.mean(segment ** 2)))
+        times.append(i / fs)
+    return times, rms
+
+
+def bench_envelope(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    values = np.tile(load_recording(config['path'], config)['channels']['quad'], args.scale)
+    print(f"📊 0.1秒窗口RMS: Noraxon 股四頭肌 × {args.scale} ({len(values):,} 點)")
+    for label, window_s in [('0.1秒窗口', 0.1), ('0.01秒窗口', 0.01)]:
+        loop_time, _ = _timed(_windowed_rms_loop, values, 2000, window_s, repeat=args.repeat)
+        vector_time, _ = _timed(windowed_rms, values, 2000, window_s, repeat=args.repeat)
+        print(f"  {label:<10} 迴圈 {loop_time * 1000:9.1f} ms → windowed_rms {vector_time * 1000:7.1f} ms "
+              f"({loop_time / vector_time:6.1f}x)")
+
+
+# ---------------------------------------------------------------------------
+# filter: 二維陣列一次前處理 vs 逐通道迴圈
+# ---------------------------------------------------------------------------
+
+FILTER_STAGES = ('bandpass', 'notch', 'envelope')
+
+# (通道數, 每通道採樣點數)：少量長記錄與多通道短片段
+FILTER_SHAPES = [(2, None), (16, None), (64, 8000)]
+
+
+def _condition_loop(data, fs, stages):
+    """舊式寫法：逐通道呼叫，每個通道重新設計濾波器"""
+    return np.array([condition(channel, fs, stages) for channel in data])
+
+
+def _condition_ba(data, fs):
+    """以 (b, a) 係數與 filtfilt 實作相同流程，作為數值參考"""
+    results = []
+    for channel in data:
+        b, a = sps.butter(4, [20, 450], btype='bandpass', fs=fs)
+        filtered = sps.filtfilt(b, a, channel)
+        b, a = sps.iirnotch(60, 30, fs=fs)
+        filtered = np.abs(sps.filtfilt(b, a, filtered))
+        b, a = sps.butter(4, 6, btype='lowpass', fs=fs)
+        results.append(sps.filtfilt(b, a, filtered))
+    return np.array(results)
+
+
+def bench_filter(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    channels = load_recording(config['path'], config)['channels']
+    base = np.vstack([channels['quad'], channels['bicep']])
+    print(f"📊 前處理 {' → '.join(FILTER_STAGES)} (2000 Hz)")
+    for n_channels, n_samples in FILTER_SHAPES:
+        data = np.tile(base, (n_channels // 2, 1))[:, :n_samples]
+        loop_time, _ = _timed(_condition_loop, data, 2000, FILTER_STAGES, repeat=args.repeat)
+        vector_time, result = _timed(condition, data, 2000, FILTER_STAGES, repeat=args.repeat)
+        difference = np.max(np.abs(result - _condition_ba(data, 2000))) / np.max(np.abs(result))
+        print(f"  {n_channels:3d} 通道 × {data.shape[1]:7,} 點  逐通道 {loop_time * 1000:8.1f} ms → "
+              f"二維 {vector_time * 1000:8.1f} ms ({loop_time / vector_time:4.1f}x)  與(b,a)差異 {difference:.1e}")
+
+
+# ---------------------------------------------------------------------------
+# spectral: 批次STFT的MNF/MDF vs 逐通道逐窗口FFT
+# ---------------------------------------------------------------------------
+
+def _spectral_loop(data, fs):
+    """舊式寫法：逐通道、逐窗口計算FFT與MNF/MDF"""
+    window = int(fs * SPECTRAL_WINDOW_S)
+    hop = int(fs * SPECTRAL_HOP_S)
+    taper = np.hanning(window)
+    freqs = np.fft.rfftfreq(window, 1 / fs)
+    low, high = spectral_band(fs)
+    band = (freqs >= low) & (freqs <= high)
+    results = []
+    for channel in data:
+        mnf, mdf = [], []
+        for start in range(0, len(channel) - window + 1, hop):
+            segment = channel[start:start + window]
+            power = np.abs(np.fft.rfft((segment - segment.mean()) * taper)) ** 2
+            power, f = power[band], freqs[band]
+            mnf.append(np.sum(f * power) / np.sum(power))
+            cumulative = np.cumsum(power)
+            mdf.append(f[np.searchsorted(cumulative, cumulative[-1] / 2)])
+        results.append((mnf, mdf))
+    return results
+
+
+def bench_spectral(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    channels = load_recording(config['path'], config)['channels']
+    data = np.tile(np.vstack([channels['quad'], channels['bicep']]), (1, args.scale))
+    samples = data.size
+    print(f"📊 MNF/MDF ({SPECTRAL_WINDOW_S}秒窗口，{SPECTRAL_HOP_S}秒間隔): Noraxon 2通道 × {args.scale} "
+          f"({data.shape[1]:,} 點/通道)")
+    loop_time, _ = _timed(_spectral_loop, data, 2000, repeat=args.repeat)
+    batch_time, metrics = _timed(spectral_metrics, data, 2000, repeat=args.repeat)
+    print(f"  逐窗口迴圈 {loop_time * 1000:9.1f} ms ({samples / loop_time / 1e6:6.1f} M點/秒) → "
+          f"spectral_metrics {batch_time * 1000:8.1f} ms ({samples / batch_time / 1e6:6.1f} M點/秒, "
+          f"{loop_time / batch_time:4.1f}x)  窗口數 {metrics['mdf'].shape[1]:,}")
+
+
+# ---------------------------------------------------------------------------
+# onset: 收縮偵測的執行時間隨記錄長度線性增加
+# ---------------------------------------------------------------------------
+
+def bench_onset(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    values = load_recording(config['path'], config)['channels']['quad']
+    print(f"📊 收縮偵測 (burst_statistics): Noraxon 股四頭肌重複 1 ~ {args.scale} 次")
+    for scale in sorted({1, max(1, args.scale // 10), args.scale}):
+        data = np.tile(values, scale)
+        elapsed, bursts = _timed(burst_statistics, data, 2000, repeat=args.repeat)
+        print(f"  {len(data):>11,} 點  {elapsed * 1000:9.1f} ms  每點 {elapsed / len(data) * 1e9:6.1f} ns  "
+              f"收縮 {len(bursts['onsets']):5d} 次")
+
+
+# ---------------------------------------------------------------------------
+# stream: 分塊串流統計 vs 整個檔案載入記憶體
+# ---------------------------------------------------------------------------
+
+def scaled_copy(config, scale, directory):
+    """將範例檔案的資料列重複 scale 次寫入暫存檔，模擬長時間記錄，返回新設定"""
+    header_lines = 4 if config['type'] == 'Noraxon' else 0
+    with open(config['path'], 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    header, rows = b''.join(lines[:header_lines]), b''.join(lines[header_lines:])
+    path = os.path.join(directory, f"scaled_{scale}_{os.path.basename(config['path'])}")
+    with open(path, 'wb') as f:
+        f.write(header)
+        for _ in range(scale):
+            f.write(rows)
+    return {**config, 'path': path}
+
+
+def _stats_in_memory(filepath, config):
+    channels = load_recording(filepath, config)['channels']
+    return {key: StreamingStats().update(values).result() for key, values in channels.items()}
+
+
+def _stats_streaming(filepath, config, chunksize):
+    return stream_file_statistics(filepath, config, chunksize)
+
+
+def bench_stream(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        scaled = scaled_copy(config, args.scale, directory)
+        size_mb = os.path.getsize(scaled['path']) / (1024 * 1024)
+        print(f"📊 統計計算: 整檔載入 → 分塊串流 (Noraxon × {args.scale}, {size_mb:.0f} MB)")
+        baseline = measure(_stats_in_memory, scaled['path'], scaled, repeat=1)
+        improved = measure(_stats_streaming, scaled['path'], scaled, 200_000, repeat=1)
+        print_comparison('Noraxon', baseline, improved)
+
+
+# ---------------------------------------------------------------------------
+# quantile: t-digest 近似分位數 vs np.percentile 精確分位數
+# ---------------------------------------------------------------------------
+
+def _filtered_exact_copy(values):
+    """舊版流程：兩次 np.percentile 後建立篩選後副本再計算統計"""
+    lower, upper = np.percentile(values, 2.5), np.percentile(values, 97.5)
+    filtered = values[(values >= lower) & (values <= upper)]
+    return StreamingStats().update(filtered).result()
+
+
+def _filtered_tdigest(values):
+    lower, upper = outlier_bounds(values, 'tdigest')
+    return filtered_statistics(iter_blocks(values), lower, upper)
+
+
+def _outlier_stats_in_memory(filepath, config):
+    channels = load_recording(filepath, config)['channels']
+    return {key: _filtered_exact_copy(values) for key, values in channels.items()}
+
+
+def _outlier_stats_streaming(filepath, config, chunksize):
+    return stream_file_statistics(filepath, config, chunksize, remove_outliers=True)
+
+
+def bench_quantile(args):
+    print("📊 異常值分位數: np.percentile 精確值 vs t-digest 近似值")
+    print("  (名次誤差 = 估計分位點實際所在名次 - 目標名次)")
+    for name, config in BENCHMARK_FILES.items():
+        if not os.path.exists(config['path']):
+            print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+            continue
+        values = load_recording(config['path'], config)['channels']['quad']
+        if name == 'Noraxon':
+            name, values = f"Noraxon×{args.scale}", np.tile(values, args.scale)
+
+        exact_time, exact = _timed(_filtered_exact_copy, values, repeat=args.repeat)
+        approx_time, approx = _timed(_filtered_tdigest, values, repeat=args.repeat)
+        lower, upper = outlier_bounds(values, 'tdigest')
+        rank_error = max(abs(np.mean(values < lower) - 0.025), abs(np.mean(values <= upper) - 0.975))
+        rms_error = abs(approx['RMS'] - exact['RMS']) / exact['RMS'] if exact['RMS'] else 0.0
+        print(f"  {name:<12} 時間 {exact_time * 1000:8.1f} ms → {approx_time * 1000:8.1f} ms   "
+              f"名次誤差 {rank_error * 100:.4f}%   RMS_filtered相對誤差 {rms_error * 100:.4f}%")
+
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        scaled = scaled_copy(config, args.scale, directory)
+        print(f"📊 含異常值處理的檔案統計: 整檔載入+精確分位數 → 兩次串流+t-digest (Noraxon × {args.scale})")
+        baseline = measure(_outlier_stats_in_memory, scaled['path'], scaled, repeat=1)
+        improved = measure(_outlier_stats_streaming, scaled['path'], scaled, 200_000, repeat=1)
+        print_comparison('Noraxon', baseline, improved)
+
+
+# ---------------------------------------------------------------------------
+# cache: 重新解析CSV vs 由 .emg_cache 記憶體映射載入
+# ---------------------------------------------------------------------------
+
+def _channels_parsed(filepath, config):
+    return load_recording(filepath, config)['channels']
+
+
+def _channels_cached(filepath, config, cache_dir):
+    channels = load_channels(filepath, config, cache_dir)
+    # 讀取全部數據，計入實際載入成本
+    return {key: float(np.sum(values)) for key, values in channels.items()}
+
+
+def bench_cache(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        scaled = scaled_copy(config, args.scale, directory)
+        cache_dir = os.path.join(directory, 'cache')
+        # 先建立快取，測量的是重新執行時的命中情況
+        load_channels(scaled['path'], scaled, cache_dir)
+        size_mb = os.path.getsize(scaled['path']) / (1024 * 1024)
+        print(f"📊 通道載入: 重新解析CSV → 快取記憶體映射 (Noraxon × {args.scale}, {size_mb:.0f} MB)")
+        baseline = measure(_channels_parsed, scaled['path'], scaled, repeat=args.repeat)
+        improved = measure(_channels_cached, scaled['path'], scaled, cache_dir, repeat=args.repeat)
+        print_comparison('Noraxon', baseline, improved)
+
+
+# ---------------------------------------------------------------------------
+# window: 載入整個記錄為Python列表再切片 vs 通道儲存的記憶體映射窗口
+# ---------------------------------------------------------------------------
+
+WINDOW_S = 10
+
+
+def _window_from_lists(filepath, config, t0, sampling_rate):
+    """舊版 time_series_data 的方式：整個通道轉為Python列表後取出窗口"""
+    values = read_channels(filepath, config)['quad'].tolist()
+    start = int(t0 * sampling_rate)
+    window = values[start:start + int(WINDOW_S * sampling_rate)]
+    return StreamingStats().update(window).result()
+
+
+def _window_from_store(store_path, t0):
+    store = ChannelStore.open(store_path)
+    return StreamingStats().update(store.window('quad', t0, t0 + WINDOW_S)).result()
+
+
+def bench_window(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        scaled = scaled_copy(config, args.scale, directory)
+        cache_dir = os.path.join(directory, 'cache')
+        store = load_channel_store(scaled['path'], scaled, cache_dir)
+        store_path = store.channel('quad').filename
+        duration = len(store.channel('quad')) / store.sampling_rate
+        t0 = duration / 2
+        print(f"📊 {WINDOW_S} 秒窗口統計: 整個記錄轉為列表 → 通道儲存記憶體映射 "
+              f"(Noraxon × {args.scale}, {duration:.0f} 秒)")
+        baseline = measure(_window_from_lists, scaled['path'], scaled, t0, store.sampling_rate, repeat=1)
+        improved = measure(_window_from_store, store_path, t0, repeat=args.repeat)
+        print_comparison('Noraxon', baseline, improved)
+        size_mb = os.path.getsize(store_path) / (1024 * 1024)
+        print(f"  {'':<12} 通道儲存 {size_mb:.1f} MB (float32)")
+
+
+# ---------------------------------------------------------------------------
+# model: 保留DataFrame與統計字典 vs Recording 物件 (float32 通道 + 結構化統計陣列)
+# ---------------------------------------------------------------------------
+
+def _model_frame(filepath, config):
+    """舊版流程：保留整個DataFrame供繪圖，統計為字典"""
+    recording = load_recording(filepath, config)
+    stats = {
+        key: StreamingStats().update(np.asarray(recording['channels'][key], dtype=np.float64)).result()
+        for key in config['channels']
+    }
+    return {'data': recording['frame'], 'config': config, 'stats': stats}
+
+
+def _model_recording(filepath, config):
+    return Recording.from_channels(os.path.basename(filepath), config, read_channels(filepath, config))
+
+
+def _retained_mb(func, *args):
+    """func 返回的物件在建立後仍佔用的記憶體 (MB，以 tracemalloc 量測，不含已釋放的暫存)"""
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained / (1024 * 1024)
+
+
+def bench_model(args):
+    scale = max(1, args.scale // 10)
+    print(f"📊 每個記錄保留的記憶體: DataFrame + 統計字典 → Recording 物件 (各檔案 × {scale})")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, config in BENCHMARK_FILES.items():
+            if not os.path.exists(config['path']):
+                print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+                continue
+            scaled = scaled_copy(config, scale, directory)
+            baseline = measure(_model_frame, scaled['path'], scaled, repeat=args.repeat)
+            improved = measure(_model_recording, scaled['path'], scaled, repeat=args.repeat)
+            print_comparison(name, baseline, improved)
+            before = _retained_mb(_model_frame, scaled['path'], scaled)
+            after = _retained_mb(_model_recording, scaled['path'], scaled)
+            print(f"  {'':<12} 保留記憶體 {before:7.2f} MB → {after:7.2f} MB ({before / after:5.1f}x)")
+
+
+# ---------------------------------------------------------------------------
+# channels: 逐通道計算統計 vs (採樣點, 通道) 二維陣列一次計算
+# ---------------------------------------------------------------------------
+
+# (通道數, 每個通道的數據點數；None 為整個 Noraxon 記錄)
+CHANNEL_SHAPES = [(2, None), (16, None), (64, None), (256, 2000)]
+
+
+def _channel_stats_loop(channels, sampling_rate):
+    """舊式寫法：每個通道各自計算統計、分位數、篩選與收縮偵測"""
+    results = {}
+    for key, values in channels.items():
+        lower, upper = outlier_bounds(values)
+        results[key] = with_filtered_statistics(StreamingStats().update(values).result(),
+                                                filtered_statistics(iter_blocks(values), lower, upper), True)
+        results[key]['Burst_count'] = len(burst_statistics(values, sampling_rate)['onsets'])
+    return results
+
+
+def _channel_stats_matrix(channels, sampling_rate):
+    return calculate_channel_statistics(channels, sampling_rate=sampling_rate)
+
+
+def bench_channels(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    channels = load_recording(config['path'], config)['channels']
+    sampling_rate = recording_timing(config['path'], config)['sampling_rate']
+    base = [channels['quad'], channels['bicep']]
+    print("📊 原始與異常值處理後統計與收縮偵測 (精確分位數): 逐通道 → (採樣點, 通道) 二維陣列")
+    for n_channels, n_samples in CHANNEL_SHAPES:
+        data = {f"ch{i}": base[i % 2][:n_samples] for i in range(n_channels)}
+        # 先各執行一次，排除第一次呼叫的載入成本
+        _channel_stats_loop(data, sampling_rate)
+        _channel_stats_matrix(data, sampling_rate)
+        loop_time, expected = _timed(_channel_stats_loop, data, sampling_rate, repeat=args.repeat)
+        matrix_time, result = _timed(_channel_stats_matrix, data, sampling_rate, repeat=args.repeat)
+        difference = max(abs(result[key]['RMS_filtered'] - stats['RMS_filtered']) / stats['RMS_filtered']
+                         for key, stats in expected.items())
+        same_bursts = all(result[key]['Burst_count'] == stats['Burst_count'] for key, stats in expected.items())
+        print(f"  {n_channels:3d} 通道 × {len(data['ch0']):6,} 點  逐通道 {loop_time * 1000:8.1f} ms → "
+              f"二維 {matrix_time * 1000:8.1f} ms ({loop_time / matrix_time:4.1f}x)  RMS_filtered差異 {difference:.1e}  "
+              f"收縮次數{'一致' if same_bursts else '不一致'}")
+
+
+# ---------------------------------------------------------------------------
+# incremental: 全部重新分析 vs 只重新計算改變的記錄
+# ---------------------------------------------------------------------------
+
+INCREMENTAL_RECORDINGS = 20
+
+
+def _analyze_directory(data_dir, cache_dir, include_raw_preview=False):
+    with contextlib.redirect_stdout(io.StringIO()):
+        # include_raw_preview=False 與 start_web_server 相同，True 為內嵌原始數據的報告
+        return analyze_emg_data(include_raw_preview=include_raw_preview, data_dir=data_dir,
+                                cache_dir=cache_dir, time_series_encoding='float32')
+
+
+def bench_incremental(args):
+    config = BENCHMARK_FILES['Noraxon']
+    if not os.path.exists(config['path']):
+        print(f"  ⚠️ 檔案不存在，已跳過: {config['path']}")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        data_dir = os.path.join(directory, 'data')
+        os.makedirs(data_dir)
+        scaled = scaled_copy(config, max(1, args.scale // 10), data_dir)
+        for i in range(1, INCREMENTAL_RECORDINGS):
+            with open(scaled['path'], 'rb') as src, open(os.path.join(data_dir, f"recording_{i}.csv"), 'wb') as dst:
+                dst.write(src.read())
+        cache_dir = os.path.join(directory, 'cache')
+
+        print(f"📊 報告重新分析: 全部重新計算 → 只重新計算改變的記錄 "
+              f"({INCREMENTAL_RECORDINGS} 個記錄，修改其中1個)")
+        for label, include_raw_preview in (('服務器模式', False), ('內嵌原始數據', True)):
+            # 先以相同模式建立快取 (內嵌模式另外快取原始數據預覽)，再修改其中一個記錄 (附加一列數據)
+            _analyze_directory(data_dir, cache_dir, include_raw_preview)
+            with open(scaled['path'], 'a', encoding='utf-8') as f:
+                f.write('0.00000,,,1.0,1.0\n')
+            baseline = measure(_analyze_directory, data_dir, None, include_raw_preview, repeat=1)
+            improved = measure(_analyze_directory, data_dir, cache_dir, include_raw_preview, repeat=1)
+            print_comparison(label, baseline, improved)
+
+
+BENCHMARKS = {
+    'ingest': bench_ingest,
+    'parse': bench_parse,
+    'columnar': bench_columnar,
+    'preview': bench_preview,
+    'encoding': bench_encoding,
+    'pyramid': bench_pyramid,
+    'envelope': bench_envelope,
+    'filter': bench_filter,
+    'spectral': bench_spectral,
+    'onset': bench_onset,
+    'stream': bench_stream,
+    'quantile': bench_quantile,
+    'cache': bench_cache,
+    'window': bench_window,
+    'model': bench_model,
+    'channels': bench_channels,
+    'incremental': bench_incremental,
+}
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description='EMG分析效能基準測試')
+    parser.add_argument('benchmark', nargs='*',
+                        help=f"要執行的測試項目 (預設全部): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=3, help='每個測試重複次數')
+    parser.add_argument('--scale', type=int, default=100, help='長時間記錄測試的數據放大倍數')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.benchmark if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的測試項目: {', '.join(unknown)}")
+
+    for name in args.benchmark or BENCHMARKS:
+        BENCHMARKS[name](args)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 通道數據與分析產物快取
+
+第一次解析CSV後，將肌肉通道以 .npy 格式存入 .emg_cache/ (每個通道一個檔案)，並以JSON記錄來源檔案資訊:
+    .emg_cache/<鍵值>/<通道鍵值>.npy
+    .emg_cache/<鍵值>/meta.json
+    .emg_cache/<鍵值>/<產物名稱>-<參數雜湊>.json   (依該檔案計算的分析結果)
+    .emg_cache/<鍵值>/channels[-<前處理>].emgstore  (時間窗口讀取用的float32通道，見 emg_store)
+    .emg_cache/<鍵值>/preview.npz                   (原始數據預覽的全部欄位，見 store_preview)
+
+鍵值由檔案絕對路徑與通道設定決定；來源檔案的大小與修改時間相同即視為命中，
+修改時間改變但大小相同時再比對內容雜湊，內容未變則沿用快取。
+命中時以 np.load(mmap_mode='r') 記憶體映射載入，不需重新解析文字。
+快取總大小超過上限時，依最後使用時間(LRU)刪除最舊的項目。
+
+分析產物依來源檔案與計算參數追蹤相依關係：來源內容改變時該檔案的所有產物失效，
+參數改變時對應不同的產物檔案，因此重新產生報告時只需重新計算過期的記錄。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from emg_loader import read_channels, recording_timing
+from emg_signal import condition_channels
+from emg_store import ChannelStore, write_store
+
+# 預設快取資料夾與總大小上限
+CACHE_DIR = '.emg_cache'
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# 快取格式版本，格式改變時遞增使舊快取失效
+CACHE_VERSION = 2
+
+# 通道二進位儲存的副檔名
+STORE_SUFFIX = '.emgstore'
+
+# 原始數據預覽的欄位快取檔名
+PREVIEW_FILENAME = 'preview.npz'
+
+
+def file_digest(filepath, chunk_size=16 * 1024 * 1024):
+    """計算檔案內容的 BLAKE2b 雜湊"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(filepath, config):
+    """依檔案絕對路徑與通道設定產生快取鍵值"""
+    source = json.dumps([CACHE_VERSION, os.path.abspath(filepath), config['type'],
+                         list(config['channels'].items())], ensure_ascii=False)
+    return hashlib.blake2b(source.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _read_meta(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(entry_dir, meta):
+    """先寫入暫存檔再替換，避免其他程序讀到不完整的JSON"""
+    path = os.path.join(entry_dir, 'meta.json')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _fresh_entry(filepath, config, cache_dir):
+    """返回來源檔案未改變的快取項目 (資料夾, meta)，不存在或已過期時返回 (資料夾, None)"""
+    entry_dir = os.path.join(cache_dir, cache_key(filepath, config))
+    meta = _read_meta(entry_dir)
+    if meta is None:
+        return entry_dir, None
+
+    stat = os.stat(filepath)
+    if stat.st_size != meta['size']:
+        return entry_dir, None
+    if stat.st_mtime_ns != meta['mtime_ns']:
+        # 修改時間改變 (例如複製或touch)，內容相同時仍可沿用
+        if file_digest(filepath) != meta['digest']:
+            return entry_dir, None
+        meta['mtime_ns'] = stat.st_mtime_ns
+    return entry_dir, meta
+
+
+def _entry_bytes(entry_dir):
+    """快取項目中所有檔案的總大小"""
+    return sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+
+
+def load_cached_channels(filepath, config, cache_dir=CACHE_DIR):
+    """返回快取中的 {通道鍵值: ndarray} (唯讀記憶體映射)，未命中時返回None"""
+    entry_dir, meta = _fresh_entry(filepath, config, cache_dir)
+    if meta is None:
+        return None
+
+    try:
+        channels = {
+            key: np.load(os.path.join(entry_dir, f"{key}.npy"), mmap_mode='r')
+            for key in config['channels']
+        }
+    except (OSError, ValueError):
+        return None
+
+    meta['last_access'] = time.time()
+    _write_meta(entry_dir, meta)
+    return channels
+
+
+def store_channels(filepath, config, channels, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """將通道數據寫入快取，並在超過總大小上限時淘汰最久未使用的項目"""
+    stat = os.stat(filepath)
+    digest = file_digest(filepath)
+    entry_dir = os.path.join(cache_dir, cache_key(filepath, config))
+    os.makedirs(entry_dir, exist_ok=True)
+
+    # 來源內容改變時，依舊內容計算的分析產物與通道儲存一併失效
+    previous = _read_meta(entry_dir)
+    if previous is None or previous['digest'] != digest:
+        for entry in os.scandir(entry_dir):
+            if entry.name.endswith(('.json', STORE_SUFFIX, PREVIEW_FILENAME)) and entry.name != 'meta.json':
+                os.remove(entry.path)
+
+    for key in config['channels']:
+        path = os.path.join(entry_dir, f"{key}.npy")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(channels[key], dtype=np.float64))
+        os.replace(tmp_path, path)
+
+    _write_meta(entry_dir, {
+        'version': CACHE_VERSION,
+        'path': os.path.abspath(filepath),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'digest': digest,
+        'type': config['type'],
+        'channels': config['channels'],
+        'bytes': _entry_bytes(entry_dir),
+        'last_access': time.time()
+    })
+    evict(cache_dir, max_bytes)
+
+
+def _artifact_path(entry_dir, name, params):
+    """產物檔案路徑，檔名包含計算參數的雜湊"""
+    source = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    params_key = hashlib.blake2b(source.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(entry_dir, f"{name}-{params_key}.json")
+
+
+def load_artifact(filepath, config, name, params, cache_dir=CACHE_DIR):
+    """返回以 params 計算、且來源檔案未改變的分析產物，不存在或已過期時返回None"""
+    entry_dir, meta = _fresh_entry(filepath, config, cache_dir)
+    if meta is None:
+        return None
+    try:
+        with open(_artifact_path(entry_dir, name, params), encoding='utf-8') as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    meta['last_access'] = time.time()
+    _write_meta(entry_dir, meta)
+    return artifact
+
+
+def store_artifact(filepath, config, name, params, artifact, cache_dir=CACHE_DIR,
+                   max_bytes=CACHE_MAX_BYTES):
+    """儲存依檔案計算的分析產物 (可JSON序列化的字典)
+
+    產物附屬於該檔案的通道快取項目，需先以 store_channels 建立項目；項目不存在時不儲存。
+    """
+    entry_dir, meta = _fresh_entry(filepath, config, cache_dir)
+    if meta is None:
+        return
+    path = _artifact_path(entry_dir, name, params)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    meta['bytes'] = _entry_bytes(entry_dir)
+    meta['last_access'] = time.time()
+    _write_meta(entry_dir, meta)
+    evict(cache_dir, max_bytes)
+
+
+def store_preview(filepath, config, headers, columns, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """儲存原始數據預覽的全部欄位 (ndarray 列表)，附屬於通道快取項目，項目不存在時不儲存
+
+    數值欄位保留原本的dtype；其他欄位只存非缺值的位置與字串 (例如大多為空的 Activity 欄)，
+    不需pickle即可載入。
+    """
+    entry_dir, meta = _fresh_entry(filepath, config, cache_dir)
+    if meta is None:
+        return
+    arrays = {'headers': np.array([str(header) for header in headers])}
+    for i, values in enumerate(columns):
+        values = np.asarray(values)
+        if values.dtype.kind in 'biuf':
+            arrays[f"c{i}"] = values
+        else:
+            present = np.flatnonzero(~pd.isna(values))
+            arrays[f"i{i}"] = present
+            arrays[f"s{i}"] = values[present].astype(str)
+            arrays[f"n{i}"] = np.array(len(values))
+
+    path = os.path.join(entry_dir, PREVIEW_FILENAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+    meta['bytes'] = _entry_bytes(entry_dir)
+    meta['last_access'] = time.time()
+    _write_meta(entry_dir, meta)
+    evict(cache_dir, max_bytes)
+
+
+def load_preview(filepath, config, cache_dir=CACHE_DIR):
+    """返回快取的原始數據預覽 (欄位標題, [ndarray])，未命中或來源檔案已改變時返回None
+
+    字串欄位的缺值為None (object陣列)。
+    """
+    entry_dir, meta = _fresh_entry(filepath, config, cache_dir)
+    if meta is None:
+        return None
+    try:
+        with np.load(os.path.join(entry_dir, PREVIEW_FILENAME), allow_pickle=False) as data:
+            headers = data['headers'].tolist()
+            columns = []
+            for i in range(len(headers)):
+                if f"c{i}" in data:
+                    columns.append(data[f"c{i}"])
+                else:
+                    values = np.full(int(data[f"n{i}"]), None, dtype=object)
+                    values[data[f"i{i}"]] = data[f"s{i}"].tolist()
+                    columns.append(values)
+    except (OSError, ValueError, KeyError):
+        return None
+
+    meta['last_access'] = time.time()
+    _write_meta(entry_dir, meta)
+    return headers, columns
+
+
+def _store_filename(conditioning):
+    suffix = '-' + '+'.join(conditioning) if conditioning else ''
+    return f"channels{suffix}{STORE_SUFFIX}"
+
+
+def load_channel_store(filepath, config, cache_dir=CACHE_DIR, conditioning=None, max_bytes=CACHE_MAX_BYTES):
+    """返回記錄的通道儲存 (emg_store.ChannelStore)，供時間窗口讀取
+
+    儲存檔附屬於通道快取項目，不存在時由通道數據建立一次 (conditioning 設定時儲存前處理後的通道)，
+    之後以記憶體映射開啟，不需載入整個記錄。cache_dir 為None時在記憶體中建立。
+    """
+    if cache_dir is not None:
+        entry_dir, meta = _fresh_entry(filepath, config, cache_dir)
+        if meta is not None:
+            try:
+                return ChannelStore.open(os.path.join(entry_dir, _store_filename(conditioning)))
+            except (OSError, ValueError):
+                pass
+
+    channels = load_channels(filepath, config, cache_dir, max_bytes)
+    timing = recording_timing(filepath, config)
+    if conditioning:
+        channels = condition_channels(channels, timing['sampling_rate'], conditioning)
+    if cache_dir is not None:
+        entry_dir, meta = _fresh_entry(filepath, config, cache_dir)
+    if cache_dir is None or meta is None:
+        return ChannelStore.from_channels(channels, timing['sampling_rate'], timing['times'])
+
+    path = os.path.join(entry_dir, _store_filename(conditioning))
+    write_store(path, channels, timing['sampling_rate'], timing['times'])
+    meta['bytes'] = _entry_bytes(entry_dir)
+    meta['last_access'] = time.time()
+    _write_meta(entry_dir, meta)
+    # 先開啟再淘汰，已映射的檔案即使被刪除仍可讀取
+    store = ChannelStore.open(path)
+    evict(cache_dir, max_bytes)
+    return store
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """依最後使用時間刪除最舊的快取項目，直到總大小不超過 max_bytes"""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        meta = _read_meta(entry_dir)
+        if meta is not None:
+            entries.append((meta['last_access'], meta['bytes'], entry_dir))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry_dir in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
+
+
+def parse_channels(filepath, config):
+    """只解析肌肉通道欄位，返回 {通道鍵值: ndarray}"""
+    return read_channels(filepath, config)
+
+
+def load_channels(filepath, config, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """載入檔案的肌肉通道數據，優先使用快取；cache_dir 為None時不使用快取"""
+    if cache_dir is None:
+        return parse_channels(filepath, config)
+    channels = load_cached_channels(filepath, config, cache_dir)
+    if channels is None:
+        channels = parse_channels(filepath, config)
+        store_channels(filepath, config, channels, cache_dir, max_bytes)
+    return channels
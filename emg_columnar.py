@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 記錄轉換為欄式格式 (Parquet / Feather)
+
+大量記錄重複分析時，主要成本是重新解析CSV文字。轉換後每個肌肉通道為一個 float32 欄位，
+以 zstd 壓縮；設備設定檔、採樣頻率與 Noraxon 設備資訊 (frequency、count、受試者、
+測量日期) 寫入檔案的結構描述 (schema metadata)。採樣間隔不均勻的 419/445 記錄另外保存
+每個採樣點的時間欄位。
+
+轉換後的檔案可直接放在數據資料夾中分析 (scan_recordings 依結構描述判斷設備)，
+讀取時只解碼需要的通道欄位。通道以 float32 儲存，統計結果與CSV相差在單精度誤差範圍內。
+
+    python emg_columnar.py 數據資料夾 輸出資料夾 --format parquet
+    python emg_columnar.py 數據資料夾 輸出資料夾 --format feather --workers 8
+
+需要安裝 pyarrow (pip install pyarrow)。
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from emg_batch import run_per_file
+from emg_loader import (COLUMNAR_FORMATS, TIME_COLUMN, load_recording, read_noraxon_metadata,
+                        recording_timing, require_pyarrow)
+from emg_profiles import channel_labels, scan_recordings
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# 壓縮格式與 Parquet 每個資料列群組的列數 (讀取時以群組為單位略過不符合條件的區塊)
+COMPRESSION = 'zstd'
+ROW_GROUP_ROWS = 1_000_000
+
+# 格式名稱對應的副檔名
+FORMAT_EXTENSIONS = {name: extension for extension, name in COLUMNAR_FORMATS.items()}
+
+
+def noraxon_fields(filepath):
+    """Noraxon 設備資訊中寫入結構描述的欄位"""
+    metadata = read_noraxon_metadata(filepath)
+    subject = ' '.join(part for part in (metadata.get('first_name'), metadata.get('last_name')) if part)
+    return {
+        'frequency': metadata.get('frequency'),
+        'count': metadata.get('count'),
+        'subject': subject or None,
+        'measurement_date': metadata.get('measurement_date')
+    }
+
+
+def recording_table(config):
+    """將一個CSV記錄轉為 pyarrow.Table (通道為 float32 欄位，記錄資訊在結構描述中)"""
+    require_pyarrow()
+    filepath = config['path']
+    frame = load_recording(filepath, config)['frame']
+    timing = recording_timing(filepath, config, frame)
+
+    channels = channel_labels(config)
+    columns = {}
+    for key, name in channels.items():
+        # 保留無法解析的數值為NaN，讀取時與CSV相同地移除
+        columns[name] = pd.to_numeric(frame[config['channels'][key]], errors='coerce').to_numpy(dtype=np.float32)
+    if timing['times'] is not None:
+        columns[TIME_COLUMN] = np.asarray(timing['times'], dtype=np.float64)
+
+    metadata = {
+        'profile': config['profile'],
+        'type': config['type'],
+        'channels': channels,
+        'sampling_rate': timing['sampling_rate'],
+        'sampling_rate_source': timing['source'],
+        'source_file': os.path.basename(filepath)
+    }
+    if config['type'] == 'Noraxon':
+        metadata.update(noraxon_fields(filepath))
+
+    table = pyarrow.table(columns)
+    return table.replace_schema_metadata({key: json.dumps(value) for key, value in metadata.items()})
+
+
+def write_table(table, output_path, fmt):
+    """以 zstd 壓縮寫入 Parquet 或 Feather 檔案 (先寫入暫存檔再替換)"""
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    if fmt == 'parquet':
+        pyarrow.parquet.write_table(table, tmp_path, compression=COMPRESSION, row_group_size=ROW_GROUP_ROWS)
+    else:
+        pyarrow.feather.write_feather(table, tmp_path, compression=COMPRESSION)
+    os.replace(tmp_path, output_path)
+
+
+def output_path_for(filepath, data_dir, output_dir, fmt):
+    """輸出檔案路徑：保留相對於數據資料夾的子資料夾結構 (受試者資料夾)"""
+    relative = os.path.splitext(os.path.relpath(filepath, data_dir))[0]
+    return os.path.join(output_dir, relative + FORMAT_EXTENSIONS[fmt])
+
+
+def convert_recording(name, config, data_dir, output_dir, fmt='parquet', force=False):
+    """轉換一個記錄，返回輸出路徑；輸出檔案比來源新時不重新轉換並返回None (可在子程序中執行)"""
+    output_path = output_path_for(config['path'], data_dir, output_dir, fmt)
+    if (not force and os.path.exists(output_path)
+            and os.path.getmtime(output_path) >= os.path.getmtime(config['path'])):
+        return None
+    write_table(recording_table(config), output_path, fmt)
+    return output_path
+
+
+def convert_directory(data_dir, output_dir, fmt='parquet', workers=None, force=False):
+    """轉換資料夾中所有可辨識的CSV記錄，返回 (轉換數, 略過數, 失敗數)"""
+    require_pyarrow()
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ValueError(f"不支援的格式: {fmt} (可用: {', '.join(FORMAT_EXTENSIONS)})")
+    file_configs = {
+        name: config for name, config in scan_recordings(data_dir).items()
+        if config['format'] == 'csv'
+    }
+    converted = skipped = failed = 0
+    for name, config, output_path, error in run_per_file(convert_recording, file_configs, workers,
+                                                          data_dir, output_dir, fmt, force):
+        if error is not None:
+            print(f"❌ 轉換檔案 {config['path']} 時發生錯誤: {error}")
+            failed += 1
+        elif output_path is None:
+            skipped += 1
+        else:
+            print(f"📦 {config['path']} → {output_path}")
+            converted += 1
+    return converted, skipped, failed
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description='EMG 記錄轉換：將CSV記錄轉為 Parquet/Feather 欄式檔案')
+    parser.add_argument('data_dir', help='數據資料夾 (包含子資料夾)')
+    parser.add_argument('output_dir', help='輸出資料夾 (保留子資料夾結構)')
+    parser.add_argument('--format', choices=sorted(FORMAT_EXTENSIONS), default='parquet', help='輸出格式')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='平行轉換檔案的程序數 (預設為CPU核心數)')
+    parser.add_argument('--force', action='store_true', help='重新轉換所有記錄 (預設略過已是最新的輸出檔案)')
+    args = parser.parse_args()
+
+    converted, skipped, failed = convert_directory(args.data_dir, args.output_dir, args.format,
+                                                   args.workers, args.force)
+    print(f"✅ 已轉換 {converted} 個記錄，{skipped} 個已是最新" + (f"，{failed} 個失敗" if failed else ''))
+
+
+if __name__ == "__main__":
+    main()
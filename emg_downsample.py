@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 時間序列降採樣
+
+以最小值/最大值(min-max)分桶降採樣建立多解析度金字塔，每個桶保留最小與最大兩個點，
+因此任何縮放層級都不會遺失峰值。圖表依可視寬度選擇合適層級，放大時再向服務器讀取
+較細層級的區段(tile)。
+"""
+
+import math
+
+import numpy as np
+
+
+def minmax_decimate(values, bucket, index=None):
+    """將數據每 bucket 個點分為一桶，保留每桶的最小值與最大值 (依原始順序)
+
+    index 為各點對應的原始採樣位置，預設為 0..n-1。
+    返回 (采樣位置陣列, 數值陣列)。
+    """
+    values = np.asarray(values)
+    if index is None:
+        index = np.arange(len(values), dtype=np.int64)
+    if bucket <= 1 or len(values) <= 2:
+        return index, values
+
+    # 末端不足一桶的數據補上最後一個值，不影響該桶的最小/最大值
+    n_buckets = math.ceil(len(values) / bucket)
+    pad = n_buckets * bucket - len(values)
+    padded = np.pad(values, (0, pad), mode='edge') if pad else values
+    blocks = padded.reshape(n_buckets, bucket)
+
+    arg_min = blocks.argmin(axis=1)
+    arg_max = blocks.argmax(axis=1)
+    base = np.arange(n_buckets, dtype=np.int64) * bucket
+    positions = np.column_stack((base + np.minimum(arg_min, arg_max),
+                                 base + np.maximum(arg_min, arg_max))).ravel()
+    positions = np.minimum(positions, len(values) - 1)
+    return index[positions], values[positions]
+
+
+def build_pyramid(values, min_points=1000, factor=4):
+    """建立降採樣金字塔
+
+    由桶大小 factor 開始，每層桶大小再乘以 factor，直到點數少於 2 * min_points。
+    返回由粗到細排列的層級列表，每層為 {'bucket', 'x', 'y'}，x 為原始採樣位置。
+    """
+    values = np.asarray(values)
+    levels = []
+    x, y = np.arange(len(values), dtype=np.int64), values
+    bucket = 1
+    while len(y) > 2 * min_points:
+        # 以上一層為輸入逐層降採樣，每層成本與上一層點數成正比；
+        # 上一層每桶有兩個點，因此分組大小為 2 * factor
+        x, y = minmax_decimate(y, factor if bucket == 1 else 2 * factor, index=x)
+        bucket *= factor
+        levels.append({'bucket': bucket, 'x': x, 'y': y})
+    return levels[::-1]
+
+
+def pyramid_tile(values, pyramid, start, stop, points):
+    """返回採樣區間 [start, stop) 內最多約 points 個點的降採樣數據
+
+    由金字塔中選擇仍能提供足夠點數的最粗層級切片；區間夠小時直接返回原始數據。
+    """
+    start = max(0, start)
+    stop = min(len(values), stop)
+    if stop <= start:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.asarray(values).dtype)
+    if stop - start <= points:
+        return np.arange(start, stop, dtype=np.int64), np.asarray(values[start:stop])
+
+    # 每桶貢獻兩個點，所需的最大桶大小
+    needed_bucket = 2 * (stop - start) / points
+    for level in pyramid:
+        if level['bucket'] <= needed_bucket:
+            lo, hi = np.searchsorted(level['x'], [start, stop])
+            source_x, source_y = level['x'][lo:hi], level['y'][lo:hi]
+            break
+    else:
+        source_x, source_y = np.arange(start, stop, dtype=np.int64), np.asarray(values[start:stop])
+
+    bucket = math.ceil(2 * len(source_y) / points)
+    return minmax_decimate(source_y, bucket, index=source_x)
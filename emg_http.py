@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 報告服務器的HTTP壓縮與快取驗證
+
+依瀏覽器的 Accept-Encoding 選擇 brotli 或 gzip 壓縮，並以內容雜湊產生強 ETag，
+瀏覽器帶 If-None-Match 重新驗證時內容未變即回應 304，不需重新傳送數MB的報告。
+靜態檔案的壓縮結果依檔案大小與修改時間快取於記憶體，報告產生後可預先壓縮。
+
+brotli 為選用套件 (pip install brotli)，未安裝時只提供 gzip。
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 需要壓縮的內容類型與最小大小 (較小的內容壓縮效益有限)；
+# 原始CSV不在此列，避免整個數據檔案被讀入記憶體壓縮
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/javascript', 'application/javascript',
+                      'application/json')
+COMPRESS_MIN_BYTES = 1024
+
+# 壓縮等級：gzip 6 與 brotli 5 在壓縮率與速度之間取得平衡
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def supported_encodings():
+    """返回可用的壓縮格式，依偏好順序排列"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def is_compressible(content_type, size):
+    return size >= COMPRESS_MIN_BYTES and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def choose_encoding(accept_encoding):
+    """依 Accept-Encoding 標頭選擇壓縮格式，不接受壓縮時返回None"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    """以指定格式壓縮內容；gzip 不寫入時間戳記，相同內容產生相同結果"""
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return body
+
+
+def content_etag(body):
+    """未壓縮內容的雜湊"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def strong_etag(digest, encoding=None):
+    """強 ETag：不同壓縮格式的位元組不同，因此附加格式名稱"""
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """檢查 If-None-Match 標頭是否包含 etag"""
+    if not if_none_match:
+        return False
+    candidates = [item.strip() for item in if_none_match.split(',')]
+    # 弱比較：忽略 W/ 前綴
+    return '*' in candidates or etag in (item[2:] if item.startswith('W/') else item for item in candidates)
+
+
+_file_variants = {}
+_file_variants_lock = threading.Lock()
+
+
+def file_variant(path, encoding=None):
+    """返回檔案以 encoding 壓縮後的 (內容, ETag)，結果依檔案大小與修改時間快取"""
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _file_variants_lock:
+        cached = _file_variants.get(path)
+        if cached is None or cached['signature'] != signature:
+            with open(path, 'rb') as f:
+                body = f.read()
+            cached = {'signature': signature, 'digest': content_etag(body), None: body}
+            _file_variants[path] = cached
+        if encoding not in cached:
+            cached[encoding] = compress(cached[None], encoding)
+        return cached[encoding], strong_etag(cached['digest'], encoding)
+
+
+def precompress(path):
+    """預先建立檔案所有可用格式的壓縮結果，第一個請求不需等待壓縮"""
+    for encoding in (None,) + supported_encodings():
+        file_variant(path, encoding)
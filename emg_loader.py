@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 數據載入層
+
+每個CSV檔案只解析一次，產生的記錄物件同時供統計、原始數據預覽與時間序列使用，
+避免同一檔案被重複讀取與多份DataFrame同時存在記憶體中。
+
+採樣頻率由檔案本身取得: Noraxon 讀取設備資訊中的 frequency；419/445 感測器
+依第一欄的 HH:MM:SS.mmm 時間戳記推算。
+
+只需要肌肉通道時以 read_channels 讀取: 依設備設定檔只解析通道欄位並直接轉為指定的
+浮點數型別，不對時間戳記與文字欄位做型別推斷。安裝 pyarrow 時使用 pyarrow 的多執行緒
+CSV解析器，否則使用 NumPy 的 C 解析器；欄位含無法解析的數值時改用逐欄轉換。
+
+由 emg_columnar 轉換的 Parquet/Feather 檔案 (config['format'] 不為 'csv') 以相同的函數讀取:
+只讀取需要的通道欄位，設定檔、採樣頻率與設備資訊由檔案的結構描述 (schema metadata) 取得。
+
+pyarrow 為選用套件 (pip install pyarrow)，讀寫 Parquet/Feather 檔案時必須安裝。
+"""
+
+import csv
+import io
+import json
+import os
+
+import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.dataset
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# 欄式檔案的副檔名與格式
+COLUMNAR_FORMATS = {'.parquet': 'parquet', '.feather': 'feather'}
+
+# 欄式檔案結構描述中的記錄資訊 (值以JSON儲存)
+COLUMNAR_METADATA_FIELDS = ('profile', 'type', 'channels', 'sampling_rate', 'sampling_rate_source',
+                            'source_file', 'frequency', 'count', 'subject', 'measurement_date')
+
+# 欄式檔案中每個採樣點時間 (秒) 的欄位，只有採樣間隔不均勻的記錄才有此欄位
+TIME_COLUMN = 'time'
+
+# 無法由檔案取得採樣頻率時使用的預設值 (Hz)
+DEFAULT_SAMPLING_RATE = 1000
+
+# 時間戳記往回跳超過半天時視為跨越午夜
+_MIDNIGHT_ROLLBACK_S = 12 * 3600
+
+
+def read_emg_csv(filepath, file_type):
+    """依檔案類型讀取CSV，返回DataFrame"""
+    if file_type == 'Noraxon':
+        # Noraxon檔案前三行為設備資訊與空行，第四行為欄位名稱
+        return pd.read_csv(filepath, skiprows=3, encoding='utf-8')
+    return pd.read_csv(filepath, header=None, encoding='utf-8')
+
+
+def column_headers(df, file_type):
+    """返回顯示用的欄位標題"""
+    if file_type == 'Noraxon':
+        return df.columns.tolist()
+    return [f"第{i+1}欄" for i in range(len(df.columns))]
+
+
+def channel_array(df, column):
+    """將指定欄位轉為float64陣列，並移除無法解析的數值"""
+    values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+    return values[~np.isnan(values)]
+
+
+def channel_columns(filepath, config):
+    """返回肌肉通道在檔案中的欄位索引 {通道鍵值: 索引}
+
+    Noraxon 的欄位名稱由第四行的欄位標題對應為索引。
+    """
+    columns = config['channels']
+    if config['type'] != 'Noraxon':
+        return columns
+    with open(filepath, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        for _ in range(_header_line_count(config['type']) - 1):
+            next(reader, None)
+        header = next(reader, [])
+    return {key: header.index(column) for key, column in columns.items()}
+
+
+def _read_columns_pyarrow(filepath, config, indices, dtype):
+    # 以自動產生的欄位名稱 (f0, f1, ...) 指定要解析的欄位，不依賴返回欄位的順序
+    names = [f"f{index}" for index in indices]
+    arrow_type = pyarrow.from_numpy_dtype(np.dtype(dtype))
+    table = pyarrow.csv.read_csv(
+        filepath,
+        read_options=pyarrow.csv.ReadOptions(skip_rows=_header_line_count(config['type']),
+                                             autogenerate_column_names=True),
+        convert_options=pyarrow.csv.ConvertOptions(include_columns=names,
+                                                   column_types={name: arrow_type for name in names}))
+    return [table.column(name).to_numpy() for name in names]
+
+
+def _read_columns_numpy(filepath, config, indices, dtype):
+    table = np.loadtxt(filepath, delimiter=',', skiprows=_header_line_count(config['type']),
+                       usecols=indices, dtype=dtype, quotechar='"', encoding='utf-8-sig', ndmin=2)
+    return [table[:, i] for i in range(len(indices))]
+
+
+def read_channels(filepath, config, dtype=np.float64):
+    """只解析肌肉通道欄位並直接轉為 dtype，返回 {通道鍵值: ndarray} (依 config['channels'] 的順序)
+
+    與 load_recording 的通道相同 (移除無法解析的數值)，但不建立完整DataFrame。
+    欄位含空值或文字等無法以型別解析器讀取的內容時，改以 channel_array 逐欄轉換。
+    """
+    if is_columnar(config):
+        names = config['channels']
+        table = read_columnar_table(filepath, columns=list(dict.fromkeys(names.values())))
+        return {key: _column_array(table, name, dtype) for key, name in names.items()}
+
+    columns = channel_columns(filepath, config)
+    indices = list(dict.fromkeys(columns.values()))
+    read_columns = _read_columns_pyarrow if pyarrow is not None else _read_columns_numpy
+    try:
+        arrays = dict(zip(indices, read_columns(filepath, config, indices, dtype)))
+    except ValueError:
+        # 型別解析失敗 (例如空值或文字)，改以 pandas 讀取後逐欄轉換
+        df = pd.read_csv(filepath, header=None, usecols=indices, skiprows=_header_line_count(config['type']),
+                         encoding='utf-8')
+        arrays = {index: channel_array(df, index) for index in indices}
+
+    channels = {}
+    for key, index in columns.items():
+        values = np.asarray(arrays[index], dtype=dtype)
+        channels[key] = values[~np.isnan(values)]
+    return channels
+
+
+def load_recording(filepath, config):
+    """讀取單一EMG檔案並解析為記錄物件
+
+    返回的字典包含:
+        frame    - 完整DataFrame (原始數據預覽使用)
+        headers  - 顯示用欄位標題
+        channels - {通道鍵值: ndarray} 已轉型的通道數據
+        config   - 對應的檔案設定
+    """
+    if is_columnar(config):
+        table = read_columnar_table(filepath)
+        return {
+            'frame': table.to_pandas(),
+            'headers': table.column_names,
+            'channels': {key: _column_array(table, name) for key, name in config['channels'].items()},
+            'config': config
+        }
+
+    df = read_emg_csv(filepath, config['type'])
+    return {
+        'frame': df,
+        'headers': column_headers(df, config['type']),
+        'channels': {key: channel_array(df, column) for key, column in config['channels'].items()},
+        'config': config
+    }
+
+
+def iter_channel_chunks(filepath, config, chunksize=1_000_000):
+    """分塊讀取檔案，只解析肌肉通道欄位，逐塊返回 {通道鍵值: ndarray}"""
+    names = config['channels']
+    if is_columnar(config):
+        dataset = pyarrow.dataset.dataset(filepath, format=recording_format(filepath))
+        for batch in dataset.to_batches(columns=list(dict.fromkeys(names.values())), batch_size=chunksize):
+            yield {key: _column_array(batch, name) for key, name in names.items()}
+        return
+
+    columns = list(dict.fromkeys(names.values()))
+    if config['type'] == 'Noraxon':
+        reader = pd.read_csv(filepath, skiprows=3, usecols=columns, chunksize=chunksize, encoding='utf-8')
+    else:
+        reader = pd.read_csv(filepath, header=None, usecols=columns, chunksize=chunksize, encoding='utf-8')
+
+    with reader:
+        for chunk in reader:
+            yield {key: channel_array(chunk, column) for key, column in names.items()}
+
+
+def _header_line_count(file_type):
+    """資料列之前的檔案行數 (Noraxon: 三行設備資訊/空行 + 一行欄位名稱)"""
+    return 4 if file_type == 'Noraxon' else 0
+
+
+def build_row_index(filepath, file_type, chunk_size=16 * 1024 * 1024):
+    """掃描檔案換行位置，建立每一資料列起始位元組的索引
+
+    返回字典包含:
+        path     - 檔案路徑
+        type     - 檔案類型
+        headers  - 顯示用欄位標題
+        columns  - 欄位數量
+        offsets  - int64陣列，第i個元素為第i列資料的起始位元組位置
+        size     - 檔案總位元組數
+        rows     - 資料列數
+
+    欄式檔案不需要位元組索引，改為保留讀入的表格 (table) 供 read_row_range 切片。
+    """
+    if recording_format(filepath) != 'csv':
+        table = read_columnar_table(filepath)
+        return {
+            'path': filepath,
+            'type': file_type,
+            'headers': table.column_names,
+            'columns': table.num_columns,
+            'table': table,
+            'rows': table.num_rows
+        }
+
+    starts = [np.zeros(1, dtype=np.int64)]
+    size = 0
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord('\n'))
+            starts.append(newlines.astype(np.int64) + size + 1)
+            size += len(chunk)
+
+    offsets = np.concatenate(starts)
+    # 檔案以換行結尾時，最後一個位置之後沒有資料
+    if offsets[-1] >= size:
+        offsets = offsets[:-1]
+    offsets = offsets[_header_line_count(file_type):]
+
+    if file_type == 'Noraxon':
+        head = pd.read_csv(filepath, skiprows=3, nrows=0, encoding='utf-8')
+    else:
+        head = pd.read_csv(filepath, header=None, nrows=1, encoding='utf-8')
+
+    return {
+        'path': filepath,
+        'type': file_type,
+        'headers': column_headers(head, file_type),
+        'columns': len(head.columns),
+        'offsets': offsets,
+        'size': size,
+        'rows': len(offsets)
+    }
+
+
+def read_row_range(row_index, offset, limit):
+    """依列索引只讀取 [offset, offset+limit) 範圍內的資料列，返回DataFrame"""
+    if 'table' in row_index:
+        offset = max(0, min(offset, row_index['rows']))
+        return row_index['table'].slice(offset, max(0, limit)).to_pandas()
+
+    offsets = row_index['offsets']
+    offset = max(0, min(offset, len(offsets)))
+    stop = min(offset + max(0, limit), len(offsets))
+    if stop <= offset:
+        return pd.DataFrame(columns=range(row_index['columns']))
+
+    start_byte = int(offsets[offset])
+    end_byte = int(offsets[stop]) if stop < len(offsets) else row_index['size']
+    with open(row_index['path'], 'rb') as f:
+        f.seek(start_byte)
+        data = f.read(end_byte - start_byte)
+
+    return pd.read_csv(io.BytesIO(data), header=None, names=range(row_index['columns']),
+                       skip_blank_lines=False, encoding='utf-8')
+
+
+def read_noraxon_metadata(filepath):
+    """讀取 Noraxon 檔案第一、二行的設備資訊，返回 {欄位名稱: 值}
+
+    frequency 轉為 float、count 轉為 int；無法解析的數值保留原始字串。
+    """
+    with open(filepath, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        fields = next(reader, [])
+        values = next(reader, [])
+    metadata = dict(zip(fields, values))
+    for key, convert in (('frequency', float), ('count', int)):
+        try:
+            metadata[key] = convert(metadata[key])
+        except (KeyError, ValueError):
+            pass
+    return metadata
+
+
+def parse_clock_times(values):
+    """將 HH:MM:SS.mmm 時間戳記轉為秒數陣列 (向量化解析，無法解析者為NaN)
+
+    記錄跨越午夜時時間戳記會歸零，之後的時間加上 24 小時使其保持遞增。
+    """
+    seconds = pd.to_timedelta(pd.Series(values, dtype=str), errors='coerce').dt.total_seconds().to_numpy()
+    steps = np.diff(seconds)
+    rollovers = np.concatenate(([0], np.cumsum(steps < -_MIDNIGHT_ROLLBACK_S)))
+    return seconds + rollovers * 86400.0
+
+
+def _tick_boundaries(seconds):
+    """時間戳記改變的位置 (同一時間戳記的數據列為一批封包)"""
+    return np.flatnonzero(np.diff(seconds) > 0) + 1
+
+
+def estimate_sampling_rate(seconds):
+    """由時間戳記推算實際採樣頻率 (Hz)，時間戳記不足時返回None
+
+    感測器以封包為單位傳送，同一封包的數據列共用一個時間戳記，
+    且開始記錄時會先寫入一批重複的數據列。因此不以 列數/總時間 計算，
+    而是以最小平方法擬合每個封包起始列號對時間的斜率。
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    seconds = seconds[~np.isnan(seconds)]
+    boundaries = _tick_boundaries(seconds)
+    if len(boundaries) < 2:
+        return None
+    slope, _ = np.polyfit(seconds[boundaries] - seconds[boundaries[0]], boundaries, 1)
+    return float(slope) if slope > 0 else None
+
+
+def sample_times(seconds, sampling_rate):
+    """將每列的封包時間戳記展開為每個採樣點的時間 (秒，由0起算)
+
+    相鄰封包之間的數據列平均分配時間；第一個封包之前與最後一個封包之後的數據列
+    依 sampling_rate 外推。返回嚴格遞增的陣列，可交由 resample_uniform 重採樣。
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    rows = np.arange(len(seconds), dtype=np.float64)
+    boundaries = _tick_boundaries(seconds)
+    if len(boundaries) < 2:
+        return rows / sampling_rate
+
+    anchors = seconds[boundaries]
+    times = np.interp(rows, boundaries, anchors)
+    before = rows < boundaries[0]
+    after = rows > boundaries[-1]
+    times[before] = anchors[0] - (boundaries[0] - rows[before]) / sampling_rate
+    times[after] = anchors[-1] + (rows[after] - boundaries[-1]) / sampling_rate
+    return times - times[0]
+
+
+def recording_timing(filepath, config, frame=None):
+    """返回記錄的採樣時間資訊
+
+    返回字典包含:
+        sampling_rate - 採樣頻率 (Hz)
+        source        - 採樣頻率來源: 'metadata'、'timestamps' 或 'default'
+        times         - 每個採樣點的時間 (秒)，採樣間隔不均勻時才提供，否則為None
+
+    已載入完整DataFrame時以 frame 傳入，否則只讀取時間欄位。
+    欄式檔案的採樣頻率與來源為轉換時寫入的記錄資訊。
+    """
+    if is_columnar(config):
+        metadata = read_columnar_metadata(filepath)
+        times = None
+        if TIME_COLUMN in read_columnar_schema(filepath).names:
+            times = _column_array(read_columnar_table(filepath, columns=[TIME_COLUMN]), TIME_COLUMN,
+                                  drop_missing=False)
+        return {'sampling_rate': metadata['sampling_rate'], 'source': metadata['sampling_rate_source'],
+                'times': times}
+
+    if config['type'] == 'Noraxon':
+        frequency = read_noraxon_metadata(filepath).get('frequency')
+        if isinstance(frequency, float) and frequency > 0:
+            return {'sampling_rate': frequency, 'source': 'metadata', 'times': None}
+        if frame is None:
+            frame = pd.read_csv(filepath, skiprows=3, usecols=[config['time_col']], encoding='utf-8')
+        seconds = pd.to_numeric(frame[config['time_col']], errors='coerce').to_numpy(dtype=np.float64)
+        steps = np.diff(seconds[~np.isnan(seconds)])
+        if len(steps) and np.median(steps) > 0:
+            return {'sampling_rate': float(1.0 / np.median(steps)), 'source': 'timestamps', 'times': None}
+        return {'sampling_rate': DEFAULT_SAMPLING_RATE, 'source': 'default', 'times': None}
+
+    if frame is None:
+        frame = pd.read_csv(filepath, header=None, usecols=[config['time_col']], encoding='utf-8')
+    seconds = parse_clock_times(frame[config['time_col']])
+    sampling_rate = estimate_sampling_rate(seconds)
+    if sampling_rate is None:
+        return {'sampling_rate': DEFAULT_SAMPLING_RATE, 'source': 'default', 'times': None}
+    return {'sampling_rate': sampling_rate, 'source': 'timestamps',
+            'times': sample_times(seconds, sampling_rate)}
+
+
+def recording_format(filepath):
+    """依副檔名返回檔案格式: 'csv'、'parquet' 或 'feather'"""
+    return COLUMNAR_FORMATS.get(os.path.splitext(filepath)[1].lower(), 'csv')
+
+
+def is_columnar(config):
+    """檔案設定是否為欄式檔案 (Parquet/Feather)"""
+    return config.get('format', 'csv') != 'csv'
+
+
+def require_pyarrow():
+    """未安裝 pyarrow 時引發 ImportError"""
+    if pyarrow is None:
+        raise ImportError("讀寫 Parquet/Feather 檔案需要安裝 pyarrow (pip install pyarrow)")
+
+
+def read_columnar_schema(filepath):
+    """讀取欄式檔案的結構描述 (只讀取檔案結尾的描述區塊，不讀取數據)"""
+    require_pyarrow()
+    if recording_format(filepath) == 'parquet':
+        return pyarrow.parquet.read_schema(filepath)
+    with pyarrow.memory_map(filepath) as source:
+        return pyarrow.ipc.open_file(source).schema
+
+
+def read_columnar_metadata(filepath):
+    """返回欄式檔案的記錄資訊 {欄位: 值} (見 COLUMNAR_METADATA_FIELDS)"""
+    metadata = read_columnar_schema(filepath).metadata or {}
+    return {
+        field: json.loads(metadata[field.encode()])
+        for field in COLUMNAR_METADATA_FIELDS if field.encode() in metadata
+    }
+
+
+def read_columnar_table(filepath, columns=None):
+    """讀取欄式檔案，返回 pyarrow.Table；columns 為要讀取的欄位 (其餘欄位不解碼)"""
+    require_pyarrow()
+    dataset = pyarrow.dataset.dataset(filepath, format=recording_format(filepath))
+    return dataset.to_table(columns=columns)
+
+
+def _column_array(table, name, dtype=np.float64, drop_missing=True):
+    """取出表格的一個欄位為 dtype 陣列，drop_missing 時移除缺值 (與 channel_array 相同)"""
+    values = table.column(name).to_numpy(zero_copy_only=False).astype(dtype, copy=False)
+    return values[~np.isnan(values)] if drop_missing else values
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 記錄物件模型
+
+分析結果原本以巢狀字典傳遞，並為了繪圖保留整個DataFrame (包含時間戳記等文字欄位)。
+記錄改以 __slots__ 類別表示:
+    Recording    - 一個記錄檔案：設定、採樣頻率、各通道與統計
+    Channel      - 一個肌肉通道：float32 數據陣列 (不需繪圖時為空陣列)
+    ChannelStats - 一個通道的統計，為 Recording.stats 結構化陣列中一列的檢視
+
+每個記錄的所有通道統計存於一個結構化陣列 (STATS_DTYPE)，不再為每個統計值建立Python物件；
+通道數量與順序由檔案設定的 channels 決定 (見 emg_profiles)，統計以 (採樣點, 通道) 二維陣列一次計算。
+原本的 analysis_results / detailed_stats 字典格式可由 report_dicts 產生。
+"""
+
+import numpy as np
+
+from emg_profiles import channel_labels, channel_names
+from emg_stats import MultiChannelStats, channel_matrix
+
+# 每個通道的統計欄位 (與 StreamingStats.result 相同)
+STATS_FIELDS = ('RMS', 'Mean', 'Std', 'Max', 'Min', 'Count')
+STATS_DTYPE = np.dtype([(field, np.int64 if field == 'Count' else np.float64) for field in STATS_FIELDS])
+
+# 通道數據的儲存型別
+CHANNEL_DTYPE = np.float32
+
+
+class ChannelStats:
+    """一個通道的統計，可如字典以欄位名稱取值"""
+
+    __slots__ = ('_stats', '_index')
+
+    def __init__(self, stats, index):
+        self._stats = stats
+        self._index = index
+
+    def __getitem__(self, field):
+        value = self._stats[field][self._index]
+        return int(value) if field == 'Count' else float(value)
+
+    def to_dict(self):
+        """返回與 calculate_statistics 相同格式的統計字典"""
+        return {field: self[field] for field in STATS_FIELDS}
+
+
+class Channel:
+    """一個肌肉通道"""
+
+    __slots__ = ('key', 'muscle', 'column', 'values', 'stats')
+
+    def __init__(self, key, muscle, column, values, stats):
+        self.key = key
+        self.muscle = muscle
+        self.column = column
+        self.values = values
+        self.stats = stats
+
+
+class Recording:
+    """一個記錄檔案的通道與統計"""
+
+    __slots__ = ('name', 'config', 'sampling_rate', 'channels', 'stats')
+
+    def __init__(self, name, config, stats, values=None, sampling_rate=None):
+        """stats 為 STATS_DTYPE 結構化陣列 (每個通道一列，依 config['channels'] 的順序)
+
+        values 為 {通道: 一維陣列}，轉為 float32 保存；未提供時通道數據為空陣列。
+        """
+        self.name = name
+        self.config = config
+        self.sampling_rate = sampling_rate
+        self.stats = stats
+        values = values or {}
+        names = channel_names(config)
+        labels = channel_labels(config)
+        self.channels = {
+            key: Channel(key, names[key], labels[key],
+                         np.asarray(values.get(key, ()), dtype=CHANNEL_DTYPE),
+                         ChannelStats(stats, index))
+            for index, key in enumerate(config['channels'])
+        }
+
+    @classmethod
+    def from_channels(cls, name, config, channels, sampling_rate=None, keep_values=True):
+        """由 {通道: 數據} 計算統計並建立記錄；統計以 float64 原始數據計算，keep_values 為 False 時不保留數據"""
+        keys, matrix = channel_matrix({key: channels[key] for key in config['channels']})
+        stats = np.zeros(len(keys), dtype=STATS_DTYPE)
+        for field, values in MultiChannelStats(len(keys)).update(matrix).result_arrays().items():
+            stats[field] = values
+        return cls(name, config, stats, channels if keep_values else None, sampling_rate)
+
+    @classmethod
+    def from_stats(cls, name, config, channel_stats):
+        """由 {通道: 統計字典} (例如 stream_file_statistics 的結果) 建立不含數據的記錄"""
+        stats = np.zeros(len(config['channels']), dtype=STATS_DTYPE)
+        for index, key in enumerate(config['channels']):
+            for field in STATS_FIELDS:
+                stats[field][index] = channel_stats[key][field]
+        return cls(name, config, stats)
+
+    def set_values(self, values):
+        """設定通道數據 ({通道: 一維陣列}，轉為 float32 保存)，例如子程序只返回統計時於主程序重新讀取"""
+        for key, channel in self.channels.items():
+            channel.values = np.asarray(values.get(key, ()), dtype=CHANNEL_DTYPE)
+
+    def time(self, key):
+        """通道每個採樣點的時間 (秒)，依採樣頻率計算，不另外保存"""
+        return np.arange(len(self.channels[key].values)) / self.sampling_rate
+
+    @property
+    def nbytes(self):
+        """通道數據與統計陣列的總位元組數"""
+        return self.stats.nbytes + sum(channel.values.nbytes for channel in self.channels.values())
+
+    def analysis_results(self):
+        """analysis_results 字典中此記錄的項目 ({'股四頭肌 RMS (uV)': ..., ...})"""
+        return {f"{channel.muscle} RMS (uV)": channel.stats['RMS'] for channel in self.channels.values()}
+
+    def detailed_stats(self):
+        """detailed_stats 字典中此記錄的項目 ({'股四頭肌': 統計字典, ...})"""
+        return {channel.muscle: channel.stats.to_dict() for channel in self.channels.values()}
+
+
+def report_dicts(recordings):
+    """由 {名稱: Recording} 產生 (analysis_results, detailed_stats) 字典"""
+    analysis_results = {name: recording.analysis_results() for name, recording in recordings.items()}
+    detailed_stats = {name: recording.detailed_stats() for name, recording in recordings.items()}
+    return analysis_results, detailed_stats
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 最大自主收縮 (MVC) 標準化
+
+各設備的原始振幅單位不同，無法直接比較；以同一受試者、同一設備、同一肌肉的MVC參考記錄
+將振幅指標換算為 %MVC 後即可跨設備比較。
+
+MVC參考記錄放在獨立資料夾，受試者以第一層子資料夾區分 (資料夾外層的檔案屬於預設受試者):
+    mvc/S01/MVC_1.csv
+    mvc/S01/MVC_2.csv
+    mvc/S02/MVC.csv
+分析記錄的受試者以相同方式由數據資料夾的第一層子資料夾決定。
+
+每個MVC檔案的峰值 (MVC_WINDOW_S 秒移動RMS的最大值) 只計算一次，依來源檔案路徑、
+大小與修改時間存於SQLite資料庫；同一受試者/設備/肌肉有多個檔案時取最大值。
+檔案未改變時不重新解析，批次分析開始時以一次查詢載入所有參考值，之後每個記錄的查詢為字典查找。
+"""
+
+import os
+import sqlite3
+import time
+
+from emg_cache import CACHE_DIR, load_channels
+from emg_loader import recording_timing
+from emg_profiles import scan_recordings
+from emg_signal import condition_channels, windowed_rms
+
+# MVC參考值資料庫
+MVC_DB = os.path.join(CACHE_DIR, 'mvc.sqlite')
+
+# MVC峰值：此長度的移動RMS窗口 (秒) 與窗口間隔 (秒) 中的最大值
+MVC_WINDOW_S = 0.5
+MVC_HOP_S = 0.05
+
+# 數據資料夾最外層的檔案所屬的受試者
+DEFAULT_SUBJECT = '-'
+
+# 換算為 %MVC 的振幅指標
+MVC_METRICS = ('RMS', 'RMS_filtered', 'RMS_active', 'Mean', 'Mean_filtered', 'Max', 'Max_filtered')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS mvc_peaks (
+    path         TEXT NOT NULL,
+    conditioning TEXT NOT NULL,
+    muscle       TEXT NOT NULL,
+    subject      TEXT NOT NULL,
+    profile      TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    mtime_ns     INTEGER NOT NULL,
+    peak         REAL NOT NULL,
+    computed_at  REAL NOT NULL,
+    PRIMARY KEY (path, conditioning, muscle)
+);
+CREATE INDEX IF NOT EXISTS mvc_reference ON mvc_peaks (subject, profile, muscle, conditioning);
+'''
+
+
+def recording_subject(filepath, data_dir):
+    """由檔案相對於資料夾的第一層子資料夾決定受試者"""
+    parts = os.path.normpath(os.path.relpath(filepath, data_dir)).split(os.sep)
+    return parts[0] if len(parts) > 1 else DEFAULT_SUBJECT
+
+
+def conditioning_key(conditioning):
+    """前處理階段的儲存鍵值 (未前處理為空字串)"""
+    return '+'.join(conditioning or ())
+
+
+def connect(db_path=MVC_DB):
+    """開啟MVC資料庫，不存在時建立"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def mvc_peaks(channels, sampling_rate, window_s=MVC_WINDOW_S, hop_s=MVC_HOP_S):
+    """每個通道移動RMS的最大值，返回 {通道名稱: 峰值}"""
+    peaks = {}
+    for key, values in channels.items():
+        _, rms = windowed_rms(values, sampling_rate, window_s, hop_s)
+        peaks[key] = float(rms.max()) if len(rms) else 0.0
+    return peaks
+
+
+def update_mvc_store(mvc_dir, db_path=MVC_DB, conditioning=None, cache_dir=CACHE_DIR):
+    """計算 mvc_dir 中新增或修改的MVC檔案峰值並寫入資料庫，返回 (重新計算數, 沿用數)
+
+    已不存在的檔案的峰值一併刪除。conditioning 須與分析記錄使用的前處理相同。
+    """
+    mvc_dir = os.path.abspath(mvc_dir)
+    key = conditioning_key(conditioning)
+    recordings = scan_recordings(mvc_dir)
+    computed = reused = 0
+
+    with connect(db_path) as connection:
+        stored = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in connection.execute(
+                'SELECT path, size, mtime_ns FROM mvc_peaks WHERE conditioning = ?', (key,))
+        }
+        present = set()
+        for config in recordings.values():
+            path = os.path.abspath(config['path'])
+            present.add(path)
+            stat = os.stat(path)
+            if stored.get(path) == (stat.st_size, stat.st_mtime_ns):
+                reused += 1
+                continue
+
+            channels = load_channels(path, config, cache_dir)
+            sampling_rate = recording_timing(path, config)['sampling_rate']
+            if conditioning:
+                channels = condition_channels(channels, sampling_rate, conditioning)
+            subject = recording_subject(path, mvc_dir)
+            connection.executemany(
+                'INSERT OR REPLACE INTO mvc_peaks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(path, key, muscle, subject, config['profile'], stat.st_size, stat.st_mtime_ns,
+                  peak, time.time())
+                 for muscle, peak in mvc_peaks(channels, sampling_rate).items()])
+            computed += 1
+
+        removed = [(path,) for path in stored if path.startswith(mvc_dir + os.sep) and path not in present]
+        connection.executemany('DELETE FROM mvc_peaks WHERE path = ?', removed)
+    connection.close()
+    return computed, reused
+
+
+def load_mvc_references(db_path=MVC_DB, conditioning=None):
+    """一次載入所有MVC參考值，返回 {(受試者, 設備設定檔, 通道): 峰值}"""
+    if not os.path.exists(db_path):
+        return {}
+    with connect(db_path) as connection:
+        rows = connection.execute(
+            'SELECT subject, profile, muscle, MAX(peak) FROM mvc_peaks WHERE conditioning = ? '
+            'GROUP BY subject, profile, muscle', (conditioning_key(conditioning),)).fetchall()
+    connection.close()
+    return {(subject, profile, muscle): peak for subject, profile, muscle, peak in rows}
+
+
+def percent_mvc(value, peak):
+    """換算為 %MVC，參考值無效時返回None"""
+    if value is None or not peak:
+        return None
+    return value / peak * 100
+
+
+def mvc_metrics(stats, peak):
+    """返回統計中各振幅指標的 %MVC 版本 ({指標}_MVC)"""
+    return {
+        f"{metric}_MVC": percent_mvc(stats[metric], peak)
+        for metric in MVC_METRICS if metric in stats
+    }
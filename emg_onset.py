@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 肌肉收縮起止點偵測
+
+在線性包絡線上以 基線平均值 + k·標準差 為閾值，超過閾值的區段為收縮 (burst)。
+閾值判斷產生布林遮罩後以 np.diff 一次找出所有起點與終點，再以最短持續時間做遲滯:
+    - 間隔短於 MIN_GAP_S 的相鄰收縮合併 (避免閾值附近的抖動切斷一次收縮)
+    - 持續時間短於 MIN_BURST_S 的收縮捨棄 (避免雜訊尖峰被視為收縮)
+每個步驟都是對整段數據或起止點陣列的單次向量化運算，計算量與記錄長度成正比；
+多個等長通道組成 (通道, 採樣點) 陣列時所有通道一次處理 (channel_burst_statistics)。
+"""
+
+import numpy as np
+
+from emg_signal import linear_envelope
+
+# 閾值 = 基線平均值 + ONSET_K · 基線標準差
+ONSET_K = 3.0
+# 基線窗口長度 (秒)：取包絡線平均值最低的窗口作為靜止基線
+BASELINE_S = 0.5
+# 遲滯: 收縮最短持續時間與相鄰收縮最短間隔 (秒)
+MIN_BURST_S = 0.05
+MIN_GAP_S = 0.05
+
+
+def activation_envelope(signal, fs):
+    """去除直流成分後的線性包絡線 (全波整流 + 低通)；二維 (通道, 採樣點) 陣列逐列處理"""
+    values = np.asarray(signal, dtype=np.float64)
+    if values.shape[-1] == 0:
+        return values
+    return linear_envelope(values - values.mean(axis=-1, keepdims=True), fs)
+
+
+def baseline_threshold(envelope, fs, k=ONSET_K, baseline_s=BASELINE_S):
+    """以包絡線平均值最低的 baseline_s 秒窗口作為基線，返回 (閾值, 基線平均值, 基線標準差)
+
+    envelope 為二維 (通道, 採樣點) 陣列時，三個值都是每個通道一個元素的陣列。
+    """
+    envelope = np.asarray(envelope)
+    rows = np.atleast_2d(envelope)
+    window = max(1, int(fs * baseline_s))
+    count = rows.shape[1] // window
+    if count == 0:
+        segments = rows[:, None, :]
+    else:
+        segments = rows[:, :count * window].reshape(len(rows), count, window)
+    quietest = segments[np.arange(len(rows)), np.argmin(segments.mean(axis=2), axis=1)]
+    mean, std = quietest.mean(axis=1), quietest.std(axis=1)
+    if envelope.ndim == 1:
+        mean, std = float(mean[0]), float(std[0])
+    return mean + k * std, mean, std
+
+
+def detect_bursts(envelope, threshold, fs, min_burst_s=MIN_BURST_S, min_gap_s=MIN_GAP_S):
+    """找出包絡線超過閾值的區段，返回 (起點, 終點) 採樣位置陣列 (終點不包含)"""
+    _, onsets, offsets = detect_channel_bursts(np.asarray(envelope)[None, :], np.atleast_1d(threshold),
+                                               fs, min_burst_s, min_gap_s)
+    return onsets, offsets
+
+
+def detect_channel_bursts(envelope, threshold, fs, min_burst_s=MIN_BURST_S, min_gap_s=MIN_GAP_S):
+    """二維 (通道, 採樣點) 包絡線的收縮偵測，threshold 為每個通道的閾值
+
+    所有通道一次比較與找出邊緣，返回 (通道索引, 起點, 終點) 三個陣列，依通道再依起點排序。
+    """
+    active = envelope > np.asarray(threshold)[:, None]
+    edges = np.diff(active.astype(np.int8), axis=1, prepend=0, append=0)
+    channels, onsets = np.nonzero(edges == 1)
+    offsets = np.nonzero(edges == -1)[1]
+
+    # 合併同一通道中間隔過短的相鄰收縮
+    if len(onsets) > 1:
+        merge = (channels[1:] == channels[:-1]) & ((onsets[1:] - offsets[:-1]) < min_gap_s * fs)
+        starts = np.concatenate(([True], ~merge))
+        ends = np.concatenate((~merge, [True]))
+        channels, onsets, offsets = channels[starts], onsets[starts], offsets[ends]
+
+    # 捨棄持續時間過短的收縮
+    long_enough = (offsets - onsets) >= min_burst_s * fs
+    return channels[long_enough], onsets[long_enough], offsets[long_enough]
+
+
+def burst_statistics(signal, fs, k=ONSET_K):
+    """偵測收縮並計算每次收縮與全部收縮期間的RMS
+
+    返回字典包含:
+        onsets, offsets - 每次收縮的起點與終點 (採樣位置)
+        rms             - 每次收縮的RMS
+        active_rms      - 只計算收縮期間數據的RMS (無收縮時為None)
+        active_fraction - 收縮期間佔總採樣點的比例
+        threshold       - 偵測使用的包絡線閾值
+    """
+    return channel_burst_statistics(np.asarray(signal, dtype=np.float64)[None, :], fs, k)[0]
+
+
+def channel_burst_statistics(data, fs, k=ONSET_K):
+    """二維 (通道, 採樣點) 陣列所有通道一次偵測收縮，返回每個通道一個 burst_statistics 結果的列表
+
+    包絡線濾波、基線閾值、邊緣偵測與平方累積和都是對整個陣列的單次運算，
+    只有最後依通道分割結果時逐通道處理。通道不可含NaN。
+    """
+    values = np.asarray(data, dtype=np.float64)
+    n_channels, n_samples = values.shape
+    if n_samples == 0:
+        thresholds = np.zeros(n_channels)
+        channels = onsets = offsets = np.zeros(0, dtype=np.int64)
+    else:
+        envelope = activation_envelope(values, fs)
+        thresholds, _, _ = baseline_threshold(envelope, fs, k)
+        channels, onsets, offsets = detect_channel_bursts(envelope, thresholds, fs)
+
+    # 平方累積和相減即為任一區段的平方和
+    cumulative = np.concatenate((np.zeros((n_channels, 1)), np.cumsum(values * values, axis=1)), axis=1)
+    sums = cumulative[channels, offsets] - cumulative[channels, onsets]
+    lengths = offsets - onsets
+    bounds = np.searchsorted(channels, np.arange(n_channels + 1))
+
+    results = []
+    for i in range(n_channels):
+        part = slice(bounds[i], bounds[i + 1])
+        channel_sums, channel_lengths = sums[part], lengths[part]
+        active_samples = int(channel_lengths.sum())
+        results.append({
+            'onsets': onsets[part],
+            'offsets': offsets[part],
+            'rms': np.sqrt(channel_sums / channel_lengths) if len(channel_lengths) else np.zeros(0),
+            'active_rms': float(np.sqrt(channel_sums.sum() / active_samples)) if active_samples else None,
+            'active_fraction': active_samples / n_samples if n_samples else 0.0,
+            'threshold': float(thresholds[i])
+        })
+    return results
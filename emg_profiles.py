@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 設備設定檔
+
+依檔案開頭內容自動判斷記錄設備，並提供該設備的檔案類型與肌肉通道欄位 (任意數量的通道)。
+掃描資料夾時每個CSV檔案只讀取開頭數行，因此可快速處理大量記錄。
+新增設備時在 DEVICE_PROFILES 加入一個設定檔即可，不需修改分析程式。
+
+由CSV轉換的 Parquet/Feather 檔案 (見 emg_columnar) 的設備設定檔記錄於檔案的結構描述中。
+"""
+
+import csv
+import os
+import re
+from collections import Counter
+
+from emg_loader import COLUMNAR_FORMATS, read_columnar_metadata, recording_format
+
+# Noraxon MR3 匯出檔第一行為設備資訊欄位名稱
+NORAXON_METADATA_FIELDS = ('"type"', '"begin_time"', '"frequency"')
+
+# 419/445 感測器每列以 HH:MM:SS.mmm 時間戳記開頭
+TIMESTAMP_PATTERN = re.compile(r'^\d{1,2}:\d{2}:\d{2}(\.\d+)?$')
+
+
+def _is_noraxon(lines):
+    """第一行為 Noraxon 設備資訊欄位"""
+    fields = lines[0].split(',') if lines else []
+    return tuple(field.strip() for field in fields[:3]) == NORAXON_METADATA_FIELDS
+
+
+def _is_timestamped(lines):
+    """第一行以時間戳記開頭，且欄位數足以包含肌肉通道 (第8欄)"""
+    fields = lines[0].split(',') if lines else []
+    return len(fields) >= 8 and bool(TIMESTAMP_PATTERN.match(fields[0].strip()))
+
+
+# 各設備的判斷函數與欄位設定，依順序比對，第一個符合者為該檔案的設備
+# channels 為 {通道鍵值: 欄位} (Noraxon 為欄位名稱，其他設備為欄位索引)，依此順序分析與顯示；
+# channel_pattern 符合的其他欄位 (由第四行的欄位標題判斷) 另外加入為通道，鍵值由欄位名稱產生
+DEVICE_PROFILES = {
+    'Noraxon': {
+        'detect': _is_noraxon,
+        'type': 'Noraxon',
+        'channels': {
+            'quad': 'RT VMO (uV)',         # D欄 -> 股四頭肌
+            'bicep': 'RT SEMITEND. (uV)'   # E欄 -> 股二頭肌
+        },
+        'channel_pattern': re.compile(r'\(uV\)$'),  # MR3 匯出的每個EMG通道 (最多16個)
+        'time_col': 'time'                 # 相對時間 (秒)
+    },
+    'Timestamped': {
+        'detect': _is_timestamped,
+        'type': 'Other',
+        # 無標題列，無法以 channel_pattern 辨識其他通道；第9~12欄與第5~8欄內容相同，
+        # 其餘欄位不是肌電通道，因此只使用固定的兩個通道，新增通道時直接加入 channels
+        'channels': {
+            'quad': 7,   # H欄 (索引7) -> 股四頭肌
+            'bicep': 3   # D欄 (索引3) -> 股二頭肌
+        },
+        'time_col': 0    # A欄 HH:MM:SS.mmm 時間戳記
+    }
+}
+
+# 通道的顯示名稱，其他通道以欄位名稱顯示
+MUSCLE_NAMES = {'quad': '股四頭肌', 'bicep': '股二頭肌'}
+
+# 檔名與報告中顯示名稱不同的數據集 (檔名誤植為「藕合式」)
+DATASET_NAMES = {
+    '445-藕合式': '445-耦合式'
+}
+
+
+def read_head_lines(filepath, count=4, max_bytes=64 * 1024):
+    """讀取檔案開頭最多 count 行 (去除UTF-8 BOM)，供設備判斷使用"""
+    with open(filepath, 'rb') as f:
+        head = f.read(max_bytes)
+    text = head.decode('utf-8-sig', errors='replace')
+    return text.splitlines()[:count]
+
+
+def detect_profile(filepath):
+    """返回檔案對應的設備設定檔名稱，無法判斷時返回None"""
+    if recording_format(filepath) != 'csv':
+        profile_name = read_columnar_metadata(filepath).get('profile')
+        return profile_name if profile_name in DEVICE_PROFILES else None
+    lines = read_head_lines(filepath)
+    for name, profile in DEVICE_PROFILES.items():
+        if profile['detect'](lines):
+            return name
+    return None
+
+
+def channel_key(column):
+    """由欄位名稱產生通道鍵值 (小寫英數字與底線，例如 'LT VMO (uV)' -> 'lt_vmo_uv')"""
+    return re.sub(r'[^0-9a-z]+', '_', str(column).lower()).strip('_')
+
+
+def profile_channels(filepath, profile):
+    """返回檔案的通道欄位 {通道鍵值: 欄位}
+
+    設備設定檔的通道之後，依序加入欄位標題符合 channel_pattern 的其他欄位 (無法讀取時略過)。
+    """
+    channels = dict(profile['channels'])
+    pattern = profile.get('channel_pattern')
+    if pattern is None:
+        return channels
+    try:
+        lines = read_head_lines(filepath)
+    except OSError:
+        return channels
+    header = next(csv.reader(lines[3:4]), [])
+    known = set(channels.values())
+    for column in header:
+        if pattern.search(column) and column not in known:
+            channels[channel_key(column)] = column
+    return channels
+
+
+def file_config(filepath, profile_name):
+    """依設備設定檔建立單一檔案的分析設定
+
+    欄式檔案的通道為轉換時寫入的 {通道鍵值: 欄位名稱}。
+    """
+    profile = DEVICE_PROFILES[profile_name]
+    file_format = recording_format(filepath)
+    if file_format == 'csv':
+        channels = profile_channels(filepath, profile)
+    else:
+        channels = read_columnar_metadata(filepath)['channels']
+    return {
+        'path': filepath,
+        'channels': channels,
+        'time_col': profile['time_col'],
+        'type': profile['type'],
+        'profile': profile_name,
+        'format': file_format
+    }
+
+
+def column_label(file_type, column):
+    """通道欄位的顯示名稱 (Noraxon 為欄位名稱，其他設備為「第N欄」)"""
+    return column if file_type == 'Noraxon' else f"第{column+1}欄"
+
+
+def channel_labels(config):
+    """返回 {通道鍵值: 欄位顯示名稱} (欄式檔案的欄位名稱轉換時已是顯示名稱)"""
+    if config.get('format', 'csv') != 'csv':
+        return dict(config['channels'])
+    return {key: column_label(config['type'], column) for key, column in config['channels'].items()}
+
+
+def channel_names(config):
+    """返回 {通道鍵值: 顯示名稱}，MUSCLE_NAMES 以外的通道以欄位顯示名稱表示"""
+    return {key: MUSCLE_NAMES.get(key, label) for key, label in channel_labels(config).items()}
+
+
+def find_recording_files(data_dir='.', recursive=True):
+    """列出資料夾(及子資料夾)中的CSV與欄式檔案，依路徑排序"""
+    extensions = ('.csv',) + tuple(COLUMNAR_FORMATS)
+    paths = []
+    for root, dirs, files in os.walk(data_dir):
+        # 略過隱藏資料夾 (例如 .git 與快取目錄)
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(extensions))
+        if not recursive:
+            break
+    return sorted(os.path.normpath(path) for path in paths)
+
+
+def scan_recordings(data_dir='.', recursive=True):
+    """掃描資料夾並自動判斷每個記錄檔案的設備類型
+
+    返回 {數據集名稱: 設定} 字典，依檔案路徑排序。數據集名稱為不含副檔名的檔名，
+    有同名檔案時改用相對路徑 (欄式檔案保留副檔名)。無法判斷設備的檔案會被略過。
+    """
+    detected = []
+    for path in find_recording_files(data_dir, recursive):
+        try:
+            profile_name = detect_profile(path)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"⚠️ 無法讀取檔案，已跳過: {path} ({e})")
+            continue
+        if profile_name is None:
+            print(f"⚠️ 無法判斷設備類型，已跳過: {path}")
+            continue
+        detected.append((path, profile_name))
+
+    stems = [os.path.splitext(os.path.basename(path))[0] for path, _ in detected]
+    stem_counts = Counter(stems)
+    file_configs = {}
+    for (path, profile_name), stem in zip(detected, stems):
+        if stem_counts[stem] > 1:
+            name = os.path.relpath(path, data_dir)
+            if recording_format(path) == 'csv':
+                name = os.path.splitext(name)[0]
+        else:
+            name = DATASET_NAMES.get(stem, stem)
+        file_configs[name] = file_config(path, profile_name)
+    return file_configs
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 信號處理
+
+以NumPy向量化運算實作視窗化的平均值與RMS包絡線，供統計分析與報告圖表使用；
+採樣間隔不均勻的記錄先以 resample_uniform 重採樣到等間隔時間軸。
+
+信號前處理 (condition) 依序套用帶通濾波、市電陷波、全波整流與線性包絡線等階段，
+濾波器以二階節 (second-order sections) 設計並以 sosfiltfilt 零相位濾波，
+一次處理整個記錄的所有通道 (通道 × 採樣點 的二維陣列)。
+"""
+
+import numpy as np
+from scipy import signal as sps
+
+# sEMG 標準前處理參數
+BANDPASS_HZ = (20.0, 450.0)
+FILTER_ORDER = 4
+# 台灣市電為60Hz，50Hz地區的記錄需調整
+NOTCH_HZ = 60.0
+NOTCH_Q = 30.0
+# 線性包絡線的低通截止頻率
+ENVELOPE_CUTOFF_HZ = 6.0
+# 截止頻率超過奈奎斯特頻率時，改用奈奎斯特頻率的此比例
+NYQUIST_MARGIN = 0.95
+
+
+def _window_bounds(n_samples, fs, window_s, hop_s):
+    """返回每個視窗的 (起點, 終點) 採樣位置，最後一個視窗可能不足完整長度"""
+    window = max(1, int(np.floor(fs * window_s)))
+    hop = window if hop_s is None else max(1, int(np.floor(fs * hop_s)))
+    starts = np.arange(0, n_samples, hop, dtype=np.int64)
+    ends = np.minimum(starts + window, n_samples)
+    return starts, ends, window, hop
+
+
+def _window_sums(values, starts, ends, window, hop):
+    """計算每個視窗內數值的總和"""
+    if hop == window:
+        # 不重疊的相鄰視窗，直接分段加總
+        return np.add.reduceat(values, starts) if len(starts) else np.zeros(0)
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    return cumulative[ends] - cumulative[starts]
+
+
+def windowed_mean(signal, fs, window_s, hop_s=None):
+    """計算視窗平均值包絡線
+
+    signal   - 一維數據
+    fs       - 採樣頻率 (Hz)
+    window_s - 視窗長度 (秒)
+    hop_s    - 視窗間隔 (秒)，預設與視窗長度相同 (不重疊)
+
+    返回 (視窗起始時間(秒), 平均值) 兩個陣列。
+    """
+    values = np.asarray(signal, dtype=np.float64)
+    starts, ends, window, hop = _window_bounds(len(values), fs, window_s, hop_s)
+    sums = _window_sums(values, starts, ends, window, hop)
+    return starts / fs, sums / (ends - starts)
+
+
+def windowed_rms(signal, fs, window_s, hop_s=None):
+    """計算視窗RMS包絡線: RMS = sqrt(mean(x^2))
+
+    參數同 windowed_mean，返回 (視窗起始時間(秒), RMS) 兩個陣列。
+    """
+    values = np.asarray(signal, dtype=np.float64)
+    starts, ends, window, hop = _window_bounds(len(values), fs, window_s, hop_s)
+    sums = _window_sums(values * values, starts, ends, window, hop)
+    # 累積和相減可能產生極小的負值
+    return starts / fs, np.sqrt(np.maximum(sums / (ends - starts), 0.0))
+
+
+def resample_uniform(times, signal, fs):
+    """以線性內插將不等間隔的數據重採樣到頻率 fs 的等間隔時間軸
+
+    times  - 每個採樣點的時間 (秒，遞增)
+    signal - 與 times 等長的一維數據
+    fs     - 目標採樣頻率 (Hz)
+
+    返回 (等間隔時間(秒), 重採樣後數據) 兩個陣列，時間軸由 times[0] 開始。
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(signal, dtype=np.float64)
+    if len(times) == 0:
+        return np.zeros(0), np.zeros(0)
+    grid = times[0] + np.arange(int(np.floor((times[-1] - times[0]) * fs)) + 1) / fs
+    return grid, np.interp(grid, times, values)
+
+
+def _nyquist_limited(freq, fs):
+    """將截止頻率限制在奈奎斯特頻率以下 (低採樣率的感測器無法保留450Hz)"""
+    return min(freq, NYQUIST_MARGIN * fs / 2)
+
+
+def bandpass_sos(fs, band=BANDPASS_HZ, order=FILTER_ORDER):
+    """設計Butterworth帶通濾波器，返回SOS係數；頻帶不在奈奎斯特頻率以下時返回None"""
+    low, high = band[0], _nyquist_limited(band[1], fs)
+    if low >= high:
+        return None
+    return sps.butter(order, [low, high], btype='bandpass', fs=fs, output='sos')
+
+
+def notch_sos(fs, freq=NOTCH_HZ, q=NOTCH_Q):
+    """設計市電陷波濾波器，返回SOS係數；陷波頻率超過奈奎斯特頻率時返回None"""
+    if freq >= fs / 2:
+        return None
+    b, a = sps.iirnotch(freq, q, fs=fs)
+    return sps.tf2sos(b, a)
+
+
+def lowpass_sos(fs, cutoff=ENVELOPE_CUTOFF_HZ, order=FILTER_ORDER):
+    """設計Butterworth低通濾波器，返回SOS係數"""
+    return sps.butter(order, _nyquist_limited(cutoff, fs), btype='lowpass', fs=fs, output='sos')
+
+
+def _filtfilt(data, sos):
+    """沿最後一軸零相位濾波；數據長度不足濾波器的邊界延伸長度時不濾波"""
+    if sos is None or data.shape[-1] <= 3 * (2 * len(sos) + 1):
+        return data
+    return sps.sosfiltfilt(sos, data, axis=-1)
+
+
+def bandpass(data, fs):
+    """帶通濾波，去除動作偽影與高頻雜訊"""
+    return _filtfilt(data, bandpass_sos(fs))
+
+
+def notch(data, fs):
+    """市電干擾陷波"""
+    return _filtfilt(data, notch_sos(fs))
+
+
+def rectify(data, fs):
+    """全波整流"""
+    return np.abs(data)
+
+
+def linear_envelope(data, fs):
+    """整流後低通濾波的線性包絡線"""
+    return _filtfilt(np.abs(data), lowpass_sos(fs))
+
+
+# 前處理階段，以名稱組合成處理流程
+CONDITIONING_STAGES = {
+    'bandpass': bandpass,
+    'notch': notch,
+    'rectify': rectify,
+    'envelope': linear_envelope
+}
+
+# 統計使用的預設流程 (濾波後保留正負號，RMS與窗口包絡線在此結果上計算)
+DEFAULT_CONDITIONING = ('bandpass', 'notch')
+
+
+def condition(data, fs, stages=DEFAULT_CONDITIONING):
+    """依序套用前處理階段
+
+    data   - 一維數據或 (通道, 採樣點) 二維陣列，所有通道一次處理
+    fs     - 採樣頻率 (Hz)
+    stages - CONDITIONING_STAGES 中的階段名稱序列
+
+    返回與 data 形狀相同的float64陣列。
+    """
+    result = np.asarray(data, dtype=np.float64)
+    for stage in stages:
+        result = CONDITIONING_STAGES[stage](result, fs)
+    return result
+
+
+def stack_channels(channels):
+    """將 {通道名稱: 一維陣列} 組成 (通道, 採樣點) 二維陣列，返回 (通道名稱列表, 陣列)
+
+    各通道長度不同時 (移除了無法解析的數值) 截取至最短的長度。
+    """
+    keys = list(channels)
+    length = min(len(channels[key]) for key in keys)
+    return keys, np.vstack([np.asarray(channels[key][:length], dtype=np.float64) for key in keys])
+
+
+def condition_channels(channels, fs, stages=DEFAULT_CONDITIONING):
+    """將 {通道名稱: 一維陣列} 組成二維陣列一起前處理，返回相同鍵值的字典"""
+    keys, stacked = stack_channels(channels)
+    conditioned = condition(stacked, fs, stages)
+    return {key: conditioned[i] for i, key in enumerate(keys)}
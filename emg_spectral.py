@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 頻域疲勞指標
+
+以滑動窗口的功率頻譜密度 (PSD) 計算平均頻率 (MNF) 與中位頻率 (MDF) 隨時間的變化:
+    MNF = Σ f·P(f) / Σ P(f)
+    MDF = 使 Σ_{f≤MDF} P(f) = Σ P(f) / 2 的頻率
+
+肌肉疲勞時MDF隨時間下降，以MDF對時間的線性回歸斜率 (Hz/s) 作為疲勞指標。
+所有通道組成 (通道, 採樣點) 二維陣列，以步幅視圖 (sliding_window_view) 一次對一批窗口做FFT，
+MNF/MDF 沿頻率軸向量化擷取，不逐窗口迴圈。整段記錄的PSD為各窗口PSD的平均
+(即相同窗口與重疊的Welch法)，不需再掃描一次數據。
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from emg_signal import BANDPASS_HZ
+
+# 滑動窗口長度與間隔 (秒)
+SPECTRAL_WINDOW_S = 1.0
+SPECTRAL_HOP_S = 0.5
+
+# 每批FFT的窗口數，限制長時間記錄的暫存記憶體
+PSD_BLOCK_WINDOWS = 1024
+
+
+def spectral_band(fs, band=BANDPASS_HZ):
+    """計算MNF/MDF使用的頻帶，上限不超過奈奎斯特頻率"""
+    return band[0], min(band[1], fs / 2)
+
+
+def mean_frequency(freqs, psd):
+    """平均頻率，psd 最後一軸為頻率；總功率為0的窗口返回NaN"""
+    power = psd.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(power > 0, (psd * freqs).sum(axis=-1) / power, np.nan)
+
+
+def median_frequency(freqs, psd):
+    """中位頻率，psd 最後一軸為頻率；在累積功率跨過一半的兩個頻率之間線性內插"""
+    if psd.shape[-1] == 0:
+        return np.full(psd.shape[:-1], np.nan)
+    cumulative = np.cumsum(psd, axis=-1)
+    half = cumulative[..., -1:] / 2
+    upper = np.argmax(cumulative >= half, axis=-1)[..., None]
+    lower = np.maximum(upper - 1, 0)
+    c_low = np.take_along_axis(cumulative, lower, axis=-1)
+    c_high = np.take_along_axis(cumulative, upper, axis=-1)
+    span = c_high - c_low
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fraction = np.where(span > 0, (half - c_low) / span, 0.0)
+    mdf = freqs[lower] + fraction * (freqs[upper] - freqs[lower])
+    return np.where(half[..., 0] > 0, mdf[..., 0], np.nan)
+
+
+def _window_params(fs, window_s, hop_s):
+    nperseg = max(2, int(fs * window_s))
+    hop = min(max(1, int(fs * hop_s)), nperseg)
+    return nperseg, hop
+
+
+def iter_psd_blocks(data, fs, window_s=SPECTRAL_WINDOW_S, hop_s=SPECTRAL_HOP_S,
+                    block_windows=PSD_BLOCK_WINDOWS):
+    """逐批返回滑動窗口的PSD (單邊功率頻譜密度，Hann窗口，去除窗口平均值)
+
+    data 為 (..., 採樣點) 陣列。每批返回 (窗口起點(採樣點), PSD)，PSD 形狀為 (..., 窗口, 頻率)。
+    """
+    nperseg, hop = _window_params(fs, window_s, hop_s)
+    if data.shape[-1] < nperseg:
+        return
+    windows = sliding_window_view(data, nperseg, axis=-1)[..., ::hop, :]
+    taper = np.hanning(nperseg + 1)[:-1]  # 週期Hann窗口，與scipy.signal的'hann'相同
+    scale = 1.0 / (fs * np.sum(taper ** 2))
+    for first in range(0, windows.shape[-2], block_windows):
+        block = windows[..., first:first + block_windows, :]
+        spectrum = np.fft.rfft((block - block.mean(axis=-1, keepdims=True)) * taper, axis=-1)
+        psd = (spectrum.real ** 2 + spectrum.imag ** 2) * scale
+        # 單邊頻譜：直流與奈奎斯特頻率以外的成分加倍
+        psd[..., 1:nperseg // 2 + (nperseg % 2)] *= 2
+        yield (first + np.arange(psd.shape[-2])) * hop, psd
+
+
+def sliding_psd(data, fs, window_s=SPECTRAL_WINDOW_S, hop_s=SPECTRAL_HOP_S):
+    """計算滑動窗口的PSD
+
+    data 為一維數據或 (通道, 採樣點) 二維陣列。返回 (頻率, 窗口中心時間(秒), PSD)，
+    PSD 形狀為 (..., 窗口, 頻率)；數據短於一個窗口時窗口數為0。
+    """
+    data = np.asarray(data, dtype=np.float64)
+    nperseg, _ = _window_params(fs, window_s, hop_s)
+    freqs = np.fft.rfftfreq(nperseg, 1 / fs)
+    blocks = list(iter_psd_blocks(data, fs, window_s, hop_s))
+    if not blocks:
+        return freqs, np.zeros(0), np.zeros(data.shape[:-1] + (0, len(freqs)))
+    starts = np.concatenate([block_starts for block_starts, _ in blocks])
+    psd = np.concatenate([block for _, block in blocks], axis=-2)
+    return freqs, (starts + nperseg / 2) / fs, psd
+
+
+def fatigue_slope(times, values):
+    """每個通道的指標對時間線性回歸斜率，忽略NaN窗口；有效窗口少於2個時為NaN
+
+    values 形狀為 (..., 窗口)。
+    """
+    valid = np.isfinite(values)
+    count = valid.sum(axis=-1)
+    t = np.where(valid, times, 0.0)
+    y = np.where(valid, values, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = t.sum(axis=-1, keepdims=True) / count[..., None]
+        y_mean = y.sum(axis=-1, keepdims=True) / count[..., None]
+        dt = np.where(valid, times - t_mean, 0.0)
+        slope = (dt * (y - y_mean)).sum(axis=-1) / (dt * dt).sum(axis=-1)
+    return np.where(count >= 2, slope, np.nan)
+
+
+def spectral_metrics(data, fs, window_s=SPECTRAL_WINDOW_S, hop_s=SPECTRAL_HOP_S, band=None):
+    """計算整段記錄與滑動窗口的MNF/MDF
+
+    data 為 (通道, 採樣點) 二維陣列。返回字典包含 (各陣列第一軸為通道):
+        time       - 窗口中心時間 (秒)
+        mnf, mdf   - 每個窗口的MNF/MDF (Hz)，形狀 (通道, 窗口)
+        MNF, MDF   - 整段記錄的MNF/MDF (Hz)，由所有窗口的平均PSD (Welch法) 計算
+        MDF_slope  - MDF對時間的回歸斜率 (Hz/s)，負值表示疲勞
+    """
+    data = np.atleast_2d(np.asarray(data, dtype=np.float64))
+    band = band or spectral_band(fs)
+    nperseg, _ = _window_params(fs, window_s, hop_s)
+    freqs = np.fft.rfftfreq(nperseg, 1 / fs)
+    in_band = (freqs >= band[0]) & (freqs <= band[1])
+
+    starts, mnf, mdf = [], [], []
+    psd_sum = np.zeros(data.shape[:-1] + (len(freqs),))
+    for block_starts, psd in iter_psd_blocks(data, fs, window_s, hop_s):
+        band_psd = psd[..., in_band]
+        starts.append(block_starts)
+        mnf.append(mean_frequency(freqs[in_band], band_psd))
+        mdf.append(median_frequency(freqs[in_band], band_psd))
+        psd_sum += psd.sum(axis=-2)
+
+    if not starts:
+        empty = np.zeros(data.shape[:-1] + (0,))
+        nan = np.full(data.shape[:-1], np.nan)
+        return {'time': np.zeros(0), 'mnf': empty, 'mdf': empty, 'MNF': nan, 'MDF': nan, 'MDF_slope': nan}
+
+    times = (np.concatenate(starts) + nperseg / 2) / fs
+    mdf = np.concatenate(mdf, axis=-1)
+    return {
+        'time': times,
+        'mnf': np.concatenate(mnf, axis=-1),
+        'mdf': mdf,
+        'MNF': mean_frequency(freqs[in_band], psd_sum[..., in_band]),
+        'MDF': median_frequency(freqs[in_band], psd_sum[..., in_band]),
+        'MDF_slope': fatigue_slope(times, mdf)
+    }
+
+
+def json_values(values):
+    """轉為JSON可序列化的列表 (NaN改為None)"""
+    values = np.asarray(values, dtype=np.float64)
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+def json_value(value):
+    """轉為JSON可序列化的數值 (NaN改為None)"""
+    value = float(value)
+    return None if np.isnan(value) else value
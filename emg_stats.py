@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 串流統計
+
+以分塊(chunk)方式累積 RMS、平均值、標準差、最大/最小值與數據點數，記憶體用量與檔案大小無關。
+平均值與變異數採用 Welford / Chan 的合併公式，逐塊更新時仍保持數值穩定；
+整個數據只有一塊時結果與一次性計算相同 (至浮點數捨入誤差)。
+
+異常值處理所需的2.5%/97.5%分位數可改用 t-digest 近似估計，不需排序整個數據。
+
+多個通道組成 (採樣點, 通道) 二維陣列後由 MultiChannelStats 一起累積：每個統計量是一次沿
+採樣點方向的歸約，計算量只與數據量有關，不隨通道數增加Python呼叫次數。
+"""
+
+import numpy as np
+
+from emg_loader import iter_channel_chunks
+
+
+class StreamingStats:
+    """單一通道的串流統計累加器"""
+
+    __slots__ = ('count', 'mean', 'm2', 'sum_sq', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sum_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """加入一塊數據 (已轉為數值且不含NaN的一維陣列)"""
+        values = np.asarray(values, dtype=np.float64)
+        n_b = len(values)
+        if n_b == 0:
+            return self
+
+        mean_b = values.mean()
+        deviations = values - mean_b
+        m2_b = np.dot(deviations, deviations)
+
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * n_a * n_b / n
+        self.count = n
+
+        self.sum_sq += np.dot(values, values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        return self
+
+    def result(self):
+        """返回與 calculate_statistics 相同格式的統計字典"""
+        if self.count == 0:
+            return {'RMS': 0.0, 'Mean': 0.0, 'Std': 0.0, 'Max': 0.0, 'Min': 0.0, 'Count': 0}
+        return {
+            'RMS': float(np.sqrt(self.sum_sq / self.count)),
+            'Mean': float(self.mean),
+            'Std': float(np.sqrt(self.m2 / self.count)),
+            'Max': float(self.max),
+            'Min': float(self.min),
+            'Count': self.count
+        }
+
+
+def channel_matrix(channels):
+    """將 {通道鍵值: 一維陣列} 組成 (採樣點, 通道) 二維陣列，返回 (通道鍵值列表, 陣列)
+
+    各通道長度不同時 (移除了無法解析的數值) 以NaN補齊至最長的長度，統計時視為缺值。
+    陣列以欄為主 (column-major) 存放，每個通道的數據連續，沿採樣點方向的歸約逐通道連續讀取
+    (與 emg_signal.stack_channels 的 (通道, 採樣點) 陣列記憶體配置相同)。
+    """
+    keys = list(channels)
+    length = max((len(channels[key]) for key in keys), default=0)
+    matrix = np.full((length, len(keys)), np.nan, order='F')
+    for i, key in enumerate(keys):
+        values = channels[key]
+        matrix[:len(values), i] = values
+    return keys, matrix
+
+
+class MultiChannelStats:
+    """多個通道的串流統計累加器，每次加入一塊 (採樣點, 通道) 二維數據
+
+    與 StreamingStats 相同的 Welford / Chan 合併公式，每個累加值為每個通道一個元素的陣列，
+    所有通道以沿採樣點方向的歸約一次計算。NaN 視為缺值，不計入該通道。
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'sum_sq', 'min', 'max')
+
+    def __init__(self, n_channels):
+        self.count = np.zeros(n_channels, dtype=np.int64)
+        self.mean = np.zeros(n_channels)
+        self.m2 = np.zeros(n_channels)
+        self.sum_sq = np.zeros(n_channels)
+        self.min = np.full(n_channels, np.inf)
+        self.max = np.full(n_channels, -np.inf)
+
+    def update(self, block, valid=None):
+        """加入一塊 (採樣點, 通道) 數據
+
+        valid 為同形狀的布林陣列時只計入為 True 的數據 (例如異常值篩選的範圍條件)，
+        不需另外建立以NaN標示的副本；未提供時NaN為缺值。
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if len(block) == 0:
+            return self
+        if valid is None:
+            missing = np.isnan(block)
+            valid = ~missing if missing.any() else None
+
+        if valid is None:
+            n_b = np.full(block.shape[1], len(block), dtype=np.int64)
+            low = block.min(axis=0)
+            high = block.max(axis=0)
+            valid = True
+        else:
+            n_b = np.count_nonzero(valid, axis=0)
+            # 沒有有效數據的通道為 ±inf，不改變累積的最小/最大值
+            low = np.min(block, axis=0, where=valid, initial=np.inf)
+            high = np.max(block, axis=0, where=valid, initial=-np.inf)
+
+        # 以 where 只歸約有效數據，不建立篩選後的副本
+        mean_b = np.sum(block, axis=0, where=valid) / np.maximum(n_b, 1)
+        deviations = block - mean_b
+        m2_b = np.sum(np.square(deviations, out=deviations), axis=0, where=valid)
+        # 平方和由離差平方和與平均值換算 (Σx² = M2 + n·mean²)，不需再讀取一次數據
+        sum_sq_b = m2_b + n_b * mean_b * mean_b
+
+        n_a = self.count
+        n = n_a + n_b
+        safe_n = np.maximum(n, 1)
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * n_b / safe_n
+        self.m2 = self.m2 + m2_b + delta * delta * n_a * n_b / safe_n
+        self.count = n
+        self.sum_sq = self.sum_sq + sum_sq_b
+        self.min = np.minimum(self.min, low)
+        self.max = np.maximum(self.max, high)
+        return self
+
+    def result_arrays(self):
+        """返回 {統計欄位: 每個通道一個元素的陣列}，沒有數據的通道為0"""
+        valid = self.count > 0
+        safe_count = np.maximum(self.count, 1)
+        return {
+            'RMS': np.where(valid, np.sqrt(self.sum_sq / safe_count), 0.0),
+            'Mean': np.where(valid, self.mean, 0.0),
+            'Std': np.where(valid, np.sqrt(self.m2 / safe_count), 0.0),
+            'Max': np.where(valid, self.max, 0.0),
+            'Min': np.where(valid, self.min, 0.0),
+            'Count': self.count.copy()
+        }
+
+    def results(self):
+        """返回每個通道與 StreamingStats.result 相同格式的統計字典列表"""
+        arrays = self.result_arrays()
+        return [
+            {field: int(values[i]) if field == 'Count' else float(values[i]) for field, values in arrays.items()}
+            for i in range(len(self.count))
+        ]
+
+
+class TDigest:
+    """合併式 t-digest 分位數估計 (Dunning & Ertl)
+
+    以加權質心摘要數據分布，質心大小受 arcsin 尺度函數限制：分布兩端的質心很小，
+    因此2.5%/97.5%這類尾端分位數的估計誤差遠小於中位數附近。
+    每次加入一塊數據時，先以 np.partition 依尺度函數的分界名次將該塊分組
+    (不需完整排序)，再與現有質心一併以向量化方式重新壓縮，質心數量約為 delta / 2，
+    與數據量無關。
+    """
+
+    __slots__ = ('delta', 'means', 'weights', 'min', 'max')
+
+    def __init__(self, delta=500):
+        self.delta = delta
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """加入一塊數據"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        chunk_means, chunk_weights = self._summarize(values)
+        means = np.concatenate((self.means, chunk_means))
+        weights = np.concatenate((self.weights, chunk_weights))
+        order = np.argsort(means, kind='stable')
+        self._compress(means[order], weights[order])
+        return self
+
+    def _summarize(self, values):
+        """將一塊數據依尺度函數的分界名次分組為質心 (np.partition，不完整排序)"""
+        n = len(values)
+        k_max = self.delta / 4
+        k = np.arange(-k_max, k_max + 1)
+        q = (np.sin(2 * np.pi * k / self.delta) + 1) / 2
+        boundaries = np.unique(np.ceil(q * n).astype(np.int64))
+        boundaries = boundaries[(boundaries > 0) & (boundaries < n)]
+        if len(boundaries) == 0:
+            return np.sort(values), np.ones(n)
+
+        partitioned = np.partition(values, boundaries)
+        starts = np.concatenate(([0], boundaries))
+        counts = np.diff(np.concatenate((starts, [n]))).astype(np.float64)
+        return np.add.reduceat(partitioned, starts) / counts, counts
+
+    def _compress(self, means, weights):
+        """依尺度函數 k(q) = delta/(2π)·asin(2q-1) 將相鄰質心合併，每個 k 單位區間合併為一個質心"""
+        cumulative = np.cumsum(weights)
+        q_left = (cumulative - weights) / cumulative[-1]
+        k = self.delta / (2 * np.pi) * np.arcsin(2 * q_left - 1)
+        groups = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.diff(groups, prepend=-1))
+
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q):
+        """估計第 q 分位數 (0 <= q <= 1)"""
+        if len(self.weights) == 0:
+            return 0.0
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * total,
+                               np.concatenate(([0.0], centers, [total])),
+                               np.concatenate(([self.min], self.means, [self.max]))))
+
+
+def filtered_statistics(chunks, lower, upper):
+    """計算落在 [lower, upper] 範圍內數值的統計，逐塊篩選，不建立完整的篩選後副本"""
+    accumulator = StreamingStats()
+    for values in chunks:
+        accumulator.update(values[(values >= lower) & (values <= upper)])
+    return accumulator.result()
+
+
+def iter_blocks(values, block_size=1_000_000):
+    """將記憶體中的陣列切成固定大小的視圖 (不複製數據)"""
+    for start in range(0, len(values), block_size):
+        yield values[start:start + block_size]
+
+
+def outlier_bounds(values, method='exact', lower_pct=2.5, upper_pct=97.5):
+    """計算異常值處理的上下界
+
+    method='exact'  : np.percentile 精確分位數 (預設，也是較快的方法)
+    method='tdigest': t-digest 近似分位數，逐塊處理；不比 exact 快 (約慢2倍)，
+                      換取的是暫存記憶體固定、可與串流統計一起逐塊累積
+    """
+    if method == 'exact':
+        return np.percentile(values, lower_pct), np.percentile(values, upper_pct)
+    if method == 'tdigest':
+        digest = TDigest()
+        for block in iter_blocks(values):
+            digest.update(block)
+        return digest.quantile(lower_pct / 100), digest.quantile(upper_pct / 100)
+    raise ValueError(f"Unknown quantile method: {method}")
+
+
+def channel_outlier_bounds(matrix, method='exact', lower_pct=2.5, upper_pct=97.5):
+    """計算 (採樣點, 通道) 二維陣列每個通道的異常值上下界，返回 (下界陣列, 上界陣列)
+
+    method='exact' 時所有通道以一次沿軸向的分位數計算 (補齊的NaN不計入)；
+    method='tdigest' 時每個通道各自以 t-digest 逐塊估計。
+    """
+    if method == 'exact':
+        percentile = np.nanpercentile if np.isnan(matrix).any() else np.percentile
+        # 轉置為 (通道, 採樣點) 的C順序檢視 (不複製)，沿最後一軸計算較快
+        lower, upper = percentile(matrix.T, [lower_pct, upper_pct], axis=1)
+        return lower, upper
+    bounds = [outlier_bounds(column[~np.isnan(column)], method, lower_pct, upper_pct) for column in matrix.T]
+    return np.array([b[0] for b in bounds]), np.array([b[1] for b in bounds])
+
+
+def with_filtered_statistics(original_stats, filtered_stats, remove_outliers):
+    """合併原始與異常值處理後的統計，輸出 *_filtered 欄位"""
+    if not remove_outliers:
+        filtered_stats = original_stats
+    return {
+        **original_stats,
+        'RMS_filtered': filtered_stats['RMS'],
+        'Mean_filtered': filtered_stats['Mean'],
+        'Std_filtered': filtered_stats['Std'],
+        'Max_filtered': filtered_stats['Max'],
+        'Min_filtered': filtered_stats['Min'],
+        'Count_filtered': filtered_stats['Count'],
+        'Outliers_removed': original_stats['Count'] - filtered_stats['Count'] if remove_outliers else 0
+    }
+
+
+def stream_file_statistics(filepath, config, chunksize=1_000_000, remove_outliers=False):
+    """分塊讀取檔案並計算各通道統計，記憶體用量只與 chunksize 有關
+
+    每塊的通道組成 (採樣點, 通道) 二維陣列，所有通道一起累積。
+    remove_outliers 為 True 時，第一次讀取同時以 t-digest 估計2.5%/97.5%分位數，
+    第二次讀取計算範圍內數據的 *_filtered 統計 (數據點數需大於20)。
+    返回 {通道鍵值: 統計字典}。
+    """
+    keys = list(config['channels'])
+    accumulator = MultiChannelStats(len(keys))
+    digests = {key: TDigest() for key in keys}
+    for chunk in iter_channel_chunks(filepath, config, chunksize):
+        accumulator.update(channel_matrix(chunk)[1])
+        if remove_outliers:
+            for key, values in chunk.items():
+                digests[key].update(values)
+    results = dict(zip(keys, accumulator.results()))
+    if not remove_outliers:
+        return results
+
+    # 第二次讀取：只累積落在分位數範圍內的數值 (數據點數需大於20)
+    lower = np.array([digests[key].quantile(0.025) for key in keys])
+    upper = np.array([digests[key].quantile(0.975) for key in keys])
+    filtered = MultiChannelStats(len(keys))
+    for chunk in iter_channel_chunks(filepath, config, chunksize):
+        matrix = channel_matrix(chunk)[1]
+        # 範圍比較時NaN (補齊的缺值) 為False，不計入
+        filtered.update(matrix, (matrix >= lower) & (matrix <= upper))
+
+    return {
+        key: with_filtered_statistics(results[key], filtered_stats, results[key]['Count'] > 20)
+        for key, filtered_stats in zip(keys, filtered.results())
+    }
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 通道二進位儲存 (記憶體映射)
+
+長時間記錄的回顧只需要任意時間窗口的數據。通道以固定格式寫入單一二進位檔案，
+開啟時以 np.memmap 映射，window() 返回的是映射的切片 (不複製數據)，
+只有實際讀取的分頁會由作業系統載入記憶體。
+
+檔案格式 (小端序):
+    8 位元組    魔術字串 STORE_MAGIC
+    4 位元組    uint32，標頭JSON長度
+    標頭JSON    {'sampling_rate': Hz, 'arrays': {名稱: {'dtype', 'offset', 'length'}}}
+    數據區      由標頭之後第一個 STORE_ALIGN 位元組對齊的位置開始，各陣列連續存放，
+                offset 為相對於數據區起點的位置 (同樣對齊 STORE_ALIGN 位元組)
+
+通道以 float32 儲存；採樣間隔不均勻的記錄另存每個採樣點的時間 (TIME_ARRAY，float64)，
+時間窗口以二分搜尋換算為採樣位置，否則依採樣頻率換算。
+"""
+
+import json
+import math
+import os
+import struct
+
+import numpy as np
+
+STORE_MAGIC = b'EMGSTOR1'
+STORE_ALIGN = 64
+
+# 通道數據型別與時間陣列名稱
+CHANNEL_DTYPE = '<f4'
+TIME_ARRAY = 'time'
+
+_HEADER_SIZE = struct.Struct('<I')
+
+
+def _aligned(offset):
+    return -(-offset // STORE_ALIGN) * STORE_ALIGN
+
+
+def _store_arrays(channels, times=None):
+    """轉為儲存格式的陣列；times 與所有通道等長時才保留，否則依採樣頻率換算時間"""
+    arrays = {name: np.ascontiguousarray(values, dtype=CHANNEL_DTYPE) for name, values in channels.items()}
+    if times is not None and all(len(values) == len(times) for values in arrays.values()):
+        arrays[TIME_ARRAY] = np.ascontiguousarray(times, dtype='<f8')
+    return arrays
+
+
+def write_store(path, channels, sampling_rate, times=None):
+    """將 {名稱: 一維陣列} 寫入二進位儲存檔 (先寫入暫存檔再替換)
+
+    times 為每個採樣點的時間 (秒，見 emg_loader.recording_timing)。
+    """
+    arrays = _store_arrays(channels, times)
+
+    layout = {}
+    offset = 0
+    for name, values in arrays.items():
+        layout[name] = {'dtype': values.dtype.str, 'offset': offset, 'length': len(values)}
+        offset = _aligned(offset + values.nbytes)
+    encoded = json.dumps({'sampling_rate': float(sampling_rate), 'arrays': layout}).encode('utf-8')
+    data_start = _aligned(len(STORE_MAGIC) + _HEADER_SIZE.size + len(encoded))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(STORE_MAGIC)
+        f.write(_HEADER_SIZE.pack(len(encoded)))
+        f.write(encoded)
+        for name, values in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(values.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+class ChannelStore:
+    """以記憶體映射開啟的通道儲存，或包裝記憶體中的通道 (不使用快取時)"""
+
+    def __init__(self, arrays, sampling_rate):
+        self.sampling_rate = sampling_rate
+        self._arrays = arrays
+
+    @classmethod
+    def from_channels(cls, channels, sampling_rate, times=None):
+        """由記憶體中的通道建立 (與寫入後再開啟的內容相同)"""
+        return cls(_store_arrays(channels, times), sampling_rate)
+
+    @classmethod
+    def open(cls, path):
+        """開啟二進位儲存檔，格式不符時引發 ValueError"""
+        with open(path, 'rb') as f:
+            if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+                raise ValueError(f"Not an EMG channel store: {path}")
+            (length,) = _HEADER_SIZE.unpack(f.read(_HEADER_SIZE.size))
+            header = json.loads(f.read(length))
+        data_start = _aligned(len(STORE_MAGIC) + _HEADER_SIZE.size + length)
+
+        mapped = np.memmap(path, dtype=np.uint8, mode='r')
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            start = data_start + spec['offset']
+            stop = start + spec['length'] * dtype.itemsize
+            if stop > len(mapped):
+                raise ValueError(f"Truncated EMG channel store: {path}")
+            arrays[name] = mapped[start:stop].view(dtype)
+        return cls(arrays, header['sampling_rate'])
+
+    @property
+    def channels(self):
+        """通道名稱"""
+        return [name for name in self._arrays if name != TIME_ARRAY]
+
+    @property
+    def times(self):
+        """每個採樣點的時間 (秒)，等間隔採樣時為None"""
+        return self._arrays.get(TIME_ARRAY)
+
+    def channel(self, name):
+        """整個通道 (唯讀記憶體映射)"""
+        return self._arrays[name]
+
+    def sample_range(self, channel, t0, t1):
+        """時間區間 [t0, t1) (秒) 對應的採樣位置 (start, stop)"""
+        length = len(self._arrays[channel])
+        times = self.times
+        if times is not None:
+            start, stop = np.searchsorted(times, [t0, t1])
+        else:
+            start = math.ceil(t0 * self.sampling_rate)
+            stop = math.ceil(t1 * self.sampling_rate)
+        start = min(max(int(start), 0), length)
+        return start, min(max(int(stop), start), length)
+
+    def time_at(self, position):
+        """採樣位置對應的時間 (秒)"""
+        times = self.times
+        if times is not None and 0 <= position < len(times):
+            return float(times[position])
+        return position / self.sampling_rate
+
+    def window(self, channel, t0, t1):
+        """返回通道在時間區間 [t0, t1) (秒) 的數據 (映射的切片，不複製)"""
+        start, stop = self.sample_range(channel, t0, t1)
+        return self._arrays[channel][start:stop]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+EMG 數據資料夾監看
+
+以輪詢方式定期比對資料夾中記錄檔案 (CSV/Parquet/Feather) 的大小與修改時間，發現新增、修改或刪除的檔案時
+在背景執行緒呼叫回呼函數 (例如增量重新產生報告)，再透過 ReportEvents 通知
+所有以 Server-Sent Events 連線的瀏覽器。
+"""
+
+import os
+import threading
+
+from emg_profiles import find_recording_files
+
+
+def directory_snapshot(data_dir):
+    """返回資料夾中每個記錄檔案的 (大小, 修改時間)"""
+    snapshot = {}
+    for path in find_recording_files(data_dir):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # 掃描期間被刪除的檔案
+            continue
+        snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def changed_paths(previous, current):
+    """比對兩次快照，返回新增、修改或刪除的檔案路徑 (已排序)"""
+    return sorted(
+        path for path in set(previous) | set(current)
+        if previous.get(path) != current.get(path)
+    )
+
+
+class ReportEvents:
+    """報告更新事件的廣播器
+
+    每次 publish 版本號加一；SSE 連線以 wait 等待比自己已知版本更新的事件。
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.payload = None
+        self.condition = threading.Condition()
+
+    def publish(self, payload):
+        with self.condition:
+            self.version += 1
+            self.payload = payload
+            self.condition.notify_all()
+
+    def wait(self, known_version, timeout):
+        """等待新事件，返回 (版本, 內容)；逾時時內容為None"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != known_version, timeout)
+            if self.version == known_version:
+                return known_version, None
+            return self.version, self.payload
+
+
+class DirectoryWatcher(threading.Thread):
+    """在背景執行緒輪詢資料夾，發現變更時呼叫 on_change(變更的路徑列表)
+
+    檔案仍在寫入時大小會持續改變，因此需連續兩次輪詢結果相同才視為穩定並觸發回呼。
+    回呼在此執行緒中執行，不會阻塞服務器的請求處理執行緒。
+    """
+
+    def __init__(self, data_dir, on_change, interval=2.0):
+        super().__init__(daemon=True)
+        self.data_dir = data_dir
+        self.on_change = on_change
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        known = directory_snapshot(self.data_dir)
+        pending = known
+        while not self.stopped.wait(self.interval):
+            current = directory_snapshot(self.data_dir)
+            if current != pending:
+                # 仍在變化，等下一次輪詢確認
+                pending = current
+                continue
+            paths = changed_paths(known, current)
+            if not paths:
+                continue
+            known = current
+            try:
+                self.on_change(paths)
+            except Exception as e:
+                print(f"❌ 重新分析時發生錯誤: {e}")
+
+    def stop(self):
+        self.stopped.set()
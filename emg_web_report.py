@@ -3,186 +3,605 @@
 
 import pandas as pd
 import numpy as np
+import argparse
+import base64
+import functools
+import hashlib
 import json
 import os
 import time
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
 import webbrowser
 import threading
 
-def analyze_emg_data():
-    """分析EMG數據並返回結果"""
-    file_configs = {
-        '419-電阻式': {
-            'path': '419-電阻式.csv',
-            'quad_col': 7,
-            'bicep_col': 3,
-            'type': 'Other'
-        },
-        '445-耦合式': {
-            'path': '445-藕合式.csv',
-            'quad_col': 7,
-            'bicep_col': 3,
-            'type': 'Other'
-        },
-        'Noraxon': {
-            'path': 'Noraxon.csv',
-            'quad_col': 'RT VMO (uV)',
-            'bicep_col': 'RT SEMITEND. (uV)',
-            'type': 'Noraxon'
+from emg_batch import run_per_file
+from emg_cache import (CACHE_DIR, load_artifact, load_channel_store, load_channels, load_preview,
+                       store_artifact, store_channels, store_preview)
+from emg_profiles import channel_labels, channel_names, scan_recordings
+from emg_loader import build_row_index, load_recording, read_row_range, recording_timing
+from emg_downsample import build_pyramid, minmax_decimate, pyramid_tile
+from emg_signal import (BANDPASS_HZ, DEFAULT_CONDITIONING, ENVELOPE_CUTOFF_HZ, FILTER_ORDER, NOTCH_HZ,
+                        NOTCH_Q, condition_channels, resample_uniform, stack_channels, windowed_mean,
+                        windowed_rms)
+from emg_mvc import MVC_DB, load_mvc_references, mvc_metrics, percent_mvc, recording_subject, update_mvc_store
+from emg_onset import MIN_BURST_S, MIN_GAP_S, ONSET_K, burst_statistics, channel_burst_statistics
+from emg_spectral import SPECTRAL_HOP_S, SPECTRAL_WINDOW_S, json_value, json_values, spectral_metrics
+from emg_http import (choose_encoding, compress, content_etag, etag_matches, file_variant,
+                      is_compressible, precompress, strong_etag)
+from emg_watch import DirectoryWatcher, ReportEvents
+from emg_stats import (MultiChannelStats, StreamingStats, channel_matrix, channel_outlier_bounds, iter_blocks,
+                       with_filtered_statistics)
+
+# 各數據集的檔案路徑與欄位設定，由 load_file_configs 掃描資料夾後填入
+FILE_CONFIGS = {}
+
+# 預設掃描的數據資料夾
+DEFAULT_DATA_DIR = '.'
+
+# 原始數據分頁API單次最多返回的列數
+RAW_PAGE_LIMIT_MAX = 5000
+
+# 內嵌於頁面的降採樣層級點數上限，更細的層級由 /api/tile/ 提供
+PYRAMID_EMBED_MAX_POINTS = 8000
+
+# 降採樣tile API單次最多返回的點數
+TILE_POINTS_MAX = 20000
+
+# 時間窗口API單次最多涵蓋的時間 (秒)
+WINDOW_MAX_S = 3600
+
+# 整合時間序列與RMS圖表的窗口長度與顯示範圍 (秒)
+ENVELOPE_WINDOW_S = 0.1
+ENVELOPE_DURATION_S = 10
+
+# 單一記錄分析結果的版本，計算方式改變時遞增使快取的分析結果失效
+ANALYSIS_VERSION = 5
+
+def highlight_columns(config):
+    """原始數據預覽中標示的通道欄位，返回 [{'key', 'name', 'column'}] (依通道順序)
+
+    CSV為設備設定檔的欄位 (名稱或索引)，欄式檔案為轉換時寫入的通道欄位名稱。
+    """
+    names = channel_names(config)
+    return [{'key': key, 'name': names[key], 'column': column} for key, column in config['channels'].items()]
+
+def preview_column(column):
+    """將一個欄位 (Series 或 ndarray) 轉為列表；JSON不支援NaN，缺值以null表示 (分離數據模式的數據檔以JSON.parse讀取)"""
+    values = np.asarray(column)
+    missing = pd.isna(values)
+    if missing.any():
+        values = np.where(missing, None, values)
+    return values.tolist()
+
+def build_raw_preview(recording):
+    """以欄為單位匯出原始數據預覽
+
+    每個欄位整欄轉換一次 (column-major)，取代逐列iterrows建立Python列表。
+    """
+    df = recording['frame']
+    config = recording['config']
+    return {
+        'headers': recording['headers'],
+        'columns': [preview_column(df[column]) for column in df.columns],
+        'row_count': len(df),
+        'channel_columns': highlight_columns(config),
+        'type': config['type']
+    }
+
+def cached_raw_preview(config, recording=None, cache_dir=CACHE_DIR):
+    """返回原始數據預覽 (與 build_raw_preview 相同格式)
+
+    全部欄位以二進位存入通道快取項目 (見 emg_cache.store_preview)，來源檔案未改變時直接載入，
+    不需重新讀取與解析整個檔案。recording 為已解析的記錄 (重新分析時)，None 時先查快取，
+    未命中再以列索引讀取。
+    """
+    cached = None
+    if recording is None and cache_dir is not None:
+        cached = load_preview(config['path'], config, cache_dir)
+    if cached is not None:
+        headers, columns = cached
+    else:
+        if recording is not None:
+            df, headers = recording['frame'], recording['headers']
+        else:
+            row_index = build_row_index(config['path'], config['type'])
+            df, headers = read_row_range(row_index, 0, row_index['rows']), row_index['headers']
+        columns = [df[column].to_numpy() for column in df.columns]
+        if cache_dir is not None:
+            store_preview(config['path'], config, headers, columns, cache_dir)
+
+    return {
+        'headers': headers,
+        'columns': [preview_column(values) for values in columns],
+        'row_count': len(columns[0]) if columns else 0,
+        'channel_columns': highlight_columns(config),
+        'type': config['type']
+    }
+
+def embedded_pyramid(values):
+    """返回要內嵌於頁面的降採樣層級 (由粗到細，點數不超過 PYRAMID_EMBED_MAX_POINTS)"""
+    return [
+        {'bucket': level['bucket'], 'x': level['x'].tolist(), 'y': level['y'].tolist()}
+        for level in build_pyramid(values)
+        if len(level['y']) <= PYRAMID_EMBED_MAX_POINTS
+    ]
+
+def uniform_series(series, timing):
+    """採樣間隔不均勻的記錄重採樣到等間隔時間軸，其餘直接返回"""
+    times = timing['times']
+    if times is None or len(times) != len(series):
+        # 通道含無法解析的數值時與時間欄位無法對齊，沿用原始採樣
+        return series
+    _, values = resample_uniform(times, series, timing['sampling_rate'])
+    return values
+
+def compute_envelopes(channels, sampling_rate):
+    """計算圖表使用的各通道窗口平均值與RMS包絡線 (前 ENVELOPE_DURATION_S 秒)
+
+    返回 {'window_s', 'time', '<通道鍵值>_mean', '<通道鍵值>_rms', ...}。
+    """
+    limit = int(sampling_rate * ENVELOPE_DURATION_S)
+    envelopes = {'window_s': ENVELOPE_WINDOW_S, 'time': None}
+    times = np.zeros(0)
+    for key, values in channels.items():
+        channel_times, mean = windowed_mean(values[:limit], sampling_rate, ENVELOPE_WINDOW_S)
+        _, rms = windowed_rms(values[:limit], sampling_rate, ENVELOPE_WINDOW_S)
+        # 各通道的長度可能不同，時間軸取最長者
+        if len(channel_times) > len(times):
+            times = channel_times
+        envelopes[f"{key}_mean"] = mean.tolist()
+        envelopes[f"{key}_rms"] = rms.tolist()
+    envelopes['time'] = times.tolist()
+    return envelopes
+
+def compute_spectral(channels, sampling_rate):
+    """計算各通道的MNF/MDF (所有通道一次計算)
+
+    返回 (每個通道的頻域統計, 圖表使用的MNF/MDF時間序列)。
+    """
+    keys, data = stack_channels(channels)
+    metrics = spectral_metrics(data, sampling_rate)
+    stats = {
+        key: {
+            'MNF': json_value(metrics['MNF'][i]),
+            'MDF': json_value(metrics['MDF'][i]),
+            'MDF_slope': json_value(metrics['MDF_slope'][i])
         }
+        for i, key in enumerate(keys)
     }
-    
-    def calculate_statistics(series, remove_outliers=True):
-        numeric_series = pd.to_numeric(series, errors='coerce').dropna()
-        if numeric_series.empty:
-            return {
-                'RMS': 0.0, 'Mean': 0.0, 'Std': 0.0,
-                'Max': 0.0, 'Min': 0.0, 'Count': 0,
-                'RMS_filtered': 0.0, 'Mean_filtered': 0.0, 'Std_filtered': 0.0,
-                'Max_filtered': 0.0, 'Min_filtered': 0.0, 'Count_filtered': 0,
-                'Outliers_removed': 0
-            }
-
-        # 原始統計數據
-        original_stats = {
-            'RMS': np.sqrt(np.mean(numeric_series**2)),
-            'Mean': np.mean(numeric_series),
-            'Std': np.std(numeric_series),
-            'Max': np.max(numeric_series),
-            'Min': np.min(numeric_series),
-            'Count': len(numeric_series)
+    series = {'window_s': SPECTRAL_WINDOW_S, 'hop_s': SPECTRAL_HOP_S, 'time': metrics['time'].tolist()}
+    for i, key in enumerate(keys):
+        series[f"{key}_mnf"] = json_values(metrics['mnf'][i])
+        series[f"{key}_mdf"] = json_values(metrics['mdf'][i])
+    return stats, series
+
+def burst_summary(bursts, sampling_rate):
+    """收縮偵測結果 (見 emg_onset.burst_statistics)：統計摘要與每次收縮的起止時間 (秒) 及RMS"""
+    return {
+        'Burst_count': len(bursts['onsets']),
+        'RMS_active': bursts['active_rms'],
+        'Active_fraction': bursts['active_fraction'],
+        'Bursts': {
+            'onset_s': (bursts['onsets'] / sampling_rate).tolist(),
+            'offset_s': (bursts['offsets'] / sampling_rate).tolist(),
+            'rms': bursts['rms'].tolist()
         }
+    }
+
+def calculate_statistics(series, remove_outliers=True, quantile_method='exact', sampling_rate=None):
+    """計算單一通道原始與異常值處理後的統計指標 (見 calculate_channel_statistics)
+
+    quantile_method 為異常值處理分位數的計算方式: 'exact' (np.percentile，預設且較快) 或
+    'tdigest' (近似估計，速度較慢，換取固定的暫存記憶體)。
+    提供 sampling_rate 時另外偵測肌肉收縮 (見 emg_onset)，加入收縮次數、只計算收縮期間的
+    RMS_active、收縮期間比例 Active_fraction，以及每次收縮的起止時間與RMS (Bursts)。
+    """
+    numeric_series = pd.to_numeric(pd.Series(series), errors='coerce').dropna()
+    return calculate_channel_statistics({'values': numeric_series.to_numpy(dtype=np.float64)}, remove_outliers,
+                                        quantile_method, sampling_rate)['values']
+
+def calculate_channel_statistics(channels, remove_outliers=True, quantile_method='exact', sampling_rate=None):
+    """計算所有通道的原始與異常值處理後統計，返回 {通道鍵值: 統計字典}
+
+    通道組成 (採樣點, 通道) 二維陣列 (見 emg_stats.channel_matrix)，統計、分位數與範圍篩選
+    都是沿採樣點方向對所有通道一次計算，計算量與數據量成正比，不隨通道數增加；
+    提供 sampling_rate 時沒有缺值的通道也一次偵測收縮 (見 emg_onset.channel_burst_statistics)。
+    參數見 calculate_statistics。
+    """
+    keys, matrix = channel_matrix(channels)
+    # 原始統計數據 (與串流統計共用同一累加方式)
+    original = MultiChannelStats(len(keys)).update(matrix).results()
+    counts = np.array([stats['Count'] for stats in original], dtype=np.int64)
+
+    # 異常值處理: 只有足夠數據點的通道才進行，保留2.5%~97.5%分位數範圍內的數據
+    filtering = (counts > 20) if remove_outliers else np.zeros(len(keys), dtype=bool)
+    columns = np.flatnonzero(filtering)
+    filtered = list(original)
+    if len(columns):
+        subset = matrix if len(columns) == len(keys) else matrix[:, columns]
+        lower, upper = channel_outlier_bounds(subset, quantile_method)
+        accumulator = MultiChannelStats(len(columns))
+        # 逐塊篩選累積，不建立完整的篩選後副本 (補齊的NaN在範圍比較時為False)
+        for block in iter_blocks(subset):
+            accumulator.update(block, (block >= lower) & (block <= upper))
+        for index, stats in zip(columns, accumulator.results()):
+            filtered[index] = stats
+
+    bursts = {}
+    if sampling_rate is not None:
+        # 沒有缺值的通道組成 (通道, 採樣點) 陣列一次偵測收縮，其餘通道移除缺值後逐一偵測
+        complete = np.flatnonzero(counts == len(matrix))
+        if len(complete):
+            stacked = np.ascontiguousarray(matrix[:, complete].T)
+            bursts.update(zip(complete, channel_burst_statistics(stacked, sampling_rate)))
+        for index in np.flatnonzero(counts < len(matrix)):
+            values = matrix[:, index]
+            bursts[index] = burst_statistics(values[~np.isnan(values)], sampling_rate)
+
+    results = {}
+    for index, key in enumerate(keys):
+        # 數據點不足的通道不進行異常值處理
+        stats = with_filtered_statistics(original[index], filtered[index], bool(filtering[index]))
+        if sampling_rate is not None:
+            stats.update(burst_summary(bursts[index], sampling_rate))
+        results[key] = stats
+    return results
+
+def summarize_channels(channels, config, quantile_method='exact', timing=None, conditioning=None):
+    """計算單一記錄的統計、降採樣金字塔與包絡線 (結果可JSON序列化，作為快取產物)
+
+    timing 為 recording_timing 的結果，未提供時由來源檔案讀取。
+    conditioning 為 channels 已套用的前處理階段 (見 emg_signal.condition)，僅記錄於結果中。
+    """
+    names = channel_names(config)
+    labels = channel_labels(config)
+
+    # 採樣頻率由檔案的設備資訊或時間戳記取得；包絡線以等間隔時間軸計算
+    if timing is None:
+        timing = recording_timing(config['path'], config)
+    sampling_rate = timing['sampling_rate']
+
+    channel_stats = calculate_channel_statistics(channels, quantile_method=quantile_method,
+                                                 sampling_rate=sampling_rate)
+    # 每次收縮的明細隨時間序列數據提供，詳細統計只保留摘要
+    bursts = {key: stats.pop('Bursts') for key, stats in channel_stats.items()}
+
+    uniform_channels = {key: uniform_series(values, timing) for key, values in channels.items()}
+    spectral_stats, spectral_series = compute_spectral(uniform_channels, sampling_rate)
+    for key, stats in channel_stats.items():
+        stats.update(spectral_stats[key])
+
+    analysis_results = {f"{names[key]} RMS (uV)": stats['RMS_filtered'] for key, stats in channel_stats.items()}
+    analysis_results.update({f"{names[key]} RMS 原始 (uV)": stats['RMS'] for key, stats in channel_stats.items()})
+    return {
+        'analysis_results': analysis_results,
+        'detailed_stats': {names[key]: stats for key, stats in channel_stats.items()},
+        'channels': [{'key': key, 'name': names[key], 'column': labels[key]} for key in channel_stats],
+        'sampling_rate': sampling_rate,
+        'sampling_rate_source': timing['source'],
+        'conditioning': list(conditioning or ()),
+        'pyramid': {key: embedded_pyramid(values) for key, values in channels.items()},
+        'envelopes': compute_envelopes(uniform_channels, sampling_rate),
+        'spectral': spectral_series,
+        'bursts': bursts
+    }
+
+def analysis_params(quantile_method='exact', conditioning=None):
+    """影響 summarize_channels 結果的參數，作為快取產物的相依條件"""
+    return {
+        'version': ANALYSIS_VERSION,
+        'quantile_method': quantile_method,
+        'conditioning': list(conditioning or ()),
+        'filter': {
+            'bandpass_hz': list(BANDPASS_HZ), 'order': FILTER_ORDER,
+            'notch_hz': NOTCH_HZ, 'notch_q': NOTCH_Q, 'envelope_cutoff_hz': ENVELOPE_CUTOFF_HZ
+        } if conditioning else None,
+        'envelope_window_s': ENVELOPE_WINDOW_S,
+        'envelope_duration_s': ENVELOPE_DURATION_S,
+        'pyramid_embed_max_points': PYRAMID_EMBED_MAX_POINTS,
+        'spectral_window_s': SPECTRAL_WINDOW_S,
+        'spectral_hop_s': SPECTRAL_HOP_S,
+        'onset': {'k': ONSET_K, 'min_burst_s': MIN_BURST_S, 'min_gap_s': MIN_GAP_S}
+    }
+
+def analyze_file(name, config, include_raw_preview=True, quantile_method='exact', cache_dir=CACHE_DIR,
+                 conditioning=None):
+    """分析單一檔案，返回該檔案在各結果字典中的項目
+
+    可在子程序中執行；時間序列以ndarray返回，傳回主程序時比Python列表精簡。
+    cache_dir 不為None時，通道數據與分析結果優先由快取載入，只有來源檔案或計算參數
+    改變的記錄才重新計算；返回值的 'cached' 表示分析結果是否沿用快取。
+    conditioning 為前處理階段名稱 (例如 ('bandpass', 'notch'))，設定時統計與時間序列
+    都以前處理後的通道計算；快取的是原始通道，前處理每次重新執行。
+    """
+    params = analysis_params(quantile_method, conditioning)
+    summary = None
+    if cache_dir is not None:
+        summary = load_artifact(config['path'], config, 'analysis', params, cache_dir)
+    cached = summary is not None
+
+    recording = None
+    if include_raw_preview and not cached:
+        # 需要重新分析時才解析完整DataFrame，並順便更新通道快取
+        recording = load_recording(config['path'], config)
+        channels = recording['channels']
+        if cache_dir is not None:
+            store_channels(config['path'], config, channels, cache_dir)
+    else:
+        channels = load_channels(config['path'], config, cache_dir)
+
+    if not cached:
+        timing = recording_timing(config['path'], config,
+                                  recording['frame'] if recording is not None else None)
+    if conditioning:
+        sampling_rate = summary['sampling_rate'] if cached else timing['sampling_rate']
+        channels = condition_channels(channels, sampling_rate, conditioning)
+    if not cached:
+        summary = summarize_channels(channels, config, quantile_method, timing, conditioning)
+        if cache_dir is not None:
+            store_artifact(config['path'], config, 'analysis', params, summary, cache_dir)
+
+    return {
+        'analysis_results': summary['analysis_results'],
+        'detailed_stats': summary['detailed_stats'],
+        # 保存完整原始數據
+        'raw_data_preview': cached_raw_preview(config, recording, cache_dir) if include_raw_preview else None,
+        'time_series_data': {
+            # 每個通道的數據為 '<通道鍵值>_data'
+            **{f"{channel['key']}_data": channels[channel['key']] for channel in summary['channels']},
+            'channels': summary['channels'],
+            'source': {'file': os.path.basename(config['path']), 'profile': config['profile']},
+            'sampling_rate': summary['sampling_rate'],
+            'pyramid': summary['pyramid'],
+            'envelopes': summary['envelopes'],
+            'spectral': summary['spectral'],
+            'bursts': summary['bursts']
+        },
+        'cached': cached
+    }
+
+def load_file_configs(data_dir=DEFAULT_DATA_DIR):
+    """掃描 data_dir 中的記錄檔案並自動判斷設備類型，更新 FILE_CONFIGS 後返回
+
+    監看模式下服務器執行緒可能同時讀取 FILE_CONFIGS，因此逐項更新而不先清空。
+    """
+    file_configs = scan_recordings(data_dir)
+    for name in set(FILE_CONFIGS) - set(file_configs):
+        FILE_CONFIGS.pop(name, None)
+    FILE_CONFIGS.update(file_configs)
+    _row_index_cache.clear()
+    _pyramid_cache.clear()
+    _store_cache.clear()
+    return FILE_CONFIGS
+
+def apply_mvc_normalization(name, config, data_dir, references, analysis_results, detailed_stats):
+    """以受試者的MVC參考值加入 %MVC 指標，返回是否找到參考值"""
+    subject = recording_subject(config['path'], data_dir)
+    found = False
+    for key, muscle in channel_names(config).items():
+        peak = references.get((subject, config['profile'], key))
+        if peak is None:
+            continue
+        found = True
+        stats = detailed_stats[name][muscle]
+        stats.update(mvc_metrics(stats, peak))
+        stats['MVC_peak'] = peak
+        analysis_results[name][f'{muscle} RMS (%MVC)'] = percent_mvc(stats['RMS_filtered'], peak)
+    return found
+
+def analyze_emg_data(include_raw_preview=True, quantile_method='exact', workers=None,
+                     data_dir=DEFAULT_DATA_DIR, cache_dir=CACHE_DIR, time_series_encoding=None,
+                     conditioning=None, mvc_dir=None, mvc_db=MVC_DB):
+    """分析EMG數據並返回結果
+
+    include_raw_preview 為 False 時不匯出完整原始數據預覽 (由服務器分頁API提供)。
+    quantile_method 見 calculate_statistics。
+    workers 大於1時以程序池平行分析各檔案。
+    data_dir 為掃描數據檔案的資料夾 (包含子資料夾)。
+    cache_dir 為通道數據與分析結果的快取資料夾，只重新計算來源檔案改變的記錄；
+    None 表示每次重新解析與計算。
+    time_series_encoding 見 encode_series；設定時通道數據直接由陣列編碼，不轉為Python列表。
+    conditioning 見 analyze_file。
+    mvc_dir 為MVC參考記錄資料夾 (見 emg_mvc)，設定時振幅指標另外加入 %MVC 版本；
+    MVC峰值存於 mvc_db，只有新增或修改的MVC檔案需要解析。
+    """
+    file_configs = load_file_configs(data_dir)
+    recomputed = []
+
+    references = {}
+    if mvc_dir is not None:
+        computed, reused = update_mvc_store(mvc_dir, mvc_db, conditioning, cache_dir)
+        print(f"📏 MVC參考記錄: 重新計算 {computed} 個，沿用 {reused} 個")
+        references = load_mvc_references(mvc_db, conditioning)
 
-        # 異常值處理
-        if remove_outliers and len(numeric_series) > 20:  # 只有足夠數據點才進行異常值處理
-            # 計算2.5%和97.5%分位數
-            lower_percentile = np.percentile(numeric_series, 2.5)
-            upper_percentile = np.percentile(numeric_series, 97.5)
-
-            # 過濾異常值
-            filtered_series = numeric_series[(numeric_series >= lower_percentile) &
-                                           (numeric_series <= upper_percentile)]
-
-            outliers_removed = len(numeric_series) - len(filtered_series)
-
-            # 過濾後的統計數據
-            filtered_stats = {
-                'RMS_filtered': np.sqrt(np.mean(filtered_series**2)),
-                'Mean_filtered': np.mean(filtered_series),
-                'Std_filtered': np.std(filtered_series),
-                'Max_filtered': np.max(filtered_series),
-                'Min_filtered': np.min(filtered_series),
-                'Count_filtered': len(filtered_series),
-                'Outliers_removed': outliers_removed
-            }
-        else:
-            # 數據點不足，不進行異常值處理
-            filtered_stats = {
-                'RMS_filtered': original_stats['RMS'],
-                'Mean_filtered': original_stats['Mean'],
-                'Std_filtered': original_stats['Std'],
-                'Max_filtered': original_stats['Max'],
-                'Min_filtered': original_stats['Min'],
-                'Count_filtered': original_stats['Count'],
-                'Outliers_removed': 0
-            }
-
-        # 合併統計數據
-        return {**original_stats, **filtered_stats}
-    
     analysis_results = {}
     detailed_stats = {}
     raw_data_preview = {}
     time_series_data = {}
 
-    for name, config in file_configs.items():
-        filepath = config['path']
-        if not os.path.exists(filepath):
+    for name, config, result, error in run_per_file(analyze_file, file_configs, workers,
+                                                     include_raw_preview, quantile_method, cache_dir,
+                                                     conditioning):
+        if error is not None:
+            print(f"處理檔案 {config['path']} 時發生錯誤: {error}")
             continue
-            
-        try:
-            if config['type'] == 'Noraxon':
-                df = pd.read_csv(filepath, skiprows=3, encoding='utf-8')
-            else:
-                df = pd.read_csv(filepath, header=None, encoding='utf-8')
-            
-            quad_stats = calculate_statistics(df[config['quad_col']])
-            bicep_stats = calculate_statistics(df[config['bicep_col']])
-            
-            analysis_results[name] = {
-                '股四頭肌 RMS (uV)': quad_stats['RMS_filtered'],
-                '股二頭肌 RMS (uV)': bicep_stats['RMS_filtered'],
-                '股四頭肌 RMS 原始 (uV)': quad_stats['RMS'],
-                '股二頭肌 RMS 原始 (uV)': bicep_stats['RMS']
-            }
-            
-            detailed_stats[name] = {
-                '股四頭肌': quad_stats,
-                '股二頭肌': bicep_stats
-            }
-
-            # 保存完整原始數據
-            preview_data = []
-            if config['type'] == 'Noraxon':
-                # 對於Noraxon，包含標題行，讀取全部數據
-                df_full = pd.read_csv(filepath, skiprows=3, encoding='utf-8')
-                headers = df_full.columns.tolist()
-                for i, row in df_full.iterrows():
-                    preview_data.append(row.tolist())
-            else:
-                # 對於其他格式，生成列號作為標題，讀取全部數據
-                df_full = pd.read_csv(filepath, header=None, encoding='utf-8')
-                headers = [f"第{i+1}欄" for i in range(len(df_full.columns))]
-                for i, row in df_full.iterrows():
-                    preview_data.append(row.tolist())
-
-            raw_data_preview[name] = {
-                'headers': headers,
-                'data': preview_data,
-                'quad_col': config['quad_col'],
-                'bicep_col': config['bicep_col'],
-                'type': config['type']
-            }
-
-            # 保存完整時間序列數據
-            if config['type'] == 'Noraxon':
-                df_full = pd.read_csv(filepath, skiprows=3, encoding='utf-8')
-                quad_series = pd.to_numeric(df_full[config['quad_col']], errors='coerce').dropna().tolist()
-                bicep_series = pd.to_numeric(df_full[config['bicep_col']], errors='coerce').dropna().tolist()
+
+        analysis_results[name] = result['analysis_results']
+        detailed_stats[name] = result['detailed_stats']
+        if mvc_dir is not None and not apply_mvc_normalization(name, config, data_dir, references,
+                                                               analysis_results, detailed_stats):
+            print(f"⚠️ 找不到 {name} 的MVC參考記錄 (受試者 {recording_subject(config['path'], data_dir)}，"
+                  f"設備 {config['profile']})")
+        if include_raw_preview:
+            raw_data_preview[name] = result['raw_data_preview']
+        if not result['cached']:
+            recomputed.append(name)
+
+        series = result['time_series_data']
+        for key in (f"{channel['key']}_data" for channel in series['channels']):
+            if time_series_encoding:
+                series[key] = encode_series(series[key], time_series_encoding)
             else:
-                df_full = pd.read_csv(filepath, header=None, encoding='utf-8')
-                quad_series = pd.to_numeric(df_full.iloc[:, config['quad_col']], errors='coerce').dropna().tolist()
-                bicep_series = pd.to_numeric(df_full.iloc[:, config['bicep_col']], errors='coerce').dropna().tolist()
-
-            # 設定採樣頻率 (Hz)
-            sampling_rate = 2000 if config['type'] == 'Noraxon' else 1000  # Noraxon為2000Hz，其他假設為1000Hz
-
-            time_series_data[name] = {
-                'quad_data': quad_series,
-                'bicep_data': bicep_series,
-                'quad_col_name': config['quad_col'] if config['type'] == 'Noraxon' else f"第{config['quad_col']+1}欄",
-                'bicep_col_name': config['bicep_col'] if config['type'] == 'Noraxon' else f"第{config['bicep_col']+1}欄",
-                'sampling_rate': sampling_rate
-            }
-
-        except Exception as e:
-            print(f"處理檔案 {filepath} 時發生錯誤: {e}")
-            continue
+                series[key] = series[key].tolist()
+        time_series_data[name] = series
 
-    return analysis_results, detailed_stats, raw_data_preview, time_series_data
+    if cache_dir is not None:
+        print(f"♻️ 重新計算 {len(recomputed)} 個記錄，沿用快取 {len(analysis_results) - len(recomputed)} 個")
 
-def generate_html_report():
-    """生成HTML報告"""
-    analysis_results, detailed_stats, raw_data_preview, time_series_data = analyze_emg_data()
+    return analysis_results, detailed_stats, raw_data_preview, time_series_data
 
-    # 將數據轉換為JSON格式嵌入HTML
-    data_json = json.dumps({
+def encode_series(values, encoding):
+    """將通道數據編碼為base64二進位格式
+
+    encoding='float32': 小端序float32
+    encoding='int16':   以 scale = max|x| / 32767 量化為小端序int16，解碼時乘回scale
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if encoding == 'int16':
+        peak = np.max(np.abs(values)) if len(values) else 0.0
+        scale = peak / 32767 if peak > 0 else 1.0
+        data = np.round(values / scale).astype('<i2')
+        return {'dtype': 'int16', 'scale': scale, 'b64': base64.b64encode(data.tobytes()).decode('ascii')}
+    if encoding == 'float32':
+        data = values.astype('<f4')
+        return {'dtype': 'float32', 'b64': base64.b64encode(data.tobytes()).decode('ascii')}
+    raise ValueError(f"Unsupported time series encoding: {encoding}")
+
+def write_if_changed(path, content):
+    """內容與現有檔案不同時才寫入 (先寫暫存檔再替換)，返回是否寫入
+
+    內容未變的檔案保留原本的修改時間，服務器的壓縮快取與瀏覽器的 ETag 都不需更新。
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+def dataset_filename(name, suffix=''):
+    """數據集的數據檔名 (名稱可能含中文或子資料夾路徑，改用名稱雜湊)"""
+    return f"dataset-{hashlib.blake2b(name.encode('utf-8'), digest_size=8).hexdigest()}{suffix}.json"
+
+def detach_detail_series(time_series_data):
+    """由時間序列中移除已有內嵌降採樣層級的通道數據，返回 {數據集: {通道鍵值: 數據}}
+
+    總覽只需要內嵌層級；細節改由 /api/tile 或分離數據模式的細節檔讀取，
+    沒有降採樣層級的短記錄 (點數少於層級門檻) 仍保留完整通道數據。
+    """
+    detail_series = {}
+    for name, series in time_series_data.items():
+        detail = {
+            channel['key']: series.pop(f"{channel['key']}_data")
+            for channel in series['channels'] if series['pyramid'].get(channel['key'])
+        }
+        if detail:
+            detail_series[name] = detail
+    return detail_series
+
+def write_split_data(output_dir, analysis_results, detailed_stats, raw_data_preview, time_series_data,
+                     indent=None, detail_series=None):
+    """將報告數據寫入 output_dir：index.json (統計摘要與數據檔清單) 及每個數據集一個檔案
+
+    detail_series (見 detach_detail_series) 另外寫入每個數據集的細節檔，頁面縮放時才讀取。
+    只改寫內容改變的檔案，並刪除已不存在的數據集檔案。返回 index.json 相對於報告的路徑。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    relative_dir = os.path.basename(output_dir)
+    datasets = {}
+    written = {'index.json'}
+    for name, series in time_series_data.items():
+        filename = dataset_filename(name)
+        payload = {'timeSeriesData': series, 'rawDataPreview': raw_data_preview.get(name)}
+        if detail_series and name in detail_series:
+            detail_filename = dataset_filename(name, '-detail')
+            write_if_changed(os.path.join(output_dir, detail_filename),
+                             json.dumps(detail_series[name], ensure_ascii=False, indent=indent).encode('utf-8'))
+            payload['detailData'] = f"{relative_dir}/{detail_filename}"
+            written.add(detail_filename)
+        write_if_changed(os.path.join(output_dir, filename),
+                         json.dumps(payload, ensure_ascii=False, indent=indent).encode('utf-8'))
+        datasets[name] = f"{relative_dir}/{filename}"
+        written.add(filename)
+
+    index = {
         'analysisResults': analysis_results,
         'detailedStats': detailed_stats,
-        'rawDataPreview': raw_data_preview,
-        'timeSeriesData': time_series_data
-    }, ensure_ascii=False, indent=2)
+        'datasets': datasets
+    }
+    write_if_changed(os.path.join(output_dir, 'index.json'),
+                     json.dumps(index, ensure_ascii=False, indent=indent).encode('utf-8'))
+
+    for filename in os.listdir(output_dir):
+        if filename.endswith('.json') and filename not in written:
+            os.remove(os.path.join(output_dir, filename))
+    return f"{relative_dir}/index.json"
+
+def generate_html_report(embed_raw_data=True, time_series_encoding='float32', workers=None,
+                         data_dir=DEFAULT_DATA_DIR, cache_dir=CACHE_DIR,
+                         output_path='emg_report_live.html', live_reload=False, split_data=False,
+                         conditioning=None, mvc_dir=None, quantile_method='exact'):
+    """生成HTML報告
+
+    embed_raw_data 為 False 時不內嵌原始數據，預覽視窗改由 /api/raw/ 分頁讀取
+    (需透過 start_web_server 提供服務)。
+    time_series_encoding 為 'float32' (預設) 或 'int16' 時，時間序列以base64二進位內嵌，
+    並以不縮排的JSON輸出；None 改為縮排的JSON數值列表 (便於閱讀，檔案較大)。
+    workers 大於1時以程序池平行分析各檔案。
+    data_dir 為掃描數據檔案的資料夾，cache_dir 為通道數據快取資料夾 (None 表示不使用快取)。
+    live_reload 為 True 時頁面連線 /api/events，報告重新產生後自動重新載入。
+    split_data 為 True 時頁面只包含不含數據的外殼 (HTML/CSS/JS，內容固定可被瀏覽器快取)，
+    數據另外寫入 <報告名稱>_data/ 資料夾 (index.json 及每個數據集一個檔案)，
+    頁面以 fetch 平行讀取，每個數據集讀取完成即繪製其圖表。
+    服務器模式與分離數據模式的時間序列只內嵌降採樣層級 (見 detach_detail_series)，
+    縮放的細節由 /api/tile 或細節檔提供；單一檔案報告仍內嵌完整通道數據。
+    conditioning 為信號前處理階段 (見 analyze_file)，None 表示以原始數據計算。
+    mvc_dir 為MVC參考記錄資料夾，設定時報告加入 %MVC 標準化結果。
+    quantile_method 為異常值處理的分位數計算方式 (見 emg_stats.outlier_bounds)。
+    """
+    analysis_results, detailed_stats, raw_data_preview, time_series_data = analyze_emg_data(
+        include_raw_preview=embed_raw_data, quantile_method=quantile_method, workers=workers,
+        data_dir=data_dir, cache_dir=cache_dir, time_series_encoding=time_series_encoding,
+        conditioning=conditioning, mvc_dir=mvc_dir)
+
+    if time_series_encoding:
+        for series in time_series_data.values():
+            for levels in series['pyramid'].values():
+                for level in levels:
+                    level['y'] = encode_series(level['y'], time_series_encoding)
+
+    # 有細節來源 (/api/tile 或分離數據模式的細節檔) 時，有降採樣層級的通道只內嵌層級；
+    # 單一檔案報告沒有其他細節來源，保留完整通道數據供放大檢視原始採樣點
+    detail_series = detach_detail_series(time_series_data) if split_data or not embed_raw_data else {}
+
+    indent = None if time_series_encoding else 2
+    page_data = {
+        'rawDataApi': None if embed_raw_data else 'api/raw/',
+        'tileApi': None if embed_raw_data else 'api/tile/',
+        'eventsApi': 'api/events' if live_reload else None
+    }
+    if split_data:
+        output_dir = f"{os.path.splitext(output_path)[0]}_data"
+        # 有 /api/tile 時細節由服務器提供，不需寫入細節檔
+        page_data['dataIndex'] = write_split_data(output_dir, analysis_results, detailed_stats,
+                                                  raw_data_preview, time_series_data, indent,
+                                                  detail_series if embed_raw_data else None)
+    else:
+        page_data.update({
+            'analysisResults': analysis_results,
+            'detailedStats': detailed_stats,
+            'rawDataPreview': raw_data_preview,
+            'timeSeriesData': time_series_data
+        })
+
+    # 將數據轉換為JSON格式嵌入HTML (分離模式只嵌入數據檔位置)
+    data_json = json.dumps(page_data, ensure_ascii=False, indent=indent)
     
     html_content = f'''
 <!DOCTYPE html>
@@ -412,6 +831,30 @@ def generate_html_report():
             background-color: #f5f5f5;
             font-weight: bold;
         }}
+        .raw-data-header-table {{
+            table-layout: fixed;
+            margin-bottom: 0;
+        }}
+        .raw-data-viewport {{
+            position: relative;
+            height: 60vh;
+            overflow-y: auto;
+            border-bottom: 1px solid #ddd;
+        }}
+        .raw-data-viewport .raw-data-table {{
+            position: absolute;
+            top: 0;
+            left: 0;
+            table-layout: fixed;
+            margin-top: 0;
+        }}
+        .raw-data-viewport .raw-data-table td {{
+            height: 21px;
+            padding: 0 4px;
+            line-height: 21px;
+            white-space: nowrap;
+            overflow: hidden;
+        }}
         .highlight-quad {{
             background-color: #ffeb3b !important;
             font-weight: bold;
@@ -421,6 +864,10 @@ def generate_html_report():
             color: white;
             font-weight: bold;
         }}
+        .highlight-channel {{
+            background-color: #90caf9 !important;
+            font-weight: bold;
+        }}
     </style>
 </head>
 <body>
@@ -443,58 +890,8 @@ def generate_html_report():
         <div class="methodology">
             <h3>1.1 數據來源與欄位說明 (Data Sources and Field Specifications)</h3>
 
-            <div class="data-source">
-                <h4>數據集 1: 419-電阻式感測器 (Resistive Sensor)</h4>
-                <p><strong>檔案:</strong> 419-電阻式.csv</p>
-                <p><strong>數據格式:</strong> 無標題行，純數值矩陣</p>
-                <p><strong>欄位取用:</strong></p>
-                <ul>
-                    <li>股四頭肌信號: 第8欄 - 電阻式感測器測量值</li>
-                    <li>股二頭肌信號: 第4欄 - 電阻式感測器測量值</li>
-                </ul>
-                <button class="raw-data-button" onclick="showRawData('419-電阻式')">📊 預覽原始數據</button>
-
-                <div class="chart-container" style="margin-top: 15px;">
-                    <div id="timeSeries419" style="height: 300px;"></div>
-                    <div class="figure-caption">圖A. 419-電阻式感測器時間序列數據分佈</div>
-                </div>
-            </div>
-
-            <div class="data-source">
-                <h4>數據集 2: 445-耦合式感測器 (Coupling Sensor)</h4>
-                <p><strong>檔案:</strong> 445-藕合式.csv</p>
-                <p><strong>數據格式:</strong> 無標題行，純數值矩陣</p>
-                <p><strong>欄位取用:</strong></p>
-                <ul>
-                    <li>股四頭肌信號: 第8欄 - 耦合式感測器測量值</li>
-                    <li>股二頭肌信號: 第4欄 - 耦合式感測器測量值</li>
-                </ul>
-                <button class="raw-data-button" onclick="showRawData('445-耦合式')">📊 預覽原始數據</button>
-
-                <div class="chart-container" style="margin-top: 15px;">
-                    <div id="timeSeries445" style="height: 300px;"></div>
-                    <div class="figure-caption">圖B. 445-耦合式感測器時間序列數據分佈</div>
-                </div>
-            </div>
-
-            <div class="data-source">
-                <h4>數據集 3: Noraxon專業設備 (Noraxon Professional System)</h4>
-                <p><strong>檔案:</strong> Noraxon.csv</p>
-                <p><strong>數據格式:</strong> 標準CSV格式，含標題行</p>
-                <p><strong>採樣頻率:</strong> 2000 Hz</p>
-                <p><strong>欄位取用:</strong></p>
-                <ul>
-                    <li>股四頭肌信號: "RT VMO (uV)" - 右側股內側肌(Vastus Medialis Oblique)</li>
-                    <li>股二頭肌信號: "RT SEMITEND. (uV)" - 右側半腱肌(Semitendinosus)</li>
-                </ul>
-                <p><strong>數據預處理:</strong> 跳過前3行元數據，從第4行開始讀取</p>
-                <button class="raw-data-button" onclick="showRawData('Noraxon')">📊 預覽原始數據</button>
-
-                <div class="chart-container" style="margin-top: 15px;">
-                    <div id="timeSeriesNoraxon" style="height: 300px;"></div>
-                    <div class="figure-caption">圖C. Noraxon專業設備時間序列數據分佈</div>
-                </div>
-            </div>
+            <!-- 每個數據集的欄位說明、原始數據按鈕與時間序列圖表由頁面依數據產生 (createDatasetSections) -->
+            <div id="datasetSections"></div>
         </div>
 
 
@@ -593,6 +990,13 @@ def generate_html_report():
                 <li><strong>標準化評估：</strong>在標準化測試條件下，RMS值可作為肌力輸出的可靠代理指標</li>
                 <li><strong>臨床應用價值：</strong>此方法適用於肌力變化趨勢分析和不同測量系統間的比較研究</li>
             </ul>
+
+            <h3>3.5 頻域疲勞指標 (MNF / MDF)</h3>
+            <p>以1秒Hann窗口、0.5秒間隔計算功率頻譜密度 $P(f)$ (20 Hz至450 Hz或奈奎斯特頻率)，每個窗口的平均頻率與中位頻率為：</p>
+            <div class="equation">
+                $$MNF = \\frac{{\\sum_j f_j P(f_j)}}{{\\sum_j P(f_j)}}, \\quad \\sum_{{f_j \\leq MDF}} P(f_j) = \\frac{{1}}{{2}} \\sum_j P(f_j)$$
+            </div>
+            <p>肌肉疲勞時頻譜向低頻移動，MDF對時間的線性回歸斜率 (Hz/s) 為負值；整段記錄的MNF/MDF以Welch法估計。</p>
         </div>
 
         <h2>4. 實驗結果 (Results)</h2>
@@ -609,23 +1013,7 @@ def generate_html_report():
         <div class="chart-container">
             <div style="margin-bottom: 15px; padding: 10px; background: #f9f9f9; border-radius: 5px;">
                 <h4 style="margin-top: 0;">數據選擇 (Data Selection):</h4>
-                <div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 15px;">
-                    <div>
-                        <strong>419-電阻式感測器:</strong><br>
-                        <label><input type="checkbox" id="check_419_quad" checked onchange="updateIntegratedChart()"> 股四頭肌 (第8欄)</label><br>
-                        <label><input type="checkbox" id="check_419_bicep" checked onchange="updateIntegratedChart()"> 股二頭肌 (第4欄)</label>
-                    </div>
-                    <div>
-                        <strong>445-耦合式感測器:</strong><br>
-                        <label><input type="checkbox" id="check_445_quad" checked onchange="updateIntegratedChart()"> 股四頭肌 (第8欄)</label><br>
-                        <label><input type="checkbox" id="check_445_bicep" checked onchange="updateIntegratedChart()"> 股二頭肌 (第4欄)</label>
-                    </div>
-                    <div>
-                        <strong>Noraxon專業設備:</strong><br>
-                        <label><input type="checkbox" id="check_noraxon_quad" checked onchange="updateIntegratedChart()"> 股四頭肌 (RT VMO)</label><br>
-                        <label><input type="checkbox" id="check_noraxon_bicep" checked onchange="updateIntegratedChart()"> 股二頭肌 (RT SEMITEND.)</label>
-                    </div>
-                </div>
+                <div id="integratedSelection" style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 15px;"></div>
             </div>
             <div id="integratedChart" style="height: 500px;"></div>
             <div class="figure-caption">圖1. 三組測量系統整合時間序列趨勢分析 (前10秒)</div>
@@ -635,28 +1023,18 @@ def generate_html_report():
         <div class="chart-container">
             <div style="margin-bottom: 15px; padding: 10px; background: #f9f9f9; border-radius: 5px;">
                 <h4 style="margin-top: 0;">RMS計算選擇 (RMS Calculation Selection):</h4>
-                <div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 15px;">
-                    <div>
-                        <strong>419-電阻式感測器:</strong><br>
-                        <label><input type="checkbox" id="rms_check_419_quad" checked onchange="updateRMSChart()"> 股四頭肌 RMS</label><br>
-                        <label><input type="checkbox" id="rms_check_419_bicep" checked onchange="updateRMSChart()"> 股二頭肌 RMS</label>
-                    </div>
-                    <div>
-                        <strong>445-耦合式感測器:</strong><br>
-                        <label><input type="checkbox" id="rms_check_445_quad" checked onchange="updateRMSChart()"> 股四頭肌 RMS</label><br>
-                        <label><input type="checkbox" id="rms_check_445_bicep" checked onchange="updateRMSChart()"> 股二頭肌 RMS</label>
-                    </div>
-                    <div>
-                        <strong>Noraxon專業設備:</strong><br>
-                        <label><input type="checkbox" id="rms_check_noraxon_quad" checked onchange="updateRMSChart()"> 股四頭肌 RMS</label><br>
-                        <label><input type="checkbox" id="rms_check_noraxon_bicep" checked onchange="updateRMSChart()"> 股二頭肌 RMS</label>
-                    </div>
-                </div>
+                <div id="rmsSelection" style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 15px;"></div>
             </div>
             <div id="rmsChart" style="height: 500px;"></div>
             <div class="figure-caption">圖2. EMG RMS數值時間序列分析 (前10秒，0.1秒窗口)</div>
         </div>
 
+        <h3>5.3 頻域疲勞指標時間序列 (MNF/MDF Time Series)</h3>
+        <div class="chart-container">
+            <div id="spectralChart" style="height: 500px;"></div>
+            <div class="figure-caption">圖3. 平均頻率 (MNF，虛線) 與中位頻率 (MDF，實線) 時間序列 (1秒窗口，0.5秒間隔)</div>
+        </div>
+
 
 
         <div class="reference">
@@ -679,53 +1057,143 @@ def generate_html_report():
     <script>
         // 嵌入實際分析數據
         const emgData = {data_json};
+
+        // 將base64編碼的通道數據解碼為typed array (float32 或 int16 × scale)
+        function decodeSeries(series) {{
+            if (!series || Array.isArray(series)) return series;
+            const binary = atob(series.b64);
+            const bytes = new Uint8Array(binary.length);
+            for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+            if (series.dtype === 'int16') {{
+                const ints = new Int16Array(bytes.buffer);
+                const values = new Float32Array(ints.length);
+                for (let i = 0; i < ints.length; i++) values[i] = ints[i] * series.scale;
+                return values;
+            }}
+            return new Float32Array(bytes.buffer);
+        }}
+
+        function decodeDataset(data) {{
+            (data.channels || []).forEach(channel => {{
+                data[`${{channel.key}}_data`] = decodeSeries(data[`${{channel.key}}_data`]);
+            }});
+            for (const levels of Object.values(data.pyramid || {{}})) {{
+                levels.forEach(level => {{ level.y = decodeSeries(level.y); }});
+            }}
+            return data;
+        }}
+
+        Object.values(emgData.timeSeriesData || {{}}).forEach(decodeDataset);
+
+        // 以採樣頻率建立相對時間軸（秒）
+        function timeAxis(length, samplingRate) {{
+            const axis = new Float64Array(length);
+            for (let i = 0; i < length; i++) axis[i] = i / samplingRate;
+            return axis;
+        }}
         
+        // 通道顏色 (依數據集與通道順序循環使用)
+        const CHANNEL_COLORS = [
+            'rgb(31, 119, 180)', 'rgb(255, 127, 14)', 'rgb(44, 160, 44)', 'rgb(214, 39, 40)', 'rgb(148, 103, 189)',
+            'rgb(140, 86, 75)', 'rgb(227, 119, 194)', 'rgb(127, 127, 127)', 'rgb(188, 189, 34)', 'rgb(23, 190, 207)'
+        ];
+
+        // 肌肉名稱的英文對照 (其他通道只顯示欄位名稱)
+        const MUSCLE_NAMES_EN = {{'股四頭肌': 'Quadriceps', '股二頭肌': 'Biceps Femoris'}};
+
+        function channelColor(index, alpha) {{
+            const color = CHANNEL_COLORS[index % CHANNEL_COLORS.length];
+            return alpha === undefined ? color : color.replace('rgb(', 'rgba(').replace(')', `, ${{alpha}})`);
+        }}
+
+        function muscleLabel(muscle, separator) {{
+            const english = MUSCLE_NAMES_EN[muscle];
+            return english ? `${{muscle}}${{separator}}(${{english}})` : muscle;
+        }}
+
+        // 分析結果中出現的所有肌肉 (依數據集與通道順序)
+        function resultMuscles(analysisResults) {{
+            const suffix = ' RMS (uV)';
+            const muscles = [];
+            for (const data of Object.values(analysisResults)) {{
+                for (const key of Object.keys(data)) {{
+                    const muscle = key.endsWith(suffix) ? key.slice(0, -suffix.length) : null;
+                    if (muscle !== null && !muscles.includes(muscle)) muscles.push(muscle);
+                }}
+            }}
+            return muscles;
+        }}
+
         function displayBasicResults(analysisResults) {{
             const container = document.getElementById('basicResults');
+            const muscles = resultMuscles(analysisResults);
+            // Q/B比值只在同時有股四頭肌與股二頭肌時顯示
+            const hasRatio = muscles.includes('股四頭肌') && muscles.includes('股二頭肌');
+            const headers = muscles.map(muscle => `<th>${{muscleLabel(muscle, '<br>')}}</th>`).join('');
+
             let html = '<table>';
             html += '<caption style="font-weight: bold; margin-bottom: 10px;">表1. 各測量系統肌電信號RMS值統計結果 (異常值處理後)</caption>';
             html += '<thead><tr>';
             html += '<th rowspan="2">測量系統<br>(Measurement System)</th>';
-            html += '<th colspan="2">處理後RMS值 (μV)<br>(Outliers Removed)</th>';
-            html += '<th colspan="2">原始RMS值 (μV)<br>(Original)</th>';
-            html += '<th rowspan="2">Q/B 比值<br>(Q/B Ratio)</th>';
+            html += `<th colspan="${{muscles.length}}">處理後RMS值 (μV)<br>(Outliers Removed)</th>`;
+            html += `<th colspan="${{muscles.length}}">原始RMS值 (μV)<br>(Original)</th>`;
+            if (hasRatio) html += '<th rowspan="2">Q/B 比值<br>(Q/B Ratio)</th>';
             html += '</tr><tr>';
-            html += '<th>股四頭肌<br>(Quadriceps)</th>';
-            html += '<th>股二頭肌<br>(Biceps Femoris)</th>';
-            html += '<th>股四頭肌<br>(Quadriceps)</th>';
-            html += '<th>股二頭肌<br>(Biceps Femoris)</th>';
+            html += headers + headers;
             html += '</tr></thead><tbody>';
 
             for (const [source, data] of Object.entries(analysisResults)) {{
-                const quadRMS = data['股四頭肌 RMS (uV)'];
-                const bicepRMS = data['股二頭肌 RMS (uV)'];
-                const quadRMS_orig = data['股四頭肌 RMS 原始 (uV)'];
-                const bicepRMS_orig = data['股二頭肌 RMS 原始 (uV)'];
-                const ratio = bicepRMS !== 0 ? (quadRMS / bicepRMS).toFixed(3) : 'N/A';
-
                 html += '<tr>';
                 html += `<td style="font-weight: bold;">${{source}}</td>`;
-                html += `<td style="background: #e8f5e8;">${{quadRMS.toFixed(3)}}</td>`;
-                html += `<td style="background: #e8f5e8;">${{bicepRMS.toFixed(3)}}</td>`;
-                html += `<td style="background: #f5f5f5;">${{quadRMS_orig.toFixed(3)}}</td>`;
-                html += `<td style="background: #f5f5f5;">${{bicepRMS_orig.toFixed(3)}}</td>`;
-                html += `<td style="font-weight: bold;">${{ratio}}</td>`;
+                muscles.forEach(muscle => {{
+                    html += `<td style="background: #e8f5e8;">${{formatStat(data[`${{muscle}} RMS (uV)`], 3)}}</td>`;
+                }});
+                muscles.forEach(muscle => {{
+                    html += `<td style="background: #f5f5f5;">${{formatStat(data[`${{muscle}} RMS 原始 (uV)`], 3)}}</td>`;
+                }});
+                if (hasRatio) {{
+                    const quadRMS = data['股四頭肌 RMS (uV)'];
+                    const bicepRMS = data['股二頭肌 RMS (uV)'];
+                    const ratio = quadRMS !== undefined && bicepRMS ? (quadRMS / bicepRMS).toFixed(3) : 'N/A';
+                    html += `<td style="font-weight: bold;">${{ratio}}</td>`;
+                }}
                 html += '</tr>';
             }}
             html += '</tbody></table>';
 
+            // MVC標準化結果 (提供MVC參考記錄時)
+            const normalized = Object.entries(analysisResults).filter(([, data]) =>
+                muscles.some(muscle => data[`${{muscle}} RMS (%MVC)`] !== undefined));
+            if (normalized.length > 0) {{
+                html += '<table style="margin-top: 20px;">';
+                html += '<caption style="font-weight: bold; margin-bottom: 10px;">表1b. MVC標準化RMS值 (%MVC，異常值處理後)</caption>';
+                html += `<thead><tr><th>測量系統<br>(Measurement System)</th>${{headers}}</tr></thead><tbody>`;
+                for (const [source, data] of normalized) {{
+                    html += `<tr><td style="font-weight: bold;">${{source}}</td>`;
+                    muscles.forEach(muscle => {{
+                        html += `<td>${{formatStat(data[`${{muscle}} RMS (%MVC)`], 2)}}</td>`;
+                    }});
+                    html += '</tr>';
+                }}
+                html += '</tbody></table>';
+            }}
+
             // 添加結果解釋
             html += '<div style="margin-top: 20px; padding: 15px; background: #f9f9f9; border-left: 4px solid #333;">';
             html += '<h4>數據預處理效果 (Preprocessing Effects):</h4>';
             html += '<p>• <span style="background: #e8f5e8; padding: 2px 5px;">綠色背景</span>: 移除異常值後的RMS值 (移除最高和最低2.5%數據)</p>';
             html += '<p>• <span style="background: #f5f5f5; padding: 2px 5px;">灰色背景</span>: 原始未處理的RMS值</p>';
-            html += '<p>• Q/B比值基於處理後數據計算，正常範圍通常在0.6-0.8之間</p>';
+            if (hasRatio) html += '<p>• Q/B比值基於處理後數據計算，正常範圍通常在0.6-0.8之間</p>';
             html += '<p>• 異常值處理有效降低了測量噪聲和電極接觸不良的影響</p>';
             html += '</div>';
 
             container.innerHTML = html;
         }}
 
+        function formatStat(value, digits) {{
+            return value === null || value === undefined ? 'N/A' : value.toFixed(digits);
+        }}
+
         function displayDetailedStats(detailedStats) {{
             const container = document.getElementById('detailedStats');
             container.innerHTML = '';
@@ -737,7 +1205,7 @@ def generate_html_report():
                     <h4>測量系統: ${{source}}</h4>
                     ${{Object.entries(muscles).map(([muscle, stats]) => `
                         <div style="margin-bottom: 20px;">
-                            <strong>${{muscle}} (${{muscle === '股四頭肌' ? 'Quadriceps' : 'Biceps Femoris'}})</strong>
+                            <strong>${{muscleLabel(muscle, ' ')}}</strong>
 
                             <div style="margin: 10px 0; padding: 10px; background: #e8f5e8; border-radius: 3px;">
                                 <strong>異常值處理後 (Outliers Removed):</strong>
@@ -761,6 +1229,32 @@ def generate_html_report():
                                 <div class="stat-item"><span>總數據點 N:</span><span>${{stats.Count}}</span></div>
                             </div>
 
+                            ${{stats.MNF !== undefined ? `
+                            <div style="margin: 10px 0; padding: 10px; background: #e8f0fb; border-radius: 3px;">
+                                <strong>頻域指標 (Spectral):</strong>
+                                <div class="stat-item"><span>平均頻率 MNF (Hz):</span><span>${{formatStat(stats.MNF, 2)}}</span></div>
+                                <div class="stat-item"><span>中位頻率 MDF (Hz):</span><span>${{formatStat(stats.MDF, 2)}}</span></div>
+                                <div class="stat-item"><span>MDF斜率 (Hz/s):</span><span>${{formatStat(stats.MDF_slope, 4)}}</span></div>
+                            </div>` : ''}}
+
+                            ${{stats.MVC_peak !== undefined ? `
+                            <div style="margin: 10px 0; padding: 10px; background: #fdf2e3; border-radius: 3px;">
+                                <strong>MVC標準化 (%MVC):</strong>
+                                <div class="stat-item"><span>MVC峰值 (μV):</span><span>${{formatStat(stats.MVC_peak, 4)}}</span></div>
+                                <div class="stat-item"><span>RMS 處理後 (%MVC):</span><span>${{formatStat(stats.RMS_filtered_MVC, 2)}}</span></div>
+                                <div class="stat-item"><span>RMS 原始 (%MVC):</span><span>${{formatStat(stats.RMS_MVC, 2)}}</span></div>
+                                <div class="stat-item"><span>收縮期間 RMS (%MVC):</span><span>${{formatStat(stats.RMS_active_MVC, 2)}}</span></div>
+                                <div class="stat-item"><span>最大值 Max (%MVC):</span><span>${{formatStat(stats.Max_MVC, 2)}}</span></div>
+                            </div>` : ''}}
+
+                            ${{stats.Burst_count !== undefined ? `
+                            <div style="margin: 10px 0; padding: 10px; background: #f3e8fb; border-radius: 3px;">
+                                <strong>收縮偵測 (Burst Detection):</strong>
+                                <div class="stat-item"><span>收縮次數:</span><span>${{stats.Burst_count}}</span></div>
+                                <div class="stat-item"><span>收縮期間 RMS (μV):</span><span>${{formatStat(stats.RMS_active, 4)}}</span></div>
+                                <div class="stat-item"><span>收縮期間比例 (%):</span><span>${{(stats.Active_fraction * 100).toFixed(1)}}</span></div>
+                            </div>` : ''}}
+
                             <div style="margin: 5px 0; padding: 5px; background: #fff3cd; border-radius: 3px; font-size: 11px;">
                                 <strong>異常值移除:</strong> ${{stats.Outliers_removed}} 個數據點 (${{((stats.Outliers_removed / stats.Count) * 100).toFixed(1)}}%)
                             </div>
@@ -771,85 +1265,79 @@ def generate_html_report():
             }}
         }}
 
-        // 創建整合時間序列圖表
-        function createIntegratedChart() {{
-            updateIntegratedChart();
+        // 已載入數據的所有通道，依分析結果的數據集順序與各數據集的通道順序
+        // (顏色依詳細統計中的通道位置決定，分批載入數據集時不會改變)
+        function channelSeries() {{
+            const series = [];
+            let colorIndex = 0;
+            for (const [datasetName, muscles] of Object.entries(emgData.detailedStats || {{}})) {{
+                const data = (emgData.timeSeriesData || {{}})[datasetName];
+                ((data && data.channels) || []).forEach((channel, i) => series.push({{
+                    dataset: datasetName, data: data, channel: channel, color: channelColor(colorIndex + i)
+                }}));
+                colorIndex += Object.keys(muscles).length;
+            }}
+            return series;
         }}
 
-        function updateIntegratedChart() {{
-            const traces = [];
-            const colors = {{
-                '419-電阻式_quad': 'rgb(31, 119, 180)',
-                '419-電阻式_bicep': 'rgb(255, 127, 14)',
-                '445-耦合式_quad': 'rgb(44, 160, 44)',
-                '445-耦合式_bicep': 'rgb(214, 39, 40)',
-                'Noraxon_quad': 'rgb(148, 103, 189)',
-                'Noraxon_bicep': 'rgb(140, 86, 75)'
-            }};
-
-            const lineStyles = {{
-                '419-電阻式_quad': 'solid',
-                '419-電阻式_bicep': 'solid',
-                '445-耦合式_quad': 'solid',
-                '445-耦合式_bicep': 'solid',
-                'Noraxon_quad': 'solid',
-                'Noraxon_bicep': 'solid'
-            }};
+        // 圖表的通道勾選狀態 ('數據集/通道鍵值' -> 是否顯示，預設顯示)，重新產生勾選框時保留
+        const channelSelection = {{integratedSelection: {{}}, rmsSelection: {{}}}};
 
-            // 檢查各個checkbox狀態並添加對應的trace
-            const checkboxes = [
-                {{id: 'check_419_quad', dataset: '419-電阻式', muscle: 'quad', name: '419-電阻式 股四頭肌'}},
-                {{id: 'check_419_bicep', dataset: '419-電阻式', muscle: 'bicep', name: '419-電阻式 股二頭肌'}},
-                {{id: 'check_445_quad', dataset: '445-耦合式', muscle: 'quad', name: '445-耦合式 股四頭肌'}},
-                {{id: 'check_445_bicep', dataset: '445-耦合式', muscle: 'bicep', name: '445-耦合式 股二頭肌'}},
-                {{id: 'check_noraxon_quad', dataset: 'Noraxon', muscle: 'quad', name: 'Noraxon 股四頭肌'}},
-                {{id: 'check_noraxon_bicep', dataset: 'Noraxon', muscle: 'bicep', name: 'Noraxon 股二頭肌'}}
-            ];
+        function isSelected(containerId, item) {{
+            return channelSelection[containerId][`${{item.dataset}}/${{item.channel.key}}`] !== false;
+        }}
 
-            checkboxes.forEach(item => {{
-                const checkbox = document.getElementById(item.id);
-                if (checkbox && checkbox.checked) {{
-                    const data = emgData.timeSeriesData[item.dataset];
-                    if (data) {{
-                        const yData = item.muscle === 'quad' ? data.quad_data : data.bicep_data;
-                        const samplingRate = data.sampling_rate || 1000; // 預設1000Hz
-                        const colorKey = `${{item.dataset}}_${{item.muscle}}`;
-
-                        // 限制為前10秒的數據
-                        const maxSamples = Math.min(yData.length, samplingRate * 10);
-                        const limitedData = yData.slice(0, maxSamples);
-
-                        // 以0.1秒為單位進行重採樣
-                        const windowSize = Math.floor(samplingRate * 0.1); // 0.1秒的採樣點數
-                        const sampledY = [];
-                        const timeData = [];
-
-                        for (let i = 0; i < limitedData.length; i += windowSize) {{
-                            const window = limitedData.slice(i, i + windowSize);
-                            if (window.length > 0) {{
-                                // 取窗口內的平均值
-                                const avgValue = window.reduce((sum, val) => sum + val, 0) / window.length;
-                                sampledY.push(avgValue);
-                                timeData.push(i / samplingRate);
-                            }}
-                        }}
-
-                        traces.push({{
-                            x: timeData,
-                            y: sampledY,
-                            type: 'scatter',
-                            mode: 'lines',
-                            name: item.name,
-                            line: {{
-                                color: colors[colorKey],
-                                width: 1.5,
-                                dash: lineStyles[colorKey]
-                            }},
-                            hovertemplate: '<b>%{{fullData.name}}</b><br>時間: %{{x:.3f}} 秒<br>數值: %{{y:.3f}} μV<extra></extra>'
-                        }});
-                    }}
+        // 依已載入的通道產生勾選框 (每個數據集一欄)，勾選變更時呼叫 onChange
+        function renderChannelSelection(containerId, channelLabel, onChange) {{
+            const container = document.getElementById(containerId);
+            container.innerHTML = '';
+            const groups = {{}};
+            channelSeries().forEach(item => {{
+                if (!groups[item.dataset]) {{
+                    groups[item.dataset] = document.createElement('div');
+                    const title = document.createElement('strong');
+                    title.textContent = `${{item.dataset}}:`;
+                    groups[item.dataset].appendChild(title);
+                    container.appendChild(groups[item.dataset]);
                 }}
+                const label = document.createElement('label');
+                const checkbox = document.createElement('input');
+                checkbox.type = 'checkbox';
+                checkbox.checked = isSelected(containerId, item);
+                checkbox.onchange = () => {{
+                    channelSelection[containerId][`${{item.dataset}}/${{item.channel.key}}`] = checkbox.checked;
+                    onChange();
+                }};
+                label.appendChild(checkbox);
+                label.appendChild(document.createTextNode(` ${{channelLabel(item.channel)}}`));
+                groups[item.dataset].appendChild(document.createElement('br'));
+                groups[item.dataset].appendChild(label);
             }});
+        }}
+
+        // 創建整合時間序列圖表
+        function createIntegratedChart() {{
+            renderChannelSelection('integratedSelection', channel =>
+                channel.name === String(channel.column) ? channel.name : `${{channel.name}} (${{channel.column}})`,
+                updateIntegratedChart);
+            updateIntegratedChart();
+        }}
+
+        function updateIntegratedChart() {{
+            // 0.1秒窗口平均值已於Python端預先計算 (前10秒)
+            const traces = channelSeries().filter(item => isSelected('integratedSelection', item)).map(item => ({{
+                x: item.data.envelopes.time,
+                y: item.data.envelopes[`${{item.channel.key}}_mean`],
+                type: 'scatter',
+                mode: 'lines',
+                name: `${{item.dataset}} ${{item.channel.name}}`,
+                line: {{
+                    color: item.color,
+                    width: 1.5,
+                    dash: 'solid'
+                }},
+                hovertemplate: '<b>%{{fullData.name}}</b><br>時間: %{{x:.3f}} 秒<br>數值: %{{y:.3f}} μV<extra></extra>'
+            }}));
 
             const layout = {{
                 title: {{
@@ -894,87 +1382,78 @@ def generate_html_report():
 
         // 創建RMS圖表
         function createRMSChart() {{
+            renderChannelSelection('rmsSelection', channel => `${{channel.name}} RMS`, updateRMSChart);
             updateRMSChart();
         }}
 
-        function updateRMSChart() {{
+        // 頻域疲勞指標圖表：每個數據集的MNF (虛線) 與MDF (實線)
+        function updateSpectralChart() {{
             const traces = [];
-            const colors = {{
-                '419-電阻式_quad': 'rgb(31, 119, 180)',
-                '419-電阻式_bicep': 'rgb(255, 127, 14)',
-                '445-耦合式_quad': 'rgb(44, 160, 44)',
-                '445-耦合式_bicep': 'rgb(214, 39, 40)',
-                'Noraxon_quad': 'rgb(148, 103, 189)',
-                'Noraxon_bicep': 'rgb(140, 86, 75)'
-            }};
+            channelSeries().filter(item => item.data.spectral).forEach(item => {{
+                for (const [metric, dash] of [['mdf', 'solid'], ['mnf', 'dot']]) {{
+                    traces.push({{
+                        x: item.data.spectral.time,
+                        y: item.data.spectral[`${{item.channel.key}}_${{metric}}`],
+                        type: 'scatter',
+                        mode: 'lines',
+                        name: `${{item.dataset}} ${{item.channel.name}} ${{metric.toUpperCase()}}`,
+                        line: {{ width: 2, dash: dash }},
+                        hovertemplate: '<b>%{{fullData.name}}</b><br>時間: %{{x:.1f}} 秒<br>頻率: %{{y:.1f}} Hz<extra></extra>'
+                    }});
+                }}
+            }});
 
-            const lineStyles = {{
-                '419-電阻式_quad': 'solid',
-                '419-電阻式_bicep': 'solid',
-                '445-耦合式_quad': 'solid',
-                '445-耦合式_bicep': 'solid',
-                'Noraxon_quad': 'solid',
-                'Noraxon_bicep': 'solid'
+            const layout = {{
+                title: {{
+                    text: 'EMG 平均頻率與中位頻率時間序列',
+                    font: {{ size: 16, color: '#333', family: 'Times New Roman' }}
+                }},
+                xaxis: {{
+                    title: {{ text: '時間 (秒)', font: {{ size: 12, family: 'Times New Roman' }} }},
+                    showgrid: true,
+                    gridcolor: '#f0f0f0'
+                }},
+                yaxis: {{
+                    title: {{ text: '頻率 (Hz)', font: {{ size: 12, family: 'Times New Roman' }} }},
+                    showgrid: true,
+                    gridcolor: '#f0f0f0'
+                }},
+                plot_bgcolor: 'white',
+                paper_bgcolor: 'white',
+                font: {{ family: 'Times New Roman', size: 11 }},
+                legend: {{
+                    x: 1.02,
+                    y: 1,
+                    bgcolor: 'rgba(255,255,255,0.8)',
+                    bordercolor: '#ccc',
+                    borderwidth: 1
+                }},
+                margin: {{ l: 60, r: 200, t: 60, b: 60 }},
+                hovermode: 'closest'
             }};
 
-            // 檢查各個checkbox狀態並添加對應的trace
-            const checkboxes = [
-                {{id: 'rms_check_419_quad', dataset: '419-電阻式', muscle: 'quad', name: '419-電阻式 股四頭肌 RMS'}},
-                {{id: 'rms_check_419_bicep', dataset: '419-電阻式', muscle: 'bicep', name: '419-電阻式 股二頭肌 RMS'}},
-                {{id: 'rms_check_445_quad', dataset: '445-耦合式', muscle: 'quad', name: '445-耦合式 股四頭肌 RMS'}},
-                {{id: 'rms_check_445_bicep', dataset: '445-耦合式', muscle: 'bicep', name: '445-耦合式 股二頭肌 RMS'}},
-                {{id: 'rms_check_noraxon_quad', dataset: 'Noraxon', muscle: 'quad', name: 'Noraxon 股四頭肌 RMS'}},
-                {{id: 'rms_check_noraxon_bicep', dataset: 'Noraxon', muscle: 'bicep', name: 'Noraxon 股二頭肌 RMS'}}
-            ];
+            Plotly.react('spectralChart', traces, layout, {{displaylogo: false, responsive: true}});
+        }}
 
-            checkboxes.forEach(item => {{
-                const checkbox = document.getElementById(item.id);
-                if (checkbox && checkbox.checked) {{
-                    const data = emgData.timeSeriesData[item.dataset];
-                    if (data) {{
-                        const yData = item.muscle === 'quad' ? data.quad_data : data.bicep_data;
-                        const samplingRate = data.sampling_rate || 1000; // 預設1000Hz
-                        const colorKey = `${{item.dataset}}_${{item.muscle}}`;
-
-                        // 限制為前10秒的數據
-                        const maxSamples = Math.min(yData.length, samplingRate * 10);
-                        const limitedData = yData.slice(0, maxSamples);
-
-                        // 以0.1秒為單位計算RMS
-                        const windowSize = Math.floor(samplingRate * 0.1); // 0.1秒的採樣點數
-                        const rmsValues = [];
-                        const timeData = [];
-
-                        for (let i = 0; i < limitedData.length; i += windowSize) {{
-                            const window = limitedData.slice(i, i + windowSize);
-                            if (window.length > 0) {{
-                                // 計算RMS值
-                                const rms = Math.sqrt(window.reduce((sum, val) => sum + val * val, 0) / window.length);
-                                rmsValues.push(rms);
-                                timeData.push(i / samplingRate);
-                            }}
-                        }}
-
-                        traces.push({{
-                            x: timeData,
-                            y: rmsValues,
-                            type: 'scatter',
-                            mode: 'lines+markers',
-                            name: item.name,
-                            line: {{
-                                color: colors[colorKey],
-                                width: 2,
-                                dash: lineStyles[colorKey]
-                            }},
-                            marker: {{
-                                size: 4,
-                                color: colors[colorKey]
-                            }},
-                            hovertemplate: '<b>%{{fullData.name}}</b><br>時間: %{{x:.1f}} 秒<br>RMS: %{{y:.3f}} μV<extra></extra>'
-                        }});
-                    }}
-                }}
-            }});
+        function updateRMSChart() {{
+            // 0.1秒窗口RMS已於Python端預先計算 (前10秒)
+            const traces = channelSeries().filter(item => isSelected('rmsSelection', item)).map(item => ({{
+                x: item.data.envelopes.time,
+                y: item.data.envelopes[`${{item.channel.key}}_rms`],
+                type: 'scatter',
+                mode: 'lines+markers',
+                name: `${{item.dataset}} ${{item.channel.name}} RMS`,
+                line: {{
+                    color: item.color,
+                    width: 2,
+                    dash: 'solid'
+                }},
+                marker: {{
+                    size: 4,
+                    color: item.color
+                }},
+                hovertemplate: '<b>%{{fullData.name}}</b><br>時間: %{{x:.1f}} 秒<br>RMS: %{{y:.3f}} μV<extra></extra>'
+            }}));
 
             const layout = {{
                 title: {{
@@ -1028,70 +1507,44 @@ def generate_html_report():
                 return;
             }}
 
-            const quadData = data.quad_data;
-            const bicepData = data.bicep_data;
             const samplingRate = data.sampling_rate || 1000; // 預設1000Hz
+            const stats = emgData.detailedStats[datasetName];
+            const maxPoints = chartPointBudget(containerId);
+
+            // 每個通道一個統計區間與一條數據曲線 (統計區間在前，數據曲線在後)
+            const channels = data.channels || [];
+            const bandTraces = [];
+            const dataTraces = [];
+            channels.forEach((channel, i) => {{
+                // 依圖表寬度選擇降採樣層級 (保留每桶最小/最大值，峰值不會遺失)
+                const view = overviewSeries(data, channel.key, maxPoints);
+
+                // 統計區間直接使用Python端計算的平均值與標準差 (上下界為常數，只需區間端點)
+                const mean = stats[channel.name].Mean;
+                const std = stats[channel.name].Std;
+                const end = (stats[channel.name].Count - 1) / samplingRate;
+
+                dataTraces.push({{
+                    x: view.x,
+                    y: view.y,
+                    type: 'scatter',
+                    mode: 'lines',
+                    name: channel.name === String(channel.column) ? channel.name : `${{channel.column}} (${{channel.name}})`,
+                    line: {{ color: channelColor(i), width: 1 }},
+                    hovertemplate: '<b>%{{fullData.name}}</b><br>時間: %{{x:.3f}} 秒<br>數值: %{{y:.3f}} μV<extra></extra>'
+                }});
 
-            // 創建相對時間軸（秒）
-            const quadTimeAxis = quadData.map((_, i) => i / samplingRate);
-            const bicepTimeAxis = bicepData.map((_, i) => i / samplingRate);
-
-            // 計算統計區間
-            const quadMean = quadData.reduce((a, b) => a + b, 0) / quadData.length;
-            const quadStd = Math.sqrt(quadData.reduce((a, b) => a + (b - quadMean) ** 2, 0) / quadData.length);
-            const quadUpper = quadData.map(() => quadMean + 2 * quadStd);
-            const quadLower = quadData.map(() => quadMean - 2 * quadStd);
-
-            const bicepMean = bicepData.reduce((a, b) => a + b, 0) / bicepData.length;
-            const bicepStd = Math.sqrt(bicepData.reduce((a, b) => a + (b - bicepMean) ** 2, 0) / bicepData.length);
-            const bicepUpper = bicepData.map(() => bicepMean + 2 * bicepStd);
-            const bicepLower = bicepData.map(() => bicepMean - 2 * bicepStd);
-
-            // 股四頭肌數據
-            const quadTrace = {{
-                x: quadTimeAxis,
-                y: quadData,
-                type: 'scatter',
-                mode: 'lines',
-                name: `${{data.quad_col_name}} (股四頭肌)`,
-                line: {{ color: 'rgb(31, 119, 180)', width: 1 }},
-                hovertemplate: '<b>%{{fullData.name}}</b><br>時間: %{{x:.3f}} 秒<br>數值: %{{y:.3f}} μV<extra></extra>'
-            }};
-
-            // 股四頭肌統計區間
-            const quadBandTrace = {{
-                x: quadTimeAxis.concat(quadTimeAxis.slice().reverse()),
-                y: quadUpper.concat(quadLower.reverse()),
-                fill: 'toself',
-                fillcolor: 'rgba(31, 119, 180, 0.1)',
-                line: {{ color: 'transparent' }},
-                name: '股四頭肌 ±2σ 區間',
-                showlegend: true,
-                hoverinfo: 'skip'
-            }};
-
-            // 股二頭肌數據
-            const bicepTrace = {{
-                x: bicepTimeAxis,
-                y: bicepData,
-                type: 'scatter',
-                mode: 'lines',
-                name: `${{data.bicep_col_name}} (股二頭肌)`,
-                line: {{ color: 'rgb(255, 127, 14)', width: 1 }},
-                hovertemplate: '<b>%{{fullData.name}}</b><br>時間: %{{x:.3f}} 秒<br>數值: %{{y:.3f}} μV<extra></extra>'
-            }};
-
-            // 股二頭肌統計區間
-            const bicepBandTrace = {{
-                x: bicepTimeAxis.concat(bicepTimeAxis.slice().reverse()),
-                y: bicepUpper.concat(bicepLower.reverse()),
-                fill: 'toself',
-                fillcolor: 'rgba(255, 127, 14, 0.1)',
-                line: {{ color: 'transparent' }},
-                name: '股二頭肌 ±2σ 區間',
-                showlegend: true,
-                hoverinfo: 'skip'
-            }};
+                bandTraces.push({{
+                    x: [0, end, end, 0],
+                    y: [mean + 2 * std, mean + 2 * std, mean - 2 * std, mean - 2 * std],
+                    fill: 'toself',
+                    fillcolor: channelColor(i, 0.1),
+                    line: {{ color: 'transparent' }},
+                    name: `${{channel.name}} ±2σ 區間`,
+                    showlegend: true,
+                    hoverinfo: 'skip'
+                }});
+            }});
 
             const layout = {{
                 title: {{
@@ -1127,11 +1580,210 @@ def generate_html_report():
                 displaylogo: false
             }};
 
-            Plotly.newPlot(containerId, [quadBandTrace, bicepBandTrace, quadTrace, bicepTrace], layout, config);
+            layout.shapes = burstShapes(data.bursts, channels);
+
+            Plotly.newPlot(containerId, bandTraces.concat(dataTraces), layout, config)
+                .then(plot => plot.on('plotly_relayout', event => refineTimeSeriesChart(datasetName, containerId, event)));
+        }}
+
+        // 偵測到的收縮期間以半透明色塊標示 (圖表高度依通道數等分，第一個通道在最上方)
+        const MAX_BURST_SHAPES = 500;
+        function burstShapes(bursts, channels) {{
+            if (!bursts) return [];
+            const shapes = [];
+            channels.forEach((channel, i) => {{
+                const burst = bursts[channel.key];
+                if (!burst || burst.onset_s.length > MAX_BURST_SHAPES) return;
+                const y0 = 1 - (i + 1) / channels.length;
+                const y1 = 1 - i / channels.length;
+                burst.onset_s.forEach((onset, j) => shapes.push({{
+                    type: 'rect', xref: 'x', yref: 'paper', x0: onset, x1: burst.offset_s[j], y0: y0, y1: y1,
+                    fillcolor: channelColor(i, 0.12), line: {{ width: 0 }}, layer: 'below'
+                }}));
+            }});
+            return shapes;
+        }}
+
+        // 圖表可顯示的點數上限 (每個像素兩點)
+        function chartPointBudget(containerId) {{
+            const width = document.getElementById(containerId).clientWidth || 800;
+            return Math.max(500, 2 * width);
+        }}
+
+        function samplesToSeries(x, y, samplingRate) {{
+            const times = new Float64Array(x.length);
+            for (let i = 0; i < x.length; i++) times[i] = x[i] / samplingRate;
+            return {{ x: times, y: y }};
+        }}
+
+        // 取得總覽用的數據：選擇點數不超過 maxPoints 的最細層級
+        function overviewSeries(data, channel, maxPoints) {{
+            const raw = data[`${{channel}}_data`];
+            const samplingRate = data.sampling_rate || 1000;
+            if (raw && raw.length <= maxPoints) {{
+                return {{ x: timeAxis(raw.length, samplingRate), y: raw }};
+            }}
+            const levels = (data.pyramid && data.pyramid[channel]) || [];
+            const level = levels.slice().reverse().find(l => l.y.length <= maxPoints) || levels[0];
+            if (!level) {{
+                return {{ x: timeAxis(raw.length, samplingRate), y: raw }};
+            }}
+            return samplesToSeries(level.x, level.y, samplingRate);
+        }}
+
+        // 取得採樣區間 [start, stop) 的細節數據：優先向服務器讀取tile，
+        // 其次讀取分離數據模式的細節檔 (第一次縮放時讀取一次)，否則使用內嵌層級
+        function detailSeries(datasetName, channel, start, stop, maxPoints) {{
+            const data = emgData.timeSeriesData[datasetName];
+            const samplingRate = data.sampling_rate || 1000;
+            if (emgData.tileApi) {{
+                const url = `${{emgData.tileApi}}${{encodeURIComponent(datasetName)}}?channel=${{channel}}` +
+                            `&start=${{start}}&stop=${{stop}}&points=${{maxPoints}}`;
+                return fetchJson(url).then(tile => samplesToSeries(tile.x, tile.y, samplingRate));
+            }}
+            if (data.detailData && !data[`${{channel}}_data`]) {{
+                data.detailLoading = data.detailLoading || fetchJson(data.detailData).then(detail => {{
+                    Object.entries(detail).forEach(([key, series]) => {{ data[`${{key}}_data`] = decodeSeries(series); }});
+                }});
+                return data.detailLoading.then(() => embeddedDetailSeries(data, channel, start, stop, maxPoints));
+            }}
+            return Promise.resolve(embeddedDetailSeries(data, channel, start, stop, maxPoints));
+        }}
+
+        function embeddedDetailSeries(data, channel, start, stop, maxPoints) {{
+            const samplingRate = data.sampling_rate || 1000;
+            const raw = data[`${{channel}}_data`];
+            if (raw && stop - start <= maxPoints) {{
+                const slice = raw.slice(start, stop);
+                const x = new Float64Array(slice.length);
+                for (let i = 0; i < slice.length; i++) x[i] = (start + i) / samplingRate;
+                return {{ x: x, y: slice }};
+            }}
+            // 內嵌層級中選擇區間內點數不超過上限的最細層級
+            const levels = (data.pyramid && data.pyramid[channel]) || [];
+            for (let i = levels.length - 1; i >= 0; i--) {{
+                const xs = [], ys = [];
+                levels[i].x.forEach((sample, j) => {{
+                    if (sample >= start && sample < stop) {{ xs.push(sample); ys.push(levels[i].y[j]); }}
+                }});
+                if (xs.length <= maxPoints || i === 0) {{
+                    return samplesToSeries(xs, ys, samplingRate);
+                }}
+            }}
+            return overviewSeries(data, channel, maxPoints);
+        }}
+
+        // 縮放時重新載入可見範圍的細節數據，雙擊還原時回到總覽層級
+        function refineTimeSeriesChart(datasetName, containerId, event) {{
+            const data = emgData.timeSeriesData[datasetName];
+            const samplingRate = data.sampling_rate || 1000;
+            const maxPoints = chartPointBudget(containerId);
+            const channels = data.channels || [];
+            let promises;
+
+            if (event['xaxis.autorange']) {{
+                promises = channels.map(channel => Promise.resolve(overviewSeries(data, channel.key, maxPoints)));
+            }} else if (event['xaxis.range[0]'] !== undefined) {{
+                const start = Math.max(0, Math.floor(event['xaxis.range[0]'] * samplingRate));
+                const stop = Math.ceil(event['xaxis.range[1]'] * samplingRate) + 1;
+                promises = channels.map(channel => detailSeries(datasetName, channel.key, start, stop, maxPoints));
+            }} else {{
+                return;
+            }}
+
+            // 數據曲線在所有統計區間之後 (索引 n ~ 2n-1)
+            Promise.all(promises).then(views => {{
+                const indices = channels.map((channel, i) => channels.length + i);
+                Plotly.restyle(containerId, {{ x: views.map(view => view.x), y: views.map(view => view.y) }}, indices);
+            }}).catch(error => console.error(`無法載入 ${{datasetName}} 的細節數據:`, error));
+        }}
+
+        // 各數據集時間序列圖表的容器 {{數據集名稱: 容器id}}，由 createDatasetSections 建立
+        const timeSeriesContainers = {{}};
+
+        // 依數據集順序建立說明區塊：標題、原始數據按鈕、欄位說明 (數據載入後填入) 與時間序列圖表容器
+        function createDatasetSections(datasetNames) {{
+            const parent = document.getElementById('datasetSections');
+            parent.innerHTML = '';
+            datasetNames.forEach((datasetName, i) => {{
+                const containerId = `timeSeries${{i}}`;
+                timeSeriesContainers[datasetName] = containerId;
+
+                const section = document.createElement('div');
+                section.className = 'data-source';
+                const title = document.createElement('h4');
+                title.textContent = `數據集 ${{i + 1}}: ${{datasetName}}`;
+                section.appendChild(title);
+
+                const info = document.createElement('div');
+                info.id = `${{containerId}}Info`;
+                section.appendChild(info);
+
+                const button = document.createElement('button');
+                button.className = 'raw-data-button';
+                button.textContent = '📊 預覽原始數據';
+                button.onclick = () => showRawData(datasetName);
+                section.appendChild(button);
+
+                const container = document.createElement('div');
+                container.className = 'chart-container';
+                container.style.marginTop = '15px';
+                const chart = document.createElement('div');
+                chart.id = containerId;
+                chart.style.height = '300px';
+                container.appendChild(chart);
+                const caption = document.createElement('div');
+                caption.className = 'figure-caption';
+                const figure = i < 26 ? String.fromCharCode(65 + i) : String(i + 1);
+                caption.textContent = `圖${{figure}}. ${{datasetName}} 時間序列數據分佈`;
+                container.appendChild(caption);
+                section.appendChild(container);
+                parent.appendChild(section);
+            }});
+        }}
+
+        // 數據集的檔案、設備、採樣頻率與通道欄位說明
+        function describeDataset(datasetName) {{
+            const data = emgData.timeSeriesData[datasetName];
+            const info = document.getElementById(`${{timeSeriesContainers[datasetName]}}Info`);
+            const source = data.source || {{}};
+            const lines = [
+                ['檔案', source.file],
+                ['設備', source.profile],
+                ['採樣頻率', data.sampling_rate ? `${{Number(data.sampling_rate.toFixed(2))}} Hz` : null]
+            ];
+            lines.filter(([, value]) => value).forEach(([label, value]) => {{
+                const line = document.createElement('p');
+                const strong = document.createElement('strong');
+                strong.textContent = `${{label}}:`;
+                line.appendChild(strong);
+                line.appendChild(document.createTextNode(` ${{value}}`));
+                info.appendChild(line);
+            }});
+            const list = document.createElement('ul');
+            (data.channels || []).forEach(channel => {{
+                const item = document.createElement('li');
+                item.textContent = channel.name === String(channel.column)
+                    ? `通道: ${{channel.column}}` : `${{channel.name}}信號: ${{channel.column}}`;
+                list.appendChild(item);
+            }});
+            info.appendChild(list);
+        }}
+
+        // 建立數據集的說明與時間序列圖表 (數據集須已建立說明區塊)
+        function showDataset(datasetName) {{
+            if (!timeSeriesContainers[datasetName]) return;
+            describeDataset(datasetName);
+            createTimeSeriesChart(datasetName, timeSeriesContainers[datasetName]);
         }}
 
         // 初始化頁面
+
         function init() {{
+            if (emgData.dataIndex) {{
+                loadSplitData();
+                return;
+            }}
             if (emgData.analysisResults && Object.keys(emgData.analysisResults).length > 0) {{
                 displayBasicResults(emgData.analysisResults);
                 displayDetailedStats(emgData.detailedStats);
@@ -1140,21 +1792,95 @@ def generate_html_report():
                 if (emgData.timeSeriesData) {{
                     createIntegratedChart();
                     createRMSChart();
+                    updateSpectralChart();
 
-                    // 創建各別時間序列圖表
-                    createTimeSeriesChart('419-電阻式', 'timeSeries419');
-                    createTimeSeriesChart('445-耦合式', 'timeSeries445');
-                    createTimeSeriesChart('Noraxon', 'timeSeriesNoraxon');
+                    // 創建各別數據集的說明與時間序列圖表
+                    createDatasetSections(Object.keys(emgData.timeSeriesData));
+                    Object.keys(emgData.timeSeriesData).forEach(showDataset);
                 }}
             }} else {{
                 document.getElementById('basicResults').innerHTML = '<p>❌ 無可用數據</p>';
             }}
         }}
 
-        // Raw Data 預覽功能
+        function fetchJson(url) {{
+            return fetch(url).then(response => {{
+                if (!response.ok) throw new Error(`HTTP ${{response.status}}`);
+                return response.json();
+            }});
+        }}
+
+        // 分離數據模式：先讀取統計摘要，再平行讀取各數據集，每個數據集讀取完成即繪製
+        function loadSplitData() {{
+            document.getElementById('basicResults').innerHTML = '<p>⏳ 正在載入數據...</p>';
+            fetchJson(emgData.dataIndex).then(index => {{
+                emgData.analysisResults = index.analysisResults;
+                emgData.detailedStats = index.detailedStats;
+                emgData.timeSeriesData = {{}};
+                emgData.rawDataPreview = {{}};
+                if (Object.keys(index.analysisResults).length === 0) {{
+                    document.getElementById('basicResults').innerHTML = '<p>❌ 無可用數據</p>';
+                    return;
+                }}
+                displayBasicResults(index.analysisResults);
+                displayDetailedStats(index.detailedStats);
+                createDatasetSections(Object.keys(index.datasets));
+                createIntegratedChart();
+                createRMSChart();
+                updateSpectralChart();
+
+                return Promise.all(Object.entries(index.datasets).map(([datasetName, url]) =>
+                    fetchJson(url).then(dataset => {{
+                        emgData.timeSeriesData[datasetName] = decodeDataset(dataset.timeSeriesData);
+                        if (dataset.detailData) emgData.timeSeriesData[datasetName].detailData = dataset.detailData;
+                        if (dataset.rawDataPreview) emgData.rawDataPreview[datasetName] = dataset.rawDataPreview;
+                        // 新載入的數據集加入通道勾選框
+                        createIntegratedChart();
+                        createRMSChart();
+                        updateSpectralChart();
+                        showDataset(datasetName);
+                    }}).catch(error => console.error(`無法載入數據集 ${{datasetName}}: ${{error.message}}`))
+                ));
+            }}).catch(error => {{
+                document.getElementById('basicResults').innerHTML = `<p>❌ 無法載入數據: ${{error.message}}</p>`;
+            }});
+        }}
+
+        // Raw Data 預覽功能 (虛擬捲動，僅繪製可見範圍的資料列)
+        const RAW_ROW_HEIGHT = 22;
+        const RAW_PAGE_SIZE = 200;
+        const RAW_OVERSCAN = 20;
+        let rawView = null;
+
+        // 取得數據來源：內嵌數據直接切片，否則透過服務器分頁API讀取
+        function rawDataSource(datasetName) {{
+            const embedded = emgData.rawDataPreview && emgData.rawDataPreview[datasetName];
+            if (embedded) {{
+                return page => Promise.resolve({{
+                    ...embedded,
+                    columns: embedded.columns.map(column =>
+                        column.slice(page * RAW_PAGE_SIZE, (page + 1) * RAW_PAGE_SIZE))
+                }});
+            }}
+            if (emgData.rawDataApi) {{
+                return page => fetch(`${{emgData.rawDataApi}}${{encodeURIComponent(datasetName)}}` +
+                                     `?offset=${{page * RAW_PAGE_SIZE}}&limit=${{RAW_PAGE_SIZE}}`)
+                    .then(response => {{
+                        if (!response.ok) throw new Error(`HTTP ${{response.status}}`);
+                        return response.json();
+                    }});
+            }}
+            return null;
+        }}
+
+        // 原始數據預覽中通道欄位的標示樣式
+        function highlightClass(key) {{
+            return {{quad: 'highlight-quad', bicep: 'highlight-bicep'}}[key] || 'highlight-channel';
+        }}
+
         function showRawData(datasetName) {{
-            const rawData = emgData.rawDataPreview[datasetName];
-            if (!rawData) {{
+            const loadPage = rawDataSource(datasetName);
+            if (!loadPage) {{
                 alert('無法找到該數據集的原始數據');
                 return;
             }}
@@ -1164,111 +1890,476 @@ def generate_html_report():
             const modalContent = document.getElementById('modalContent');
 
             modalTitle.textContent = `原始數據預覽 - ${{datasetName}}`;
+            modalContent.innerHTML = '<p>載入中...</p>';
+            modal.style.display = 'block';
 
-            let html = '<div style="margin-bottom: 15px;">';
-            html += '<p><strong>說明:</strong></p>';
-            html += '<ul>';
-            html += '<li><span style="background: #ffeb3b; padding: 2px 5px;">黃色高亮</span> = 股四頭肌信號欄位</li>';
-            html += '<li><span style="background: #4caf50; color: white; padding: 2px 5px;">綠色高亮</span> = 股二頭肌信號欄位</li>';
-            html += '</ul>';
-            html += '<p><strong>顯示完整數據集</strong></p>';
-            html += '</div>';
-
-            html += '<table class="raw-data-table">';
-            html += '<thead><tr>';
+            const view = {{ loadPage: loadPage, pages: {{}}, pending: {{}} }};
+            rawView = view;
+
+            loadPage(0).then(firstPage => {{
+                if (rawView !== view) return;
+                view.pages[0] = firstPage.columns;
+                view.rowCount = firstPage.row_count;
+                const channelColumns = firstPage.channel_columns || [];
+                view.cellClasses = firstPage.headers.map((header, index) => {{
+                    // 欄位以名稱 (Noraxon、欄式檔案) 或索引指定
+                    const channel = channelColumns.find(channel =>
+                        channel.column === (typeof channel.column === 'string' ? header : index));
+                    return channel ? highlightClass(channel.key) : '';
+                }});
 
-            // 添加標題行
-            rawData.headers.forEach((header, index) => {{
-                let className = '';
-                if (rawData.type === 'Noraxon') {{
-                    if (header === rawData.quad_col) className = 'highlight-quad';
-                    if (header === rawData.bicep_col) className = 'highlight-bicep';
-                }} else {{
-                    if (index === rawData.quad_col) className = 'highlight-quad';
-                    if (index === rawData.bicep_col) className = 'highlight-bicep';
-                }}
-                html += `<th class="${{className}}">${{header}}</th>`;
+                let html = '<div style="margin-bottom: 15px;">';
+                html += '<p><strong>說明:</strong></p>';
+                html += '<ul>';
+                channelColumns.forEach(channel => {{
+                    html += `<li><span class="${{highlightClass(channel.key)}}" style="padding: 2px 5px;">高亮</span> = ${{channel.name}}信號欄位</li>`;
+                }});
+                html += '</ul>';
+                html += `<p><strong>顯示完整數據集</strong> (共 ${{view.rowCount}} 列，捲動時分段載入)</p>`;
+                html += '</div>';
+
+                // 添加標題行
+                html += '<table class="raw-data-table raw-data-header-table"><thead><tr>';
+                firstPage.headers.forEach((header, index) => {{
+                    html += `<th class="${{view.cellClasses[index]}}">${{header}}</th>`;
+                }});
+                html += '</tr></thead></table>';
+
+                html += '<div class="raw-data-viewport">';
+                html += `<div style="height: ${{view.rowCount * RAW_ROW_HEIGHT}}px;"></div>`;
+                html += '<table class="raw-data-table"><tbody></tbody></table>';
+                html += '</div>';
+
+                modalContent.innerHTML = html;
+                view.viewport = modalContent.querySelector('.raw-data-viewport');
+                view.table = view.viewport.querySelector('table');
+                view.body = view.table.querySelector('tbody');
+                view.viewport.onscroll = () => renderRawRows(view);
+                renderRawRows(view);
+            }}).catch(error => {{
+                modalContent.innerHTML = `<p>❌ 無法載入原始數據: ${{error.message}}</p>`;
             }});
-            html += '</tr></thead><tbody>';
+        }}
+
+        function renderRawRows(view) {{
+            if (rawView !== view) return;
+            const viewport = view.viewport;
+            const first = Math.max(0, Math.floor(viewport.scrollTop / RAW_ROW_HEIGHT) - RAW_OVERSCAN);
+            const visible = Math.ceil(viewport.clientHeight / RAW_ROW_HEIGHT) + 2 * RAW_OVERSCAN;
+            const last = Math.min(view.rowCount, first + visible);
+
+            // 載入可見範圍內尚未取得的分頁
+            for (let page = Math.floor(first / RAW_PAGE_SIZE); page * RAW_PAGE_SIZE < last; page++) {{
+                if (view.pages[page] || view.pending[page]) continue;
+                view.pending[page] = true;
+                view.loadPage(page).then(result => {{
+                    view.pages[page] = result.columns;
+                    delete view.pending[page];
+                    renderRawRows(view);
+                }}).catch(() => {{
+                    delete view.pending[page];
+                }});
+            }}
 
-            // 添加數據行
-            rawData.data.forEach(row => {{
+            let html = '';
+            for (let row = first; row < last; row++) {{
+                const columns = view.pages[Math.floor(row / RAW_PAGE_SIZE)];
                 html += '<tr>';
-                row.forEach((cell, index) => {{
-                    let className = '';
-                    if (rawData.type === 'Noraxon') {{
-                        if (rawData.headers[index] === rawData.quad_col) className = 'highlight-quad';
-                        if (rawData.headers[index] === rawData.bicep_col) className = 'highlight-bicep';
-                    }} else {{
-                        if (index === rawData.quad_col) className = 'highlight-quad';
-                        if (index === rawData.bicep_col) className = 'highlight-bicep';
+                view.cellClasses.forEach((className, index) => {{
+                    let cellValue = '…';
+                    if (columns) {{
+                        const cell = columns[index][row % RAW_PAGE_SIZE];
+                        cellValue = typeof cell === 'number' ? cell.toFixed(6) : (cell === null ? 'NaN' : cell);
                     }}
-                    const cellValue = typeof cell === 'number' ? cell.toFixed(6) : cell;
                     html += `<td class="${{className}}">${{cellValue}}</td>`;
                 }});
                 html += '</tr>';
-            }});
-            html += '</tbody></table>';
-
-            modalContent.innerHTML = html;
-            modal.style.display = 'block';
+            }}
+            view.body.innerHTML = html;
+            view.table.style.transform = `translateY(${{first * RAW_ROW_HEIGHT}}px)`;
         }}
 
         function closeRawDataModal() {{
             document.getElementById('rawDataModal').style.display = 'none';
+            rawView = null;
         }}
 
         // 點擊模態框外部關閉
         window.onclick = function(event) {{
             const modal = document.getElementById('rawDataModal');
             if (event.target === modal) {{
-                modal.style.display = 'none';
+                closeRawDataModal();
             }}
         }}
 
+        // 監看模式：報告重新產生後重新載入頁面，並回到原本的捲動位置
+        function connectLiveReload() {{
+            if (!emgData.eventsApi || !window.EventSource) return;
+            const savedScroll = sessionStorage.getItem('emgReportScrollY');
+            if (savedScroll !== null) {{
+                sessionStorage.removeItem('emgReportScrollY');
+                window.scrollTo(0, Number(savedScroll));
+            }}
+            const source = new EventSource(emgData.eventsApi);
+            source.addEventListener('report', () => {{
+                sessionStorage.setItem('emgReportScrollY', String(window.scrollY));
+                location.reload();
+            }});
+        }}
+
         // 頁面載入完成後執行
         document.addEventListener('DOMContentLoaded', init);
+        window.addEventListener('load', connectLiveReload);
     </script>
 </body>
 </html>
     '''
     
-    with open('emg_report_live.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    # 先寫入暫存檔再替換，服務器不會送出寫到一半的報告；內容未變時不改寫
+    write_if_changed(output_path, html_content.encode('utf-8'))
     
-    return 'emg_report_live.html'
+    return output_path
+
+_row_index_cache = {}
+
+def raw_data_page(name, offset, limit):
+    """返回數據集 name 第 offset 列起最多 limit 列的原始數據 (欄式格式)"""
+    config = FILE_CONFIGS[name]
+    row_index = _row_index_cache.get(name)
+    if row_index is None:
+        row_index = build_row_index(config['path'], config['type'])
+        _row_index_cache[name] = row_index
+
+    df = read_row_range(row_index, offset, min(limit, RAW_PAGE_LIMIT_MAX))
+    # JSON不支援NaN，缺值以null表示
+    df = df.astype(object).where(df.notna(), None)
+    return {
+        'headers': row_index['headers'],
+        'columns': [df[column].tolist() for column in df.columns],
+        'offset': offset,
+        'row_count': row_index['rows'],
+        'channel_columns': highlight_columns(config),
+        'type': config['type']
+    }
+
+_store_cache = {}
+
+def recording_store(name, cache_dir=CACHE_DIR, conditioning=None):
+    """返回數據集 name 的通道儲存 (記憶體映射，見 emg_store)，同一數據集只開啟一次"""
+    store = _store_cache.get(name)
+    if store is None:
+        config = FILE_CONFIGS[name]
+        store = load_channel_store(config['path'], config, cache_dir, conditioning)
+        _store_cache[name] = store
+    return store
+
+_pyramid_cache = {}
+
+def channel_tile(name, channel, start, stop, points, cache_dir=CACHE_DIR, conditioning=None):
+    """返回數據集 name 的 channel (通道鍵值) 在採樣區間 [start, stop) 的降採樣數據
+
+    stop 為None時到通道結尾。
+    conditioning 須與產生報告時相同，tile 才會與頁面上的時間序列一致。
+    """
+    cached = _pyramid_cache.get(name)
+    if cached is None:
+        store = recording_store(name, cache_dir, conditioning)
+        cached = {
+            key: (store.channel(key), build_pyramid(store.channel(key)))
+            for key in store.channels
+        }
+        _pyramid_cache[name] = cached
+
+    values, pyramid = cached[channel]
+    if stop is None:
+        stop = len(values)
+    x, y = pyramid_tile(values, pyramid, start, stop, min(points, TILE_POINTS_MAX))
+    return {'x': x.tolist(), 'y': y.tolist(), 'start': start, 'stop': stop}
+
+def channel_window(name, channel, t0, t1, points, cache_dir=CACHE_DIR, conditioning=None):
+    """返回數據集 name 的 channel 在時間區間 [t0, t1) (秒) 的統計、RMS包絡線與降採樣數據
+
+    只讀取該時間窗口的數據 (通道儲存的記憶體映射切片)，與記錄總長度無關。
+    """
+    store = recording_store(name, cache_dir, conditioning)
+    start, stop = store.sample_range(channel, t0, t1)
+    values = store.window(channel, t0, t1)
+    sampling_rate = store.sampling_rate
+
+    window_start = store.time_at(start)
+
+    envelope_times, envelope_rms = windowed_rms(values, sampling_rate, ENVELOPE_WINDOW_S)
+    bucket = -(-2 * len(values) // max(points, 1))
+    x, y = minmax_decimate(values, bucket, index=np.arange(start, stop, dtype=np.int64))
+    return {
+        'start': start,
+        'stop': stop,
+        't0': window_start,
+        'sampling_rate': sampling_rate,
+        'stats': StreamingStats().update(values).result(),
+        'envelope': {
+            'window_s': ENVELOPE_WINDOW_S,
+            'time': (envelope_times + window_start).tolist(),
+            'rms': envelope_rms.tolist()
+        },
+        'x': x.tolist(),
+        'y': np.asarray(y, dtype=np.float64).tolist()
+    }
 
-def start_web_server():
-    """啟動網頁服務器"""
-    PORT = 8000
+class EMGRequestHandler(SimpleHTTPRequestHandler):
+    """靜態檔案與數據API
+
+    報告等文字內容依 Accept-Encoding 以 brotli/gzip 壓縮傳送，並附強 ETag；
+    瀏覽器以 If-None-Match 重新驗證時內容未變即回應 304。
+
+    /api/raw/<dataset>?offset=&limit=                    原始數據分頁
+    /api/tile/<dataset>?channel=&start=&stop=&points=    時間序列降採樣tile
+    /api/window/<dataset>?channel=&t0=&t1=&points=       時間窗口的統計、RMS包絡線與降採樣數據
+    /api/events                                          報告更新事件 (Server-Sent Events，監看模式)
+    """
+
+    # 通道數據快取資料夾、信號前處理階段與報告更新事件，由 start_web_server 設定
+    cache_dir = CACHE_DIR
+    conditioning = None
+    events = None
+
+    # SSE 連線閒置時送出註解行的間隔 (秒)，用於偵測已關閉的連線
+    EVENTS_KEEPALIVE_S = 15
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path.startswith('/api/raw/'):
+            self.handle_raw_api(unquote(parsed.path[len('/api/raw/'):]), parse_qs(parsed.query))
+        elif parsed.path.startswith('/api/tile/'):
+            self.handle_tile_api(unquote(parsed.path[len('/api/tile/'):]), parse_qs(parsed.query))
+        elif parsed.path.startswith('/api/window/'):
+            self.handle_window_api(unquote(parsed.path[len('/api/window/'):]), parse_qs(parsed.query))
+        elif parsed.path == '/api/events':
+            self.handle_events_api()
+        else:
+            self.handle_static(parsed.path)
+
+    def handle_static(self, url_path):
+        """可壓縮的靜態檔案使用快取的壓縮結果，其他檔案 (例如CSV、目錄) 照原本方式處理"""
+        path = self.translate_path(url_path)
+        content_type = self.guess_type(path)
+        if not os.path.isfile(path) or not is_compressible(content_type, os.path.getsize(path)):
+            super().do_GET()
+            return
+        encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+        body, etag = file_variant(path, encoding)
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_not_modified(etag)
+            return
+        self.send_body(body, content_type, etag, encoding)
+
+    def send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+
+    def send_body(self, body, content_type, etag, encoding=None):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        content_type = 'application/json; charset=utf-8'
+        encoding = None
+        if is_compressible(content_type, len(body)):
+            encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+        # 先比對 ETag，內容未變時不需壓縮
+        etag = strong_etag(content_etag(body), encoding)
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_not_modified(etag)
+            return
+        self.send_body(compress(body, encoding), content_type, etag, encoding)
+
+    def int_params(self, query, defaults):
+        """解析非負整數查詢參數，失敗時回應400並返回None
+
+        預設值為None的參數可省略，省略時其值為None。
+        """
+        values = {}
+        for key, default in defaults.items():
+            if default is None and key not in query:
+                values[key] = None
+                continue
+            try:
+                values[key] = int(query.get(key, [default])[0])
+            except (TypeError, ValueError):
+                self.send_error(400, f"{key} must be an integer")
+                return None
+            if values[key] < 0:
+                self.send_error(400, f"{key} must be non-negative")
+                return None
+        return values
+
+    def channel_param(self, name, query):
+        """解析通道查詢參數 (預設為第一個通道)，不是該數據集的通道時回應400並返回None"""
+        channels = FILE_CONFIGS[name]['channels']
+        channel = query.get('channel', [next(iter(channels), '')])[0]
+        if channel not in channels:
+            self.send_error(400, f"channel must be one of: {', '.join(channels)}")
+            return None
+        return channel
+
+    def handle_raw_api(self, name, query):
+        if name not in FILE_CONFIGS:
+            self.send_error(404, f"Unknown dataset: {name}")
+            return
+        params = self.int_params(query, {'offset': '0', 'limit': '200'})
+        if params is None:
+            return
+        self.send_json(raw_data_page(name, params['offset'], params['limit']))
+
+    def handle_tile_api(self, name, query):
+        if name not in FILE_CONFIGS:
+            self.send_error(404, f"Unknown dataset: {name}")
+            return
+        channel = self.channel_param(name, query)
+        if channel is None:
+            return
+        params = self.int_params(query, {'start': '0', 'stop': None, 'points': '2000'})
+        if params is None:
+            return
+        self.send_json(channel_tile(name, channel, params['start'], params['stop'], params['points'],
+                                    self.cache_dir, self.conditioning))
+
+    def handle_window_api(self, name, query):
+        if name not in FILE_CONFIGS:
+            self.send_error(404, f"Unknown dataset: {name}")
+            return
+        channel = self.channel_param(name, query)
+        if channel is None:
+            return
+        try:
+            t0 = float(query.get('t0', ['0'])[0])
+            t1 = float(query.get('t1', [str(t0 + ENVELOPE_DURATION_S)])[0])
+        except ValueError:
+            self.send_error(400, "t0 and t1 must be numbers")
+            return
+        if not (0 <= t0 < t1 <= t0 + WINDOW_MAX_S):
+            self.send_error(400, f"window must satisfy 0 <= t0 < t1 <= t0 + {WINDOW_MAX_S}")
+            return
+        params = self.int_params(query, {'points': '2000'})
+        if params is None:
+            return
+        self.send_json(channel_window(name, channel, t0, t1, min(params['points'], TILE_POINTS_MAX),
+                                      self.cache_dir, self.conditioning))
+
+    def handle_events_api(self):
+        if self.events is None:
+            self.send_error(404, "Live reload is not enabled")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.end_headers()
+
+        # 只通知連線之後的更新
+        version = self.events.version
+        try:
+            self.wfile.write(b'retry: 3000\n\n')
+            self.wfile.flush()
+            while True:
+                version, payload = self.events.wait(version, self.EVENTS_KEEPALIVE_S)
+                if payload is None:
+                    self.wfile.write(b': keepalive\n\n')
+                else:
+                    data = json.dumps(payload, ensure_ascii=False)
+                    self.wfile.write(f"id: {version}\nevent: report\ndata: {data}\n\n".encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 瀏覽器關閉或重新載入頁面
+            return
+
+    def end_headers(self):
+        # 允許瀏覽器快取，但每次使用前需以 ETag 重新驗證
+        self.send_header('Cache-Control', 'no-cache')
+        super().end_headers()
+
+def start_web_server(workers=None, data_dir=DEFAULT_DATA_DIR, cache_dir=CACHE_DIR,
+                     watch=False, watch_interval=2.0, host='', port=8000, open_browser=True,
+                     split_data=False, conditioning=None, mvc_dir=None, quantile_method='exact'):
+    """啟動網頁服務器
+
+    服務器以多執行緒處理請求，提供報告所在資料夾的靜態檔案與數據API。
+    host/port 為綁定位址與連接埠 (預設所有網路介面的8000埠)。
+    watch 為 True 時在背景執行緒每 watch_interval 秒檢查 data_dir，新增或修改的CSV
+    會觸發增量重新分析，完成後透過 /api/events 通知已開啟的頁面重新載入。
+    split_data、conditioning、mvc_dir、quantile_method 見 generate_html_report。
+    """
+    data_dir = os.path.abspath(data_dir)
+    cache_dir = os.path.abspath(cache_dir) if cache_dir is not None else None
+    report_options = {
+        'embed_raw_data': False,
+        'time_series_encoding': 'float32',
+        'workers': workers,
+        'data_dir': data_dir,
+        'cache_dir': cache_dir,
+        'live_reload': watch,
+        'split_data': split_data,
+        'conditioning': conditioning,
+        'mvc_dir': os.path.abspath(mvc_dir) if mvc_dir is not None else None,
+        'quantile_method': quantile_method
+    }
+
+    def precompress_report(report_path):
+        precompress(report_path)
+        output_dir = f"{os.path.splitext(report_path)[0]}_data"
+        if split_data and os.path.isdir(output_dir):
+            for filename in os.listdir(output_dir):
+                precompress(os.path.join(output_dir, filename))
     
-    # 生成HTML報告
-    report_file = generate_html_report()
+    # 生成HTML報告 (原始數據改由分頁API提供，不內嵌於頁面)，並預先壓縮
+    report_file = generate_html_report(**report_options)
+    report_path = os.path.abspath(report_file)
+    precompress_report(report_path)
     print(f"✅ 已生成報告文件: {report_file}")
-    
-    # 切換到EMG目錄
-    os.chdir('/Volumes/dev/EMG')
-    
-    class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
-        def end_headers(self):
-            self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-            self.send_header('Pragma', 'no-cache')
-            self.send_header('Expires', '0')
-            super().end_headers()
-    
-    with HTTPServer(("", PORT), MyHTTPRequestHandler) as httpd:
+    EMGRequestHandler.cache_dir = cache_dir
+    EMGRequestHandler.conditioning = conditioning
+
+    if watch:
+        events = ReportEvents()
+        EMGRequestHandler.events = events
+
+        def regenerate(paths):
+            changed = [os.path.relpath(path, data_dir) for path in paths]
+            print(f"🔄 偵測到檔案變更: {', '.join(changed)}，重新分析中...")
+            generate_html_report(output_path=report_path, **report_options)
+            precompress_report(report_path)
+            events.publish({'changed': changed})
+            print("✅ 報告已更新")
+
+        DirectoryWatcher(data_dir, regenerate, watch_interval).start()
+        print(f"👀 監看數據資料夾: {data_dir}")
+
+    # 提供報告所在資料夾的檔案
+    handler = functools.partial(EMGRequestHandler, directory=os.path.dirname(report_path))
+    with ThreadingHTTPServer((host, port), handler) as httpd:
+        url_host = 'localhost' if host in ('', '0.0.0.0', '::') else host
+        url = f"http://{url_host}:{httpd.server_address[1]}/{os.path.basename(report_path)}"
         print(f"🚀 EMG分析報告服務器已啟動")
-        print(f"📊 請在瀏覽器中訪問: http://localhost:{PORT}/{report_file}")
+        print(f"📊 請在瀏覽器中訪問: {url}")
         print(f"⏹️  按 Ctrl+C 停止服務器")
         
         # 延遲2秒後自動打開瀏覽器
-        def open_browser():
+        def launch_browser():
             time.sleep(2)
-            webbrowser.open(f'http://localhost:{PORT}/{report_file}')
+            webbrowser.open(url)
         
-        browser_thread = threading.Thread(target=open_browser)
-        browser_thread.daemon = True
-        browser_thread.start()
+        if open_browser:
+            browser_thread = threading.Thread(target=launch_browser)
+            browser_thread.daemon = True
+            browser_thread.start()
         
         try:
             httpd.serve_forever()
@@ -1276,9 +2367,43 @@ def start_web_server():
             print("\n✅ 服務器已停止")
             httpd.shutdown()
 
+def parse_args(argv=None):
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description='EMG肌力分析報告服務器')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='平行分析檔案的程序數 (預設在主程序中依序處理)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help='數據資料夾，包含子資料夾中的CSV檔案會自動判斷設備類型 (預設為目前目錄)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help=f'解析後通道數據的快取資料夾 (預設 {CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true', help='不使用快取，每次重新解析CSV')
+    parser.add_argument('--watch', action='store_true',
+                        help='監看數據資料夾，檔案新增或修改時重新分析並自動更新已開啟的頁面')
+    parser.add_argument('--watch-interval', type=float, default=2.0, help='監看模式的檢查間隔 (秒)')
+    parser.add_argument('--host', default='', help='服務器綁定位址 (預設所有網路介面)')
+    parser.add_argument('--port', type=int, default=8000, help='服務器連接埠 (預設8000，0表示自動選擇)')
+    parser.add_argument('--no-browser', action='store_true', help='啟動後不自動開啟瀏覽器')
+    parser.add_argument('--split-data', action='store_true',
+                        help='報告頁面不內嵌數據，改為每個數據集一個數據檔，由頁面平行讀取')
+    parser.add_argument('--filter', action='store_true',
+                        help='統計與圖表使用前處理後的信號 (20-450Hz帶通濾波與60Hz陷波)')
+    parser.add_argument('--mvc-dir', default=None,
+                        help='MVC參考記錄資料夾 (第一層子資料夾為受試者)，振幅指標另外換算為%%MVC')
+    parser.add_argument('--quantile', choices=('exact', 'tdigest'), default='exact',
+                        help='異常值處理的2.5%%/97.5%%分位數: exact (預設，np.percentile，最快) 或 '
+                             'tdigest (近似估計，暫存記憶體固定，以較慢的速度換取有界的記憶體用量)')
+    return parser.parse_args(argv)
+
 def main():
     """主函數"""
-    start_web_server()
+    args = parse_args()
+    start_web_server(workers=args.workers, data_dir=args.data_dir,
+                     cache_dir=None if args.no_cache else args.cache_dir,
+                     watch=args.watch, watch_interval=args.watch_interval,
+                     host=args.host, port=args.port, open_browser=not args.no_browser,
+                     split_data=args.split_data,
+                     conditioning=DEFAULT_CONDITIONING if args.filter else None,
+                     mvc_dir=args.mvc_dir, quantile_method=args.quantile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
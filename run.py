@@ -5,13 +5,19 @@ EMG Muscle Strength Analysis System Launcher
 
 使用方法 (Usage):
 python run.py
+python run.py --workers 4    # 以4個程序平行分析各檔案
+python run.py --data-dir 數據資料夾    # 掃描指定資料夾 (包含子資料夾) 中的記錄
+python run.py --watch        # 監看數據資料夾，新記錄自動分析並更新頁面
+python run.py --host 127.0.0.1 --port 8080    # 指定綁定位址與連接埠
+python run.py --split-data   # 頁面外殼與各數據集的數據檔分開，平行載入
+python run.py --filter       # 以帶通濾波與陷波後的信號計算統計與圖表
+python run.py --mvc-dir MVC資料夾    # 以MVC參考記錄將振幅指標換算為%MVC
 
 然後在瀏覽器中訪問: http://localhost:8000/emg_report_live.html
 Then visit in browser: http://localhost:8000/emg_report_live.html
 """
 
 import sys
-import os
 
 def main():
     """主函數"""
@@ -29,6 +35,7 @@ def main():
     try:
         import pandas
         import numpy
+        import scipy
         print("✅ 依賴模組檢查通過")
         print("✅ Dependencies check passed")
     except ImportError as e:
@@ -38,26 +45,34 @@ def main():
         print("Please run: pip install -r requirements.txt")
         sys.exit(1)
     
-    # 檢查數據檔案
-    data_files = ['419-電阻式.csv', '445-藕合式.csv', 'Noraxon.csv']
-    missing_files = []
-    for file in data_files:
-        if not os.path.exists(file):
-            missing_files.append(file)
-    
-    if missing_files:
-        print(f"⚠️  缺少數據檔案: {', '.join(missing_files)}")
-        print(f"⚠️  Missing data files: {', '.join(missing_files)}")
+    # 掃描數據檔案 (自動判斷設備類型)
+    from emg_profiles import scan_recordings
+    from emg_signal import DEFAULT_CONDITIONING
+    from emg_web_report import parse_args
+    args = parse_args()
+    recordings = scan_recordings(args.data_dir)
+    if recordings:
+        print(f"✅ 找到 {len(recordings)} 個數據檔案: {', '.join(recordings)}")
+        print(f"✅ Found {len(recordings)} data files")
+    else:
+        print(f"⚠️  在 {args.data_dir} 中找不到可辨識的數據檔案")
+        print(f"⚠️  No recognizable data files found in {args.data_dir}")
         print("系統將繼續運行，但可能無法顯示完整結果")
         print("System will continue but may not show complete results")
-        print()
+    print()
     
     # 啟動主程式
     try:
         from emg_web_report import start_web_server
         print("📊 正在生成分析報告...")
         print("📊 Generating analysis report...")
-        start_web_server()
+        start_web_server(workers=args.workers, data_dir=args.data_dir,
+                         cache_dir=None if args.no_cache else args.cache_dir,
+                         watch=args.watch, watch_interval=args.watch_interval,
+                         host=args.host, port=args.port, open_browser=not args.no_browser,
+                         split_data=args.split_data,
+                         conditioning=DEFAULT_CONDITIONING if args.filter else None,
+                         mvc_dir=args.mvc_dir, quantile_method=args.quantile)
     except KeyboardInterrupt:
         print("\n👋 系統已停止")
         print("👋 System stopped")